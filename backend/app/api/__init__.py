@@ -0,0 +1,12 @@
+"""
+HTTP API 模块
+
+基于 FastAPI 的对话接口：创建会话、发送轮次（普通 / SSE 流式）、请求分析，
+以及每个会话一条的 WebSocket 长连接通道。
+"""
+
+from .routes import router
+from .websocket import ws_router
+from .responses import FastJSONResponse
+
+__all__ = ["router", "ws_router", "FastJSONResponse"]
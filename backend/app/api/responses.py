@@ -0,0 +1,19 @@
+"""
+响应类
+"""
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class FastJSONResponse(JSONResponse):
+    """使用 orjson 序列化的 JSON 响应"""
+    
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+
+def sse_event(event: str, data: dict) -> bytes:
+    """编码一条 SSE 事件"""
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
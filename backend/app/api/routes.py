@@ -0,0 +1,201 @@
+"""
+对话 API 路由
+
+会话由全局 session_registry 管理：同一会话的轮次串行执行，不同会话完全并行；
+配置了持久化存储时，不在内存中的会话会在首次访问时自动恢复。
+"""
+import asyncio
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.api.responses import sse_event
+from app.api.schemas import (
+    AnalysisRequest,
+    AnalysisResponse,
+    CreateSessionRequest,
+    ScenarioSummary,
+    SessionResponse,
+    StateSummary,
+    TurnRequest,
+    TurnResponse,
+    UsageSummary
+)
+from app.core.llm_client import llm_client
+from app.prompts.prompt_compiler import prompt_compiler
+from app.services.dialogue_manager import DialogueManager
+from app.services.model_b import model_b_service
+from app.services.scenario_catalog import ScenarioNotFoundError, scenario_catalog
+from app.services.session_registry import SessionBusyError, session_registry
+
+
+router = APIRouter(prefix="/api")
+
+_STREAM_END = object()
+
+
+def _state_summary(manager: DialogueManager) -> StateSummary:
+    return StateSummary(**manager.get_dialogue_summary())
+
+
+async def _require_session(session_id: str):
+    """会话不存在时返回 404"""
+    if not await session_registry.resume(session_id):
+        raise HTTPException(status_code=404, detail=f"会话不存在: {session_id}")
+
+
+def _prompt_cache_stats() -> dict:
+    """本地 system prompt 编译缓存，以及上游报告的 prompt 缓存命中 token 数"""
+    total = llm_client.usage.total
+    return {
+        **prompt_compiler.stats(),
+        "provider_cached_tokens": total.cached_tokens,
+        "provider_cached_ratio": total.cached_tokens / total.prompt_tokens if total.prompt_tokens else 0.0
+    }
+
+
+@router.get("/scenarios", response_model=list[ScenarioSummary])
+async def list_scenarios() -> list[ScenarioSummary]:
+    """可选情境列表"""
+    return [
+        ScenarioSummary(id=s.id, name=s.name, description=s.description)
+        for s in scenario_catalog.list()
+    ]
+
+
+@router.post("/sessions", response_model=SessionResponse, status_code=201)
+async def create_session(request: CreateSessionRequest) -> SessionResponse:
+    """创建会话"""
+    try:
+        session_id = await session_registry.create(
+            request.session_id,
+            request.scenario_id,
+            token_budget=request.token_budget,
+            cost_budget=request.cost_budget
+        )
+    except ScenarioNotFoundError:
+        raise HTTPException(status_code=404, detail=f"情境不存在: {request.scenario_id}")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    manager = session_registry.get(session_id)
+    return SessionResponse(
+        session_id=session_id,
+        scenario_id=manager.context.scenario_id,
+        state=_state_summary(manager),
+        usage=UsageSummary(**manager.usage.to_dict())
+    )
+
+
+@router.get("/sessions/{session_id}", response_model=SessionResponse)
+async def get_session(session_id: str) -> SessionResponse:
+    """查看会话状态"""
+    await _require_session(session_id)
+    manager = session_registry.get(session_id)
+    return SessionResponse(
+        session_id=session_id,
+        scenario_id=manager.context.scenario_id,
+        state=_state_summary(manager),
+        usage=UsageSummary(**manager.usage.to_dict())
+    )
+
+
+@router.delete("/sessions/{session_id}", status_code=204)
+async def delete_session(session_id: str):
+    """从内存中移除会话（会话正在处理轮次时返回 409）"""
+    try:
+        removed = session_registry.remove(session_id)
+    except SessionBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not removed:
+        raise HTTPException(status_code=404, detail=f"会话不存在: {session_id}")
+
+
+@router.post("/sessions/{session_id}/turns", response_model=TurnResponse)
+async def send_turn(session_id: str, request: TurnRequest) -> TurnResponse:
+    """发送一轮消息，等待完整回复"""
+    await _require_session(session_id)
+    async with session_registry.session(session_id) as manager:
+        reply = await manager.process_user_input(request.content)
+        state = _state_summary(manager)
+    return TurnResponse(session_id=session_id, reply=reply, state=state)
+
+
+@router.post("/sessions/{session_id}/turns/stream")
+async def stream_turn(session_id: str, request: TurnRequest) -> StreamingResponse:
+    """
+    发送一轮消息，以 SSE 推送回复
+    
+    事件：token（增量文本）、done（完整回复与状态）、error
+    客户端中途断开时本轮仍会完成并写入会话。
+    """
+    await _require_session(session_id)
+    queue: asyncio.Queue = asyncio.Queue()
+    
+    async def on_chunk(chunk: str):
+        queue.put_nowait(chunk)
+    
+    async def run_turn() -> TurnResponse:
+        async with session_registry.session(session_id) as manager:
+            reply = await manager.process_user_input(request.content, on_chunk=on_chunk)
+            return TurnResponse(session_id=session_id, reply=reply, state=_state_summary(manager))
+    
+    def on_done(task: asyncio.Task):
+        # 无论客户端是否还在读取，都在这里取出并记录异常，
+        # 避免断开后出现 "Task exception was never retrieved"
+        if not task.cancelled() and task.exception() is not None:
+            print(f"流式轮次失败 {session_id}: {task.exception()}")
+        queue.put_nowait(_STREAM_END)
+    
+    task = asyncio.create_task(run_turn())
+    task.add_done_callback(on_done)
+    
+    async def events():
+        while True:
+            item = await queue.get()
+            if item is _STREAM_END:
+                break
+            yield sse_event("token", {"content": item})
+        
+        if task.cancelled():
+            yield sse_event("error", {"detail": "本轮已取消"})
+        elif task.exception() is not None:
+            yield sse_event("error", {"detail": str(task.exception())})
+        else:
+            yield sse_event("done", task.result().model_dump())
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/sessions/{session_id}/analysis", response_model=AnalysisResponse)
+async def request_analysis(
+    session_id: str,
+    request: AnalysisRequest | None = None
+) -> AnalysisResponse:
+    """请求对话分析"""
+    request = request or AnalysisRequest()
+    await _require_session(session_id)
+    analysis = await session_registry.get_analysis(
+        session_id,
+        recent_turns=request.recent_turns,
+        incremental=request.incremental
+    )
+    return AnalysisResponse(session_id=session_id, analysis=analysis)
+
+
+@router.get("/stats")
+async def stats() -> dict:
+    """运行统计"""
+    return {
+        "sessions": session_registry.stats(),
+        "llm_client": llm_client.stats(),
+        "usage": llm_client.usage.to_dict(),
+        "analysis_cache": model_b_service.cache_stats(),
+        "prompt_cache": _prompt_cache_stats(),
+        "scenarios": scenario_catalog.stats()
+    }
+
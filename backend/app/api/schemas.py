@@ -0,0 +1,82 @@
+"""
+API 请求与响应模型
+"""
+from pydantic import BaseModel, Field
+
+
+class CreateSessionRequest(BaseModel):
+    """创建会话"""
+    scenario_id: str = "first_meet"
+    session_id: str | None = Field(default=None, max_length=64)
+    token_budget: int | None = Field(default=None, ge=0)  # 为空时使用服务端默认预算
+    cost_budget: float | None = Field(default=None, ge=0)
+
+
+class ScenarioSummary(BaseModel):
+    """可选情境"""
+    id: str
+    name: str
+    description: str
+
+
+class StateSummary(BaseModel):
+    """对方当前状态"""
+    total_turns: int
+    current_emotion: str
+    current_relation: str
+
+
+class UsageSummary(BaseModel):
+    """会话的 LLM 用量"""
+    calls: int
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+    cost: float
+    avg_wall_time: float
+    avg_queue_time: float
+    retries: int
+    token_budget: int
+    cost_budget: float
+    rejected: int  # 因预算不足未发送的请求数
+    models: dict[str, dict]
+
+
+class SessionResponse(BaseModel):
+    """会话信息"""
+    session_id: str
+    scenario_id: str
+    state: StateSummary
+    usage: UsageSummary | None = None
+
+
+# 一轮用户消息的最大字符数
+MAX_TURN_CHARS = 2000
+
+
+class TurnRequest(BaseModel):
+    """用户发送的一轮消息"""
+    content: str = Field(min_length=1, max_length=MAX_TURN_CHARS)
+
+
+class TurnResponse(BaseModel):
+    """一轮对话的结果"""
+    session_id: str
+    reply: str
+    state: StateSummary
+
+
+# 一次分析最多覆盖的轮数
+MAX_ANALYSIS_TURNS = 50
+
+
+class AnalysisRequest(BaseModel):
+    """分析请求"""
+    recent_turns: int = Field(default=5, ge=1, le=MAX_ANALYSIS_TURNS)
+    incremental: bool | None = None
+
+
+class AnalysisResponse(BaseModel):
+    """分析结果"""
+    session_id: str
+    analysis: str
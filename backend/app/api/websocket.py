@@ -0,0 +1,209 @@
+"""
+WebSocket 对话通道
+
+每个会话一条长连接，消息均为 JSON 文本帧。
+
+客户端 → 服务端：
+    {"type": "turn", "content": "..."}                      发送一轮消息
+    {"type": "analysis", "recent_turns": 5, "incremental": null}  请求分析（完成后推送）
+    {"type": "ping"}
+
+服务端 → 客户端：
+    {"type": "typing", "typing": true | false}              对方正在输入
+    {"type": "token", "content": "..."}                     回复增量文本
+    {"type": "reply", "reply": "...", "state": {...}}       本轮完成
+    {"type": "analysis", "analysis": "..."}                 分析结果
+    {"type": "error", "detail": "..."}
+    {"type": "pong"}
+
+发送经过有界队列，积压的连续 token 会合并为一帧；客户端消费过慢导致队列持续满载时，
+连接立即被关闭（不等待客户端的下一条消息），进行中的轮次仍会完成并写入会话，
+避免慢客户端占用内存。
+
+分析在后台任务中进行，且只在拍下对话快照时持有会话锁，分析期间仍可继续发送轮次。
+"""
+import asyncio
+
+import orjson
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+
+from app.api.schemas import MAX_ANALYSIS_TURNS, MAX_TURN_CHARS
+from app.core.config import settings
+from app.services.session_registry import session_registry
+
+
+ws_router = APIRouter(prefix="/api")
+
+# 关闭码：策略违规（消息格式错误）与服务端过载（客户端消费过慢）
+_CLOSE_POLICY_VIOLATION = 1008
+_CLOSE_TRY_AGAIN_LATER = 1013
+
+
+class ChatConnection:
+    """一条 WebSocket 对话连接"""
+    
+    def __init__(self, websocket: WebSocket, session_id: str):
+        self.websocket = websocket
+        self.session_id = session_id
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=settings.WS_SEND_QUEUE_SIZE)
+        self._sender: asyncio.Task | None = None
+        self._receiver: asyncio.Task | None = None
+        self._closing: asyncio.Task | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self._dispatching = False  # 接收循环正在处理一条消息（而不是等待输入）
+        self.slow_client = False
+    
+    async def run(self):
+        """处理连接直到客户端断开或因消费过慢被关闭"""
+        self._sender = asyncio.create_task(self._send_loop())
+        self._receiver = asyncio.create_task(self._receive_loop())
+        try:
+            await asyncio.wait({self._receiver})
+            if not self._receiver.cancelled():
+                self._receiver.result()
+        finally:
+            self._receiver.cancel()
+            for task in self._tasks:
+                task.cancel()
+            self._sender.cancel()
+            # 取回发送任务的异常（如客户端断开后发送失败），避免未取回异常的告警
+            await asyncio.gather(self._sender, return_exceptions=True)
+        
+        if self._closing is not None:
+            await self._closing
+    
+    async def push(self, message: dict):
+        """
+        把消息放入发送队列
+        
+        队列满时等待客户端消费，超过 WS_SEND_TIMEOUT 仍无空位则标记为慢客户端并立即关闭连接，
+        之后的消息直接丢弃（不抛异常，保证进行中的轮次能正常完成）。
+        """
+        if self.slow_client:
+            return
+        try:
+            await asyncio.wait_for(self._queue.put(message), timeout=settings.WS_SEND_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.slow_client = True
+            print(f"WebSocket 客户端消费过慢，断开连接: {self.session_id}")
+            self._closing = asyncio.create_task(self._close_slow_client())
+    
+    async def _close_slow_client(self):
+        """关闭慢客户端：停止发送；接收循环空闲时直接结束，正在处理轮次时等其完成后退出"""
+        self._sender.cancel()
+        if not self._dispatching:
+            self._receiver.cancel()
+        try:
+            await self.websocket.close(code=_CLOSE_TRY_AGAIN_LATER)
+        except Exception as e:
+            print(f"关闭 WebSocket 连接失败: {e}")
+    
+    async def _receive_loop(self):
+        try:
+            while not self.slow_client:
+                text = await self.websocket.receive_text()
+                self._dispatching = True
+                try:
+                    try:
+                        data = orjson.loads(text)
+                    except orjson.JSONDecodeError:
+                        await self.push({"type": "error", "detail": "消息必须是 JSON"})
+                        continue
+                    await self._dispatch(data)
+                finally:
+                    self._dispatching = False
+        except WebSocketDisconnect:
+            pass
+    
+    async def _send_loop(self):
+        """逐条发送；队列中积压的连续 token 合并为一帧发送，减少帧数"""
+        held = None
+        while True:
+            message = held or await self._queue.get()
+            held = None
+            if message["type"] == "token":
+                parts = [message["content"]]
+                while not self._queue.empty():
+                    following = self._queue.get_nowait()
+                    if following["type"] != "token":
+                        held = following
+                        break
+                    parts.append(following["content"])
+                if len(parts) > 1:
+                    message = {"type": "token", "content": "".join(parts)}
+            await self.websocket.send_text(orjson.dumps(message).decode("utf-8"))
+    
+    async def _dispatch(self, data: dict):
+        kind = data.get("type") if isinstance(data, dict) else None
+        if kind == "turn":
+            content = data.get("content")
+            if not isinstance(content, str) or not content.strip():
+                await self.push({"type": "error", "detail": "content 不能为空"})
+                return
+            if len(content) > MAX_TURN_CHARS:
+                await self.push({"type": "error", "detail": f"content 不能超过 {MAX_TURN_CHARS} 个字符"})
+                return
+            await self._turn(content)
+        elif kind == "analysis":
+            recent_turns = data.get("recent_turns", 5)
+            if isinstance(recent_turns, bool) or not isinstance(recent_turns, int):
+                await self.push({"type": "error", "detail": "recent_turns 必须是整数"})
+                return
+            incremental = data.get("incremental")
+            if incremental is not None and not isinstance(incremental, bool):
+                await self.push({"type": "error", "detail": "incremental 必须是布尔值或 null"})
+                return
+            
+            # 分析在后台进行，期间仍可继续收发消息
+            task = asyncio.create_task(self._analysis(
+                recent_turns=min(max(recent_turns, 1), MAX_ANALYSIS_TURNS),
+                incremental=incremental
+            ))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        elif kind == "ping":
+            await self.push({"type": "pong"})
+        else:
+            await self.push({"type": "error", "detail": f"未知的消息类型: {kind}"})
+    
+    async def _turn(self, content: str):
+        async def on_chunk(chunk: str):
+            await self.push({"type": "token", "content": chunk})
+        
+        await self.push({"type": "typing", "typing": True})
+        try:
+            async with session_registry.session(self.session_id) as manager:
+                reply = await manager.process_user_input(content, on_chunk=on_chunk)
+                state = manager.get_dialogue_summary()
+        except Exception as e:
+            print(f"WebSocket 轮次失败: {e}")
+            await self.push({"type": "typing", "typing": False})
+            await self.push({"type": "error", "detail": str(e)})
+            return
+        
+        await self.push({"type": "typing", "typing": False})
+        await self.push({"type": "reply", "reply": reply, "state": state})
+    
+    async def _analysis(self, recent_turns: int, incremental: bool | None):
+        try:
+            analysis = await session_registry.get_analysis(
+                self.session_id,
+                recent_turns=recent_turns,
+                incremental=incremental
+            )
+        except Exception as e:
+            print(f"WebSocket 分析失败: {e}")
+            await self.push({"type": "error", "detail": str(e)})
+            return
+        await self.push({"type": "analysis", "analysis": analysis})
+
+
+@ws_router.websocket("/sessions/{session_id}/ws")
+async def chat_websocket(websocket: WebSocket, session_id: str):
+    """会话的 WebSocket 对话通道"""
+    if not await session_registry.resume(session_id):
+        await websocket.close(code=_CLOSE_POLICY_VIOLATION, reason="session not found")
+        return
+    
+    await websocket.accept()
+    await ChatConnection(websocket, session_id).run()
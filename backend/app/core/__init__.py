@@ -4,7 +4,26 @@
 提供应用的基础配置、LLM客户端连接等核心功能。
 """
 
+from .cassette import Cassette, CassetteMissError, cassette_scope
 from .config import settings
-from .llm_client import LLMClient
+from .llm_client import LLMClient, Priority, RequestScheduler
+from .metrics import metrics_registry
+from .tracing import span, flush_traces
+from .usage import BudgetExceededError, CallUsage, SessionUsage, UsageLedger
 
-__all__ = ["settings", "LLMClient"]
\ No newline at end of file
+__all__ = [
+    "settings",
+    "LLMClient",
+    "Priority",
+    "RequestScheduler",
+    "metrics_registry",
+    "span",
+    "flush_traces",
+    "BudgetExceededError",
+    "CallUsage",
+    "SessionUsage",
+    "UsageLedger",
+    "Cassette",
+    "CassetteMissError",
+    "cassette_scope"
+]
\ No newline at end of file
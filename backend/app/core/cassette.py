@@ -0,0 +1,182 @@
+"""
+LLM 调用录制 / 回放
+
+录制模式下，每次成功的 LLM 调用按 请求键 追加一行到 JSONL 文件；
+回放模式下不访问上游，按请求键从文件中取回当时的回复（含流式分段与 usage）。
+
+请求键即 LLMClient 的去重键：模型、消息与采样参数的规范化哈希，
+流式与非流式请求共用同一个键。文件中只保存键、不保存请求内容，体积与回复总长度相当。
+
+同一请求可能被发出多次（例如不同会话的开场白完全相同，而采样温度不为 0），
+因此每条记录还带有录制时的作用域（会话 ID），回放时同一 (作用域, 键) 的记录按录制顺序依次取用，
+用完后重复最后一条；当前作用域下没有记录时退回到任意作用域的同键记录。
+作用域由 DialogueManager 通过 cassette_scope() 设置。
+
+回放默认不等待，按 CPU 速度运行；LLM_CASSETTE_LATENCY 为正数时按录制时延迟的该倍数等待。
+"""
+import asyncio
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from app.core.config import settings
+
+
+MODES = ("off", "record", "replay")
+
+_scope: ContextVar[str] = ContextVar("cassette_scope", default="")
+
+
+@contextmanager
+def cassette_scope(name: str | None):
+    """在 with 块内把录制 / 回放的作用域设为 name（通常是会话 ID）"""
+    token = _scope.set(name or "")
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+class CassetteMissError(LookupError):
+    """回放模式下找不到请求对应的录制记录"""
+
+
+class CassetteEntry:
+    """一次调用的录制结果"""
+    
+    __slots__ = ("content", "chunks", "usage", "latency", "ttft")
+    
+    def __init__(
+        self,
+        content: str,
+        chunks: list[str] | None = None,
+        usage: dict | None = None,
+        latency: float = 0.0,
+        ttft: float | None = None
+    ):
+        self.content = content
+        self.chunks = chunks    # 流式调用时的分段，非流式为 None
+        self.usage = usage      # 上游返回的 usage
+        self.latency = latency  # 录制时的总耗时（秒）
+        self.ttft = ttft        # 录制时的首 token 延迟（秒），非流式为 None
+
+
+class Cassette:
+    """录制 / 回放文件"""
+    
+    def __init__(self, path: str | Path, mode: str, latency_scale: float = 0.0):
+        """
+        Args:
+            path: JSONL 文件路径
+            mode: record 或 replay
+            latency_scale: 回放时按录制延迟的多少倍等待（0 表示不等待）
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"未知的录制模式: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency_scale = latency_scale
+        
+        # (作用域, 请求键) -> 按录制顺序的记录；请求键 -> 任意作用域的记录
+        self._entries: dict[tuple[str, str], list[CassetteEntry]] = {}
+        self._by_key: dict[str, list[CassetteEntry]] = {}
+        self._cursors: dict[tuple[str, str], int] = {}
+        self._file = None
+        self.recorded = 0
+        self.replayed = 0
+        
+        if mode == "replay":
+            self._load()
+    
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+    
+    def lookup(self, key: str) -> CassetteEntry:
+        """
+        取出请求对应的下一条录制记录
+        
+        Raises:
+            CassetteMissError: 没有该请求的录制记录
+        """
+        scope_key = (_scope.get(), key)
+        entries = self._entries.get(scope_key) or self._by_key.get(key)
+        if not entries:
+            raise CassetteMissError(f"录制文件中没有该请求: {key[:16]}（作用域 {scope_key[0]!r}）")
+        cursor = self._cursors.get(scope_key, 0)
+        self._cursors[scope_key] = cursor + 1
+        self.replayed += 1
+        return entries[min(cursor, len(entries) - 1)]
+    
+    def record(self, key: str, entry: CassetteEntry):
+        """追加一条录制记录（逐条写入，进程中断时已完成的调用不会丢失）"""
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        line = {
+            "key": key,
+            "scope": _scope.get(),
+            "content": entry.content,
+            "usage": entry.usage,
+            "latency": round(entry.latency, 4)
+        }
+        if entry.chunks is not None:
+            line["chunks"] = entry.chunks
+            line["ttft"] = round(entry.ttft or 0.0, 4)
+        self._file.write(json.dumps(line, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._file.flush()
+        self.recorded += 1
+    
+    async def wait(self, seconds: float | None):
+        """按倍数模拟录制时的延迟"""
+        if self.latency_scale > 0 and seconds:
+            await asyncio.sleep(seconds * self.latency_scale)
+    
+    def rewind(self):
+        """回放游标归零（同一进程内重新回放）"""
+        self._cursors.clear()
+    
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+    
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "entries": sum(len(entries) for entries in self._entries.values()),
+            "recorded": self.recorded,
+            "replayed": self.replayed
+        }
+    
+    def _load(self):
+        if not self.path.exists():
+            raise FileNotFoundError(f"录制文件不存在: {self.path}")
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    data = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # 录制中断时末行可能不完整
+                entry = CassetteEntry(
+                    data["content"],
+                    chunks=data.get("chunks"),
+                    usage=data.get("usage"),
+                    latency=data.get("latency", 0.0),
+                    ttft=data.get("ttft")
+                )
+                self._entries.setdefault((data.get("scope", ""), data["key"]), []).append(entry)
+                self._by_key.setdefault(data["key"], []).append(entry)
+
+
+def open_cassette() -> Cassette | None:
+    """按配置打开录制文件（LLM_CASSETTE_MODE 为 off 时返回 None）"""
+    mode = settings.LLM_CASSETTE_MODE
+    if mode not in MODES:
+        raise ValueError(f"LLM_CASSETTE_MODE 只能是 {'/'.join(MODES)}: {mode}")
+    if mode == "off":
+        return None
+    if not settings.LLM_CASSETTE_PATH:
+        raise ValueError("开启录制 / 回放时需要配置 LLM_CASSETTE_PATH")
+    return Cassette(settings.LLM_CASSETTE_PATH, mode, settings.LLM_CASSETTE_LATENCY)
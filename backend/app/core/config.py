@@ -5,6 +5,8 @@ from pydantic_settings import BaseSettings
 from typing import Optional
 from pathlib import Path
 
+from app.core.lazy import LazyProxy
+
 # 获取项目根目录
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
@@ -23,9 +25,63 @@ class Settings(BaseSettings):
     MODEL_B_TEMPERATURE: float = 0.3
     MODEL_A_MAX_TOKENS: int = 800
     MODEL_B_MAX_TOKENS: int = 2000
+    MODEL_B_CACHE_SIZE: int = 256  # 分析结果缓存条数（0 表示关闭）
+    MODEL_B_INCREMENTAL: bool = False  # 分析时只发送上次分析之后新增的轮次
+    MODEL_A_PROMPT_CACHE_CONTROL: bool = False  # 为情境设定标记显式缓存断点（上游支持时开启）
+    
+    # LLM 请求调度配置
+    LLM_INITIAL_CONCURRENCY: int = 8  # 初始并发上限
+    LLM_MIN_CONCURRENCY: int = 2  # 自适应并发下限（需大于为实时对话预留的槽位数）
+    LLM_MAX_CONCURRENCY: int = 64  # 自适应并发上限
+    LLM_INTERACTIVE_RESERVED_SLOTS: int = 1  # 为实时对话（INTERACTIVE）预留的并发槽位数
+    LLM_LATENCY_TARGET: float = 5.0  # 流式首 token 延迟目标（秒），超过时收缩并发
+    LLM_MAX_RETRIES: int = 3  # 429/5xx/网络错误的最大重试次数
+    LLM_RETRY_BASE_DELAY: float = 0.5  # 重试退避基准（秒）
+    LLM_CASSETTE_MODE: str = "off"  # 录制 / 回放：off、record（录制真实调用）、replay（只从录制文件回放）
+    LLM_CASSETTE_PATH: str = ""  # 录制文件路径（JSONL）
+    LLM_CASSETTE_LATENCY: float = 0.0  # 回放时按录制延迟的多少倍等待（0 表示不等待）
+    LLM_PRICING: dict[str, list[float]] = {}  # 模型价格：{"模型名": [每百万输入 token, 每百万输出 token]}
     
     # 对话配置
     MAX_CONTEXT_TURNS: int = 10  # 最大上下文轮数
+    MAX_CONTEXT_TOKENS: int = 4000  # 上下文窗口的 token 预算（估算值）
+    CONTEXT_SUMMARY_MAX_CHARS: int = 800  # 早期轮次滚动摘要的最大字符数
+    
+    # 后台预分析配置
+    ANALYSIS_PREFETCH_EVERY_N_TURNS: int = 0  # 每隔几轮在后台预先分析一次（0 表示关闭）
+    ANALYSIS_PREFETCH_CONCURRENCY: int = 2  # 全进程同时进行的预分析上限
+    ANALYSIS_PREFETCH_MAX_RUNS: int = 20  # 每个会话最多发起的预分析次数
+    ANALYSIS_PREFETCH_COST_BUDGET: float = 0.0  # 每个会话预分析的费用上限，计入会话预算（0 表示只受会话预算约束）
+    
+    # 情境配置
+    SCENARIO_DIR: str = ""  # 情境文件目录（为空时使用 app/data/scenarios）
+    SCENARIO_RELOAD_INTERVAL: float = 2.0  # 检查情境文件变化的最短间隔（秒，0 表示不热加载）
+    
+    # 会话配置
+    MAX_SESSIONS: int = 10000  # 同时驻留内存的最大会话数（超出后淘汰最久未活动的空闲会话）
+    SESSION_DB_PATH: str = ""  # 会话持久化 SQLite 文件路径（为空表示不持久化）
+    SESSION_FLUSH_INTERVAL: float = 0.5  # 后台批量写入的间隔（秒）
+    SESSION_FLUSH_BATCH: int = 1000  # 积压写入达到该条数时立即触发写入
+    SESSION_RESUME_MESSAGES: int = 200  # 恢复会话时加载到内存的最近消息数
+    SESSION_TOKEN_BUDGET: int = 0  # 每个会话的 token 预算（0 表示不限）
+    SESSION_COST_BUDGET: float = 0.0  # 每个会话的费用预算，按 LLM_PRICING 计算（0 表示不限）
+    
+    # API 服务配置
+    API_HOST: str = "127.0.0.1"
+    API_PORT: int = 8000
+    API_WORKERS: int = 1  # uvicorn 工作进程数（多进程时需要在负载均衡层按会话 ID 保持亲和）
+    API_CORS_ORIGINS: str = ""  # 允许跨域的来源，逗号分隔（为空表示不启用 CORS）
+    WS_SEND_QUEUE_SIZE: int = 64  # WebSocket 每个连接待发送消息的队列上限
+    WS_SEND_TIMEOUT: float = 10.0  # 队列满时等待客户端消费的最长时间（秒），超时断开
+    
+    # 追踪配置
+    TRACE_FILE: str = ""  # span 输出文件（OTLP/JSON，每行一个导出请求；为空表示关闭追踪）
+    TRACE_EXPORT_BATCH: int = 256  # 攒够多少个 span 写一次文件
+    
+    # 指标配置
+    METRICS_ENABLED: bool = True  # API 服务是否暴露 /metrics
+    METRICS_FILE: str = ""  # CLI 的旁路指标文件（Prometheus 文本格式，为空表示不写）
+    METRICS_FILE_INTERVAL: float = 10.0  # 旁路指标文件的写入间隔（秒）
     
     # 开发配置
     DEBUG: bool = False
@@ -36,5 +92,5 @@ class Settings(BaseSettings):
         case_sensitive = True
 
 
-# 创建全局配置实例
-settings = Settings()
\ No newline at end of file
+# 全局配置实例（首次访问时才读取环境变量与 .env）
+settings: Settings = LazyProxy(Settings)  # type: ignore[assignment]
\ No newline at end of file
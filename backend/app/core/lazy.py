@@ -0,0 +1,58 @@
+"""
+延迟初始化的全局单例
+
+模块级单例（配置、LLM 客户端、各服务）用 LazyProxy 包装：
+导入模块时不创建对象，第一次访问属性时才调用工厂函数构造，
+之后的属性读写都转发给真实对象。
+"""
+import threading
+from typing import Callable, Generic, TypeVar
+
+
+T = TypeVar("T")
+
+
+class LazyProxy(Generic[T]):
+    """首次访问时才构造目标对象的代理"""
+    
+    __slots__ = ("_factory", "_instance", "_lock")
+    
+    def __init__(self, factory: Callable[[], T]):
+        """
+        Args:
+            factory: 构造目标对象的零参函数
+        """
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_instance", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+    
+    def _resolve(self) -> T:
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                instance = self._instance
+                if instance is None:
+                    instance = self._factory()
+                    object.__setattr__(self, "_instance", instance)
+        return instance
+    
+    def __getattr__(self, name: str):
+        return getattr(self._resolve(), name)
+    
+    def __setattr__(self, name: str, value):
+        setattr(self._resolve(), name, value)
+    
+    def __repr__(self) -> str:
+        if self._instance is None:
+            return f"<LazyProxy of {getattr(self._factory, '__qualname__', self._factory)} (未初始化)>"
+        return repr(self._instance)
+
+
+def resolve(obj: T) -> T:
+    """取出代理背后的真实对象（不是代理时原样返回）"""
+    return obj._resolve() if isinstance(obj, LazyProxy) else obj
+
+
+def is_initialized(obj) -> bool:
+    """代理的目标对象是否已经构造"""
+    return not isinstance(obj, LazyProxy) or obj._instance is not None
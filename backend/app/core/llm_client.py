@@ -1,9 +1,208 @@
 """
 LLM 调用客户端封装
 """
+import asyncio
+import hashlib
+import heapq
+import itertools
+import json
+import random
+import time
 import httpx
-from typing import Optional
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import AsyncIterator, Awaitable, Callable, Optional
+from app.core.cassette import CassetteEntry, open_cassette
 from app.core.config import settings
+from app.core.lazy import LazyProxy
+from app.core.tokens import estimate_tokens
+from app.core.tracing import NoopSpan, Span, span, start_span
+from app.core.usage import (
+    BudgetReservation,
+    CallUsage,
+    SessionUsage,
+    UsageLedger,
+    estimate_prompt_tokens
+)
+
+
+# 流式回调：每收到一段增量文本调用一次
+ChunkCallback = Callable[[str], Awaitable[None]]
+
+
+# SSE 流结束标记
+_STREAM_DONE = object()
+
+
+class Priority(IntEnum):
+    """请求优先级（数值越小越优先）"""
+    INTERACTIVE = 0  # Model A 实时对话
+    ANALYSIS = 1     # 用户主动触发的 Model B 分析
+    BACKGROUND = 2   # 后台预分析、批量任务
+
+
+class RequestScheduler:
+    """
+    优先级请求调度器
+    
+    - 并发槽位按优先级分配，同优先级先到先得
+    - 非 INTERACTIVE 请求最多占用 上限 - 预留数 个槽位（至少 1 个），
+      分析与批量任务再多也不会占满全部槽位，实时对话总有空位
+    - 并发上限按 AIMD 自适应：请求顺利时缓慢加性增长，
+      遇到 429/5xx/超时时乘性减半，流式首 token 延迟超过目标时小幅收缩
+      （非流式调用的总耗时取决于输出长度，不作为延迟信号）
+    """
+    
+    def __init__(
+        self,
+        initial_limit: int | None = None,
+        min_limit: int | None = None,
+        max_limit: int | None = None,
+        latency_target: float | None = None,
+        reserved_interactive: int | None = None
+    ):
+        self.min_limit = min_limit or settings.LLM_MIN_CONCURRENCY
+        self.max_limit = max_limit or settings.LLM_MAX_CONCURRENCY
+        self.latency_target = latency_target or settings.LLM_LATENCY_TARGET
+        self.limit = float(initial_limit or settings.LLM_INITIAL_CONCURRENCY)
+        self.reserved_interactive = (
+            settings.LLM_INTERACTIVE_RESERVED_SLOTS if reserved_interactive is None
+            else reserved_interactive
+        )
+        
+        self.in_flight = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        
+        # 统计
+        self.completed = 0
+        self.overloaded = 0
+        self.retries = 0
+    
+    @asynccontextmanager
+    async def slot(self, priority: Priority = Priority.ANALYSIS, parent: Span | NoopSpan | None = None):
+        """
+        占用一个并发槽位（as 目标为本次排队等待的秒数）
+        
+        Args:
+            priority: 调度优先级
+            parent: 排队 span 的父 span，默认为当前 span
+        """
+        start = time.monotonic()
+        with span("llm.queue", {"llm.priority": priority.name}, parent=parent):
+            await self.acquire(priority)
+        try:
+            yield time.monotonic() - start
+        finally:
+            self.release()
+    
+    async def acquire(self, priority: Priority = Priority.ANALYSIS):
+        """按优先级等待并发槽位"""
+        if not self._has_waiters() and self.in_flight < self._capacity(priority):
+            self.in_flight += 1
+            return
+        
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._seq), future))
+        # 队首可能是被预留槽位挡住的低优先级请求，高优先级请求到来时可能可以立即分配
+        self._wake()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # 已分配到槽位但调用方被取消，需要归还
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+    
+    def release(self):
+        """归还并发槽位"""
+        self.in_flight -= 1
+        self._wake()
+    
+    def record_success(self, latency: float | None = None):
+        """
+        记录一次成功请求，调整并发上限
+        
+        Args:
+            latency: 流式调用的首 token 延迟（秒）；非流式调用不提供，只做加性增长
+        """
+        self.completed += 1
+        if latency is not None and latency > self.latency_target:
+            self.limit = max(self.min_limit, self.limit * 0.9)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self._wake()
+    
+    def record_overload(self):
+        """记录一次限流/服务端错误，并发上限减半"""
+        self.overloaded += 1
+        self.limit = max(self.min_limit, self.limit / 2)
+    
+    def stats(self) -> dict:
+        """调度器统计（含各优先级排队深度）"""
+        queued = {p.name.lower(): 0 for p in Priority}
+        for priority, _, future in self._waiters:
+            if not future.done():
+                queued[Priority(priority).name.lower()] += 1
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": queued,
+            "completed": self.completed,
+            "overloaded": self.overloaded,
+            "retries": self.retries
+        }
+    
+    def _capacity(self, priority: int) -> int:
+        """该优先级的请求可用的槽位数（含已占用）"""
+        limit = int(self.limit)
+        if priority == Priority.INTERACTIVE:
+            return limit
+        return max(1, limit - self.reserved_interactive)
+    
+    def _has_waiters(self) -> bool:
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+        return bool(self._waiters)
+    
+    def _wake(self):
+        """把空出的槽位按优先级分给排队中的请求"""
+        while self._has_waiters():
+            priority, _, future = self._waiters[0]
+            # 队首优先级最高：它分不到槽位时，其后的请求（优先级相同或更低）也分不到
+            if self.in_flight >= self._capacity(priority):
+                return
+            heapq.heappop(self._waiters)
+            self.in_flight += 1
+            future.set_result(None)
+
+
+class _InflightRequest:
+    """单飞去重中的一次在途上游请求"""
+    
+    __slots__ = ("task", "waiters")
+    
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0  # 仍在等待该请求结果的调用方数
+
+
+class LLMClientHooks:
+    """
+    LLMClient 事件回调
+    
+    指标等观察者继承后覆盖需要的方法，并加入 llm_client.hooks。
+    回调在请求所在的事件循环中同步执行，应当只做简单的计数。
+    """
+    
+    def on_call(self, call: CallUsage, priority: Priority):
+        """一次调用成功完成"""
+    
+    def on_first_token(self, ttft: float, priority: Priority):
+        """流式调用收到首个 token（秒）"""
+    
+    def on_error(self, error: httpx.HTTPError, retrying: bool):
+        """一次上游请求失败，retrying 表示之后会重试"""
 
 
 class LLMClient:
@@ -12,7 +211,23 @@ class LLMClient:
     def __init__(self):
         self.base_url = settings.AIHUBMIX_BASE_URL
         self.api_key = settings.AIHUBMIX_API_KEY
-        self.client = httpx.AsyncClient(timeout=60.0)
+        self.client = self._create_client()
+        self.scheduler = RequestScheduler()
+        self.max_retries = settings.LLM_MAX_RETRIES
+        self.retry_base_delay = settings.LLM_RETRY_BASE_DELAY
+        
+        # 单飞去重：相同请求在途时共享同一次上游调用
+        self._inflight: dict[str, _InflightRequest] = {}
+        self.coalesced = 0
+        
+        # 按模型汇总的用量
+        self.usage = UsageLedger()
+        
+        # 事件回调（指标等）
+        self.hooks: list[LLMClientHooks] = []
+        
+        # 录制 / 回放（LLM_CASSETTE_MODE 为 off 时为 None）
+        self.cassette = open_cassette()
     
     async def chat_completion(
         self,
@@ -20,26 +235,485 @@ class LLMClient:
         model: str,
         temperature: float = 0.7,
         max_tokens: int = 1000,
-        stream: bool = False
+        stream: bool = False,
+        priority: Priority = Priority.ANALYSIS,
+        usage: SessionUsage | None = None
     ) -> str:
         """
         调用聊天补全 API
         
+        非流式请求会做单飞去重：(model, messages, temperature, max_tokens) 完全相同
+        且同时在途的请求共享一次上游调用和同一个结果。
+        
         Args:
             messages: 消息列表（OpenAI 格式）
             model: 模型名称
             temperature: 温度参数
             max_tokens: 最大 token 数
-            stream: 是否流式输出
+            stream: 是否流式输出（为 True 时内部按流式接收并拼接完整回复）
+            priority: 调度优先级
+            usage: 会话用量，提供时发送前检查并预留其预算，完成后把本次用量记入其中
         
         Returns:
             模型回复内容
+        
+        Raises:
+            BudgetExceededError: 会话预算不足，请求未发送
         """
-        headers = {
+        if stream:
+            chunks = []
+            async for chunk in self.stream_chat_completion(
+                messages, model, temperature=temperature, max_tokens=max_tokens,
+                priority=priority, usage=usage
+            ):
+                chunks.append(chunk)
+            return "".join(chunks)
+        
+        reservation = usage.check(model, messages, max_tokens) if usage is not None else None
+        payload = self._build_payload(messages, model, temperature, max_tokens, stream=False)
+        
+        if self.cassette is not None and self.cassette.replaying:
+            try:
+                return await self._replay(payload, messages, priority, usage, reservation)
+            finally:
+                SessionUsage.release(reservation)
+        
+        try:
+            with span("llm.chat_completion", {"llm.model": model, "llm.priority": priority.name}) as current:
+                start = time.monotonic()
+                data, queue_time, retries, coalesced = await self._post_coalesced(payload, priority)
+                content = data["choices"][0]["message"]["content"]
+                call = self._call_usage(model, messages, content, data.get("usage"))
+                call.wall_time = time.monotonic() - start
+                call.queue_time = queue_time
+                call.retries = retries
+                if coalesced:
+                    # 上游只调用了一次，token 记在发起请求的一方
+                    call.prompt_tokens = call.completion_tokens = call.cached_tokens = 0
+                    call.coalesced = True
+                elif self.cassette is not None:
+                    self.cassette.record(
+                        self._request_key(payload),
+                        CassetteEntry(content, usage=data.get("usage"), latency=call.wall_time)
+                    )
+                self._record_usage(call, usage, current, priority, reservation)
+            return content
+            
+        except httpx.HTTPError as e:
+            print(f"HTTP 错误: {e}")
+            raise
+        except Exception as e:
+            print(f"调用 LLM 时出错: {e}")
+            raise
+        finally:
+            SessionUsage.release(reservation)
+    
+    async def stream_chat_completion(
+        self,
+        messages: list[dict],
+        model: str,
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        priority: Priority = Priority.INTERACTIVE,
+        usage: SessionUsage | None = None
+    ) -> AsyncIterator[str]:
+        """
+        流式调用聊天补全 API
+        
+        逐行解析 SSE 响应，每收到一段增量内容就立即产出。
+        尚未产出任何内容前遇到可重试错误会自动重试。
+        流结束后记录用量（上游未在末尾返回 usage 时按文本估算）。
+        
+        Args:
+            messages: 消息列表（OpenAI 格式）
+            model: 模型名称
+            temperature: 温度参数
+            max_tokens: 最大 token 数
+            priority: 调度优先级
+            usage: 会话用量，提供时发送前检查并预留其预算，完成后把本次用量记入其中
+        
+        Yields:
+            回复内容的增量文本
+        
+        Raises:
+            BudgetExceededError: 会话预算不足，请求未发送
+        """
+        reservation = usage.check(model, messages, max_tokens) if usage is not None else None
+        payload = self._build_payload(messages, model, temperature, max_tokens, stream=True)
+        
+        if self.cassette is not None and self.cassette.replaying:
+            try:
+                async for delta in self._replay_stream(payload, messages, priority, usage, reservation):
+                    yield delta
+            finally:
+                SessionUsage.release(reservation)
+            return
+        
+        # 生成器跨越 yield，span 不设为当前 span，结束时也不重置 ContextVar
+        current = start_span("llm.stream", {"llm.model": model, "llm.priority": priority.name})
+        try:
+            call_start = time.monotonic()
+            queue_time = 0.0
+            attempt = 0
+            while True:
+                yielded = False
+                error: httpx.HTTPError | None = None
+                try:
+                    async with self.scheduler.slot(priority, parent=current) as waited:
+                        queue_time += waited
+                        start = time.monotonic()
+                        chunks: list[str] = []
+                        reported = None
+                        ttft = None
+                        http = start_span("llm.http", {"llm.attempt": attempt}, parent=current)
+                        try:
+                            async with self.client.stream(
+                                "POST",
+                                f"{self.base_url}/chat/completions",
+                                headers=self._headers(),
+                                json=payload
+                            ) as response:
+                                http.set_attribute("http.status_code", response.status_code)
+                                response.raise_for_status()
+                                async for line in response.aiter_lines():
+                                    chunk = self._parse_sse_line(line)
+                                    if chunk is None:
+                                        continue
+                                    if chunk is _STREAM_DONE:
+                                        break
+                                    reported = chunk.get("usage") or reported
+                                    delta = self._chunk_delta(chunk)
+                                    if delta is None:
+                                        continue
+                                    if not yielded:
+                                        # 以首个 token 的到达时间作为延迟信号
+                                        ttft = time.monotonic() - start
+                                        self.scheduler.record_success(ttft)
+                                        current.set_attribute("llm.ttft", ttft)
+                                        for hook in self.hooks:
+                                            hook.on_first_token(ttft, priority)
+                                        yielded = True
+                                    chunks.append(delta)
+                                    yield delta
+                        except BaseException as e:
+                            http.end(e)
+                            raise
+                        finally:
+                            http.end()
+                        content = "".join(chunks)
+                        call = self._call_usage(model, messages, content, reported)
+                        call.wall_time = time.monotonic() - call_start
+                        call.queue_time = queue_time
+                        call.retries = attempt
+                        if self.cassette is not None:
+                            self.cassette.record(
+                                self._request_key(payload),
+                                CassetteEntry(content, chunks, reported, call.wall_time, ttft)
+                            )
+                        self._record_usage(call, usage, current, priority, reservation)
+                        return
+                        
+                except httpx.HTTPError as e:
+                    retryable = not yielded and self._is_retryable(e)
+                    self._emit_error(e, retryable and attempt < self.max_retries)
+                    if not retryable:
+                        print(f"HTTP 错误: {e}")
+                        raise
+                    self.scheduler.record_overload()
+                    error = e
+                
+                if attempt >= self.max_retries:
+                    print(f"HTTP 错误: {error}")
+                    raise error
+                await asyncio.sleep(self._retry_delay(attempt, error))
+                attempt += 1
+                self.scheduler.retries += 1
+        except BaseException as e:
+            current.end(e)
+            raise
+        finally:
+            SessionUsage.release(reservation)
+            current.end()
+    
+    async def _replay(
+        self,
+        payload: dict,
+        messages: list[dict],
+        priority: Priority,
+        usage: SessionUsage | None,
+        reservation: BudgetReservation | None = None
+    ) -> str:
+        """从录制文件回放非流式调用（不经过调度器，不访问上游）"""
+        model = payload["model"]
+        with span("llm.replay", {"llm.model": model, "llm.priority": priority.name}) as current:
+            start = time.monotonic()
+            entry = self.cassette.lookup(self._request_key(payload))
+            await self.cassette.wait(entry.latency)
+            call = self._call_usage(model, messages, entry.content, entry.usage)
+            call.wall_time = time.monotonic() - start
+            self._record_usage(call, usage, current, priority, reservation)
+        return entry.content
+    
+    async def _replay_stream(
+        self,
+        payload: dict,
+        messages: list[dict],
+        priority: Priority,
+        usage: SessionUsage | None,
+        reservation: BudgetReservation | None = None
+    ) -> AsyncIterator[str]:
+        """从录制文件回放流式调用（按录制时的分段产出）"""
+        model = payload["model"]
+        current = start_span("llm.replay", {"llm.model": model, "llm.priority": priority.name})
+        try:
+            start = time.monotonic()
+            entry = self.cassette.lookup(self._request_key(payload))
+            chunks = entry.chunks if entry.chunks is not None else [entry.content]
+            ttft = entry.ttft if entry.ttft is not None else entry.latency
+            await self.cassette.wait(ttft)
+            for hook in self.hooks:
+                hook.on_first_token(time.monotonic() - start, priority)
+            interval = max(0.0, entry.latency - ttft) / max(1, len(chunks) - 1)
+            for i, delta in enumerate(chunks):
+                if i:
+                    await self.cassette.wait(interval)
+                yield delta
+            call = self._call_usage(model, messages, entry.content, entry.usage)
+            call.wall_time = time.monotonic() - start
+            self._record_usage(call, usage, current, priority, reservation)
+        except BaseException as e:
+            current.end(e)
+            raise
+        finally:
+            current.end()
+    
+    async def _post_coalesced(
+        self,
+        payload: dict,
+        priority: Priority
+    ) -> tuple[dict, float, int, bool]:
+        """
+        相同请求在途时复用其结果，否则发起新请求
+        
+        Returns:
+            (响应体, 排队秒数, 重试次数, 是否复用了在途请求)
+        """
+        key = self._request_key(payload)
+        inflight = self._inflight.get(key)
+        coalesced = inflight is not None
+        if inflight is None:
+            inflight = _InflightRequest(asyncio.create_task(self._post_with_retry(payload, priority)))
+            self._inflight[key] = inflight
+            inflight.task.add_done_callback(lambda t: self._forget_inflight(key, inflight))
+        else:
+            self.coalesced += 1
+        
+        # shield：某个等待方被取消时不影响其他等待方；最后一个等待方离开时才取消上游请求
+        inflight.waiters += 1
+        try:
+            data, queue_time, retries = await asyncio.shield(inflight.task)
+        finally:
+            inflight.waiters -= 1
+            if not inflight.waiters and not inflight.task.done():
+                inflight.task.cancel()
+                self._forget_inflight(key, inflight)
+        return data, queue_time, retries, coalesced
+    
+    def _forget_inflight(self, key: str, inflight: _InflightRequest):
+        """在途请求结束（或被取消）后移除登记，之后的相同请求会重新发起"""
+        if self._inflight.get(key) is inflight:
+            del self._inflight[key]
+        task = inflight.task
+        if task.done() and not task.cancelled():
+            task.exception()  # 标记异常已被读取，避免无人等待时告警
+    
+    @staticmethod
+    def _request_key(payload: dict) -> str:
+        """请求去重键：模型、消息与采样参数的规范化哈希"""
+        raw = json.dumps(
+            [payload["model"], payload["messages"], payload["temperature"], payload["max_tokens"]],
+            ensure_ascii=False,
+            separators=(",", ":"),
+            sort_keys=True
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    
+    async def _post_with_retry(self, payload: dict, priority: Priority) -> tuple[dict, float, int]:
+        """
+        经调度器发送非流式请求，可重试错误按带抖动的指数退避重试
+        
+        退避等待期间不占用并发槽位。
+        
+        Returns:
+            (响应体, 排队秒数, 重试次数)
+        """
+        queue_time = 0.0
+        attempt = 0
+        while True:
+            async with self.scheduler.slot(priority) as waited:
+                queue_time += waited
+                try:
+                    with span("llm.http", {"llm.attempt": attempt}) as http:
+                        response = await self.client.post(
+                            f"{self.base_url}/chat/completions",
+                            headers=self._headers(),
+                            json=payload
+                        )
+                        http.set_attribute("http.status_code", response.status_code)
+                        response.raise_for_status()
+                except httpx.HTTPError as e:
+                    retryable = self._is_retryable(e)
+                    self._emit_error(e, retryable and attempt < self.max_retries)
+                    if not retryable:
+                        raise
+                    self.scheduler.record_overload()
+                    error = e
+                else:
+                    self.scheduler.record_success()
+                    return response.json(), queue_time, attempt
+            
+            if attempt >= self.max_retries:
+                raise error
+            await asyncio.sleep(self._retry_delay(attempt, error))
+            attempt += 1
+            self.scheduler.retries += 1
+    
+    @staticmethod
+    def _is_retryable(error: httpx.HTTPError) -> bool:
+        """429、5xx 与网络层错误可重试"""
+        if isinstance(error, httpx.HTTPStatusError):
+            status = error.response.status_code
+            return status == 429 or status >= 500
+        return isinstance(error, httpx.TransportError)
+    
+    def _retry_delay(self, attempt: int, error: httpx.HTTPError) -> float:
+        """带完全抖动的指数退避，服务端给出 Retry-After 时以其为下限"""
+        delay = random.uniform(0, self.retry_base_delay * (2 ** attempt))
+        if isinstance(error, httpx.HTTPStatusError):
+            retry_after = error.response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    delay = max(delay, float(retry_after))
+                except ValueError:
+                    pass
+        return delay
+    
+    @staticmethod
+    def _call_usage(model: str, messages: list[dict], content: str, reported: dict | None) -> CallUsage:
+        """根据上游返回的 usage 构造用量记录（含命中 prompt 缓存的 token 数），缺失时按文本估算"""
+        if reported:
+            details = reported.get("prompt_tokens_details") or {}
+            return CallUsage(
+                model,
+                prompt_tokens=reported.get("prompt_tokens") or 0,
+                completion_tokens=reported.get("completion_tokens") or 0,
+                cached_tokens=details.get("cached_tokens") or 0
+            )
+        return CallUsage(
+            model,
+            prompt_tokens=estimate_prompt_tokens(messages),
+            completion_tokens=estimate_tokens(content),
+            estimated=True
+        )
+    
+    def _record_usage(
+        self,
+        call: CallUsage,
+        usage: SessionUsage | None,
+        current: Span | NoopSpan,
+        priority: Priority,
+        reservation: BudgetReservation | None = None
+    ):
+        """记入全局按模型统计与会话用量（结算发送前的预留），标注到当前 span，并通知回调"""
+        self.usage.record(call)
+        if usage is not None:
+            usage.record(call, reservation)
+        for hook in self.hooks:
+            hook.on_call(call, priority)
+        current.set_attribute("llm.prompt_tokens", call.prompt_tokens)
+        current.set_attribute("llm.completion_tokens", call.completion_tokens)
+        if call.cached_tokens:
+            current.set_attribute("llm.cached_tokens", call.cached_tokens)
+        current.set_attribute("llm.queue_time", call.queue_time)
+        current.set_attribute("llm.retries", call.retries)
+        if call.coalesced:
+            current.set_attribute("llm.coalesced", True)
+    
+    def _emit_error(self, error: httpx.HTTPError, retrying: bool):
+        for hook in self.hooks:
+            hook.on_error(error, retrying)
+    
+    def pool_stats(self) -> dict:
+        """
+        连接池使用情况
+        
+        读取 httpx 底层 httpcore 连接池的内部状态，版本不兼容时返回空字典。
+        """
+        pool = getattr(getattr(self.client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is None:
+            return {}
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {
+            "connections": len(connections),
+            "idle": idle,
+            "active": len(connections) - idle,
+            "max": settings.LLM_MAX_CONCURRENCY
+        }
+    
+    def stats(self) -> dict:
+        """客户端统计（调度器排队深度、并发上限、单飞节省的调用数等）"""
+        stats = {
+            **self.scheduler.stats(),
+            "inflight_unique": len(self._inflight),
+            "coalesced": self.coalesced
+        }
+        if self.cassette is not None:
+            stats["cassette"] = self.cassette.stats()
+        return stats
+    
+    @staticmethod
+    def _parse_sse_line(line: str):
+        """
+        解析一行 SSE 数据
+        
+        Returns:
+            数据块（dict）；流结束时返回 _STREAM_DONE；非数据行返回 None
+        """
+        if not line.startswith("data:"):
+            return None
+        
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return _STREAM_DONE
+        
+        return json.loads(data)
+    
+    @staticmethod
+    def _chunk_delta(chunk: dict) -> str | None:
+        """数据块中的增量文本（末尾只带 usage 的块没有 choices）"""
+        choices = chunk.get("choices") or []
+        if not choices:
+            return None
+        
+        return choices[0].get("delta", {}).get("content") or None
+    
+    def _headers(self) -> dict:
+        """请求头"""
+        return {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
-        
+    
+    @staticmethod
+    def _build_payload(
+        messages: list[dict],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        stream: bool
+    ) -> dict:
+        """构建请求体"""
         payload = {
             "model": model,
             "messages": messages,
@@ -47,29 +721,32 @@ class LLMClient:
             "max_tokens": max_tokens,
             "stream": stream
         }
-        
-        try:
-            response = await self.client.post(
-                f"{self.base_url}/chat/completions",
-                headers=headers,
-                json=payload
+        if stream:
+            # 让上游在流的最后一个数据块中返回 usage（OpenAI 兼容接口）
+            payload["stream_options"] = {"include_usage": True}
+        return payload
+    
+    def _create_client(self) -> httpx.AsyncClient:
+        """创建连接池（连接数与调度器的并发上限一致）"""
+        return httpx.AsyncClient(
+            timeout=60.0,
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONCURRENCY,
+                max_keepalive_connections=settings.LLM_MAX_CONCURRENCY
             )
-            response.raise_for_status()
-            
-            data = response.json()
-            return data["choices"][0]["message"]["content"]
-        
-        except httpx.HTTPError as e:
-            print(f"HTTP 错误: {e}")
-            raise
-        except Exception as e:
-            print(f"调用 LLM 时出错: {e}")
-            raise
+        )
+    
+    def open(self):
+        """确保连接池可用（已关闭时重新创建，用于应用重复启动）"""
+        if self.client.is_closed:
+            self.client = self._create_client()
     
     async def close(self):
         """关闭客户端"""
         await self.client.aclose()
+        if self.cassette is not None:
+            self.cassette.close()
 
 
-# 全局单例
-llm_client = LLMClient()
\ No newline at end of file
+# 全局单例（首次使用时创建连接池）
+llm_client: LLMClient = LazyProxy(LLMClient)  # type: ignore[assignment]
\ No newline at end of file
@@ -0,0 +1,279 @@
+"""
+Prometheus 格式的运行指标
+
+提供计数器、仪表与直方图三种指标，以及 Prometheus 文本格式（0.0.4）的导出：
+- API 服务通过 /metrics 暴露
+- CLI 等没有 HTTP 服务的进程用 MetricsFileWriter 定期写入旁路文件
+  （可交给 node_exporter 的 textfile collector 采集）
+
+记录指标只是对 Python 数值的加法与一次二分查找，不加锁：
+指标只在事件循环线程内更新，不会出现并发写。
+仪表可以绑定回调函数，在导出时才读取当前值，不占用热路径。
+多进程部署时每个 worker 各自维护一份指标。
+"""
+import asyncio
+import math
+import os
+from bisect import bisect_left
+from pathlib import Path
+from typing import Callable, Iterable
+
+
+# 默认延迟分桶（秒）
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 60.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    """指标基类：按标签值维护子指标"""
+    
+    type_name = ""
+    
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._children: dict[tuple[str, ...], object] = {}
+        if not self.label_names:
+            self._children[()] = self._new_child()
+    
+    def labels(self, *values: str):
+        """获取某组标签值对应的子指标"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f"{self.name} 需要标签 {self.label_names}")
+            child = self._children[values] = self._new_child()
+        return child
+    
+    def _new_child(self):
+        raise NotImplementedError
+    
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+    
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+    
+    def __init__(self):
+        self.value = 0.0
+    
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+    
+    type_name = "counter"
+    
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+    
+    def inc(self, amount: float = 1.0):
+        self._children[()].inc(amount)
+    
+    def _samples(self) -> Iterable[str]:
+        for values, child in self._children.items():
+            yield f"{self.name}{_format_labels(self.label_names, values)} {_format_value(child.value)}"
+
+
+class _GaugeChild:
+    __slots__ = ("value", "func")
+    
+    def __init__(self):
+        self.value = 0.0
+        self.func: Callable[[], float] | None = None
+    
+    def set(self, value: float):
+        self.value = value
+    
+    def set_function(self, func: Callable[[], float]):
+        """导出时调用 func 读取当前值"""
+        self.func = func
+    
+    def get(self) -> float:
+        if self.func is None:
+            return self.value
+        try:
+            return float(self.func())
+        except Exception as e:
+            print(f"读取指标失败: {e}")
+            return math.nan
+
+
+class Gauge(_Metric):
+    """可增可减的仪表"""
+    
+    type_name = "gauge"
+    
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+    
+    def set(self, value: float):
+        self._children[()].set(value)
+    
+    def set_function(self, func: Callable[[], float]):
+        self._children[()].set_function(func)
+    
+    def _samples(self) -> Iterable[str]:
+        for values, child in self._children.items():
+            value = child.get()
+            rendered = "NaN" if math.isnan(value) else _format_value(value)
+            yield f"{self.name}{_format_labels(self.label_names, values)} {rendered}"
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+    
+    def __init__(self, bounds: tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # 最后一格为 +Inf
+        self.sum = 0.0
+        self.count = 0
+    
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    """分桶直方图（各桶单独计数，导出时再累加为 Prometheus 的累计桶）"""
+    
+    type_name = "histogram"
+    
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Iterable[str] = (),
+        buckets: Iterable[float] = LATENCY_BUCKETS
+    ):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, help, labels)
+    
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.bounds)
+    
+    def observe(self, value: float):
+        self._children[()].observe(value)
+    
+    def _samples(self) -> Iterable[str]:
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.bounds + (math.inf,), child.counts):
+                cumulative += count
+                labels = _format_labels(self.label_names, values, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.label_names, values)
+            yield f"{self.name}_sum{labels} {_format_value(child.sum)}"
+            yield f"{self.name}_count{labels} {child.count}"
+
+
+class MetricsRegistry:
+    """指标注册表"""
+    
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+    
+    def register(self, metric: _Metric) -> _Metric:
+        """注册指标（同名指标只保留第一个并返回它）"""
+        return self._metrics.setdefault(metric.name, metric)
+    
+    def counter(self, name: str, help: str, labels: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+    
+    def gauge(self, name: str, help: str, labels: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labels))
+    
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labels: Iterable[str] = (),
+        buckets: Iterable[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+    
+    def get(self, name: str) -> _Metric | None:
+        return self._metrics.get(name)
+    
+    def render(self) -> str:
+        """导出为 Prometheus 文本格式"""
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+class MetricsFileWriter:
+    """定期把指标写入旁路文件（先写临时文件再替换，采集方不会读到半个文件）"""
+    
+    def __init__(self, registry: MetricsRegistry, path: str | Path, interval: float = 10.0):
+        """
+        Args:
+            registry: 指标注册表
+            path: 输出文件，建议以 .prom 结尾
+            interval: 写入间隔（秒）
+        """
+        self.registry = registry
+        self.path = Path(path)
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+    
+    def write(self):
+        """立即写入一次"""
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(self.registry.render(), encoding="utf-8")
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"❌ 写入指标文件失败 {self.path}: {e}")
+    
+    def start(self):
+        """在当前事件循环中启动定期写入"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+    
+    async def stop(self):
+        """停止定期写入并写入最终结果"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.write()
+    
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.write()
+
+
+# 全局指标注册表
+metrics_registry = MetricsRegistry()
@@ -0,0 +1,15 @@
+"""
+token 数估算
+
+不依赖应用内其他模块，供 models 与 core 共同使用而不产生循环导入。
+"""
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算文本 token 数
+    
+    中文等非 ASCII 字符约 1 字 1 token，ASCII 字符约 4 字符 1 token。
+    """
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return (len(text) - ascii_chars) + (ascii_chars + 3) // 4
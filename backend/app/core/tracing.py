@@ -0,0 +1,272 @@
+"""
+轮次流水线的结构化追踪
+
+用 contextvars 维护当前 span，嵌套的 span 自动成为子 span：
+    
+    with span("dialogue.turn", {"session.id": session_id}) as turn:
+        with span("model_a.system_prompt"):
+            ...
+
+子 span 继承父 span 的会话、情境属性。
+跨越 yield 的区间（异步生成器）用 start_span() 显式开始、end() 结束，
+不写入 contextvars，其中的子 span 通过 parent 指定父 span。
+结束的 span 先放入缓冲区，
+攒够一批后按 OTLP/JSON（ExportTraceServiceRequest）格式追加写入 TRACE_FILE，
+每行一个请求，可直接用 OpenTelemetry Collector 的 otlpjsonfile 接收器导入。
+
+未配置 TRACE_FILE 时 span() 直接返回共享的空 span，不分配对象、不读时钟。
+"""
+import asyncio
+import atexit
+import json
+import random
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+
+from app.core.config import settings
+
+
+SERVICE_NAME = "affective-dialogue-simulator"
+
+# 子 span 自动继承的属性
+INHERITED_ATTRIBUTES = ("session.id", "scenario.id")
+
+# OTLP span 状态码
+_STATUS_OK = 1
+_STATUS_ERROR = 2
+
+_current_span: ContextVar["Span | None"] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """一个计时区间"""
+    
+    __slots__ = (
+        "tracer", "name", "trace_id", "span_id", "parent_id",
+        "attributes", "start_ns", "end_ns", "error", "_token"
+    )
+    
+    def __init__(self, tracer: "Tracer", name: str, attributes: dict | None, parent: "Span | None"):
+        self.tracer = tracer
+        self.name = name
+        self.span_id = f"{random.getrandbits(64):016x}"
+        if parent is None:
+            self.trace_id = f"{random.getrandbits(128):032x}"
+            self.parent_id = ""
+            self.attributes = {}
+        else:
+            self.trace_id = parent.trace_id
+            self.parent_id = parent.span_id
+            self.attributes = {
+                key: parent.attributes[key] for key in INHERITED_ATTRIBUTES if key in parent.attributes
+            }
+        if attributes:
+            self.attributes.update(attributes)
+        self.start_ns = 0
+        self.end_ns = 0
+        self.error: str | None = None
+        self._token = None
+    
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+    
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        self.start_ns = time.time_ns()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        _current_span.reset(self._token)
+        self.end(exc)
+        return False
+    
+    def end(self, exc: BaseException | None = None):
+        """
+        结束 span 并交给追踪器（不改动当前 span，重复调用无效）
+        
+        Args:
+            exc: 导致区间结束的异常，取消类异常记为 cancelled 属性
+        """
+        if self.end_ns:
+            return
+        self.end_ns = time.time_ns()
+        if exc is not None:
+            if isinstance(exc, (asyncio.CancelledError, GeneratorExit)):
+                self.attributes["cancelled"] = True
+            else:
+                self.error = f"{type(exc).__name__}: {exc}"
+        self.tracer._finish(self)
+    
+    def to_otlp(self) -> dict:
+        """转为 OTLP/JSON 的 Span 对象"""
+        data = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": (
+                {"code": _STATUS_ERROR, "message": self.error} if self.error else {"code": _STATUS_OK}
+            )
+        }
+        if self.parent_id:
+            data["parentSpanId"] = self.parent_id
+        return data
+
+
+class NoopSpan:
+    """追踪关闭时使用的空 span"""
+    
+    __slots__ = ()
+    
+    def set_attribute(self, key: str, value):
+        pass
+    
+    def __enter__(self) -> "NoopSpan":
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+    
+    def end(self, exc: BaseException | None = None):
+        pass
+
+
+NOOP_SPAN = NoopSpan()
+
+
+def _otlp_attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+class Tracer:
+    """收集 span 并批量写入 OTLP/JSON 文件"""
+    
+    def __init__(self, path: str | Path, batch_size: int | None = None):
+        """
+        Args:
+            path: 输出文件（追加写入，每行一个 ExportTraceServiceRequest）
+            batch_size: 攒够多少个 span 写一次，默认读取 settings.TRACE_EXPORT_BATCH
+        """
+        self.path = Path(path)
+        self.batch_size = batch_size or settings.TRACE_EXPORT_BATCH
+        self._buffer: list[Span] = []
+        self._lock = threading.Lock()
+        self.exported = 0
+    
+    def _finish(self, span: Span):
+        self._buffer.append(span)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+    
+    def flush(self):
+        """把缓冲区中的 span 写入文件"""
+        with self._lock:
+            spans, self._buffer = self._buffer, []
+            if not spans:
+                return
+            request = {
+                "resourceSpans": [{
+                    "resource": {
+                        "attributes": [_otlp_attribute("service.name", SERVICE_NAME)]
+                    },
+                    "scopeSpans": [{
+                        "scope": {"name": "app"},
+                        "spans": [s.to_otlp() for s in spans]
+                    }]
+                }]
+            }
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(request, ensure_ascii=False, separators=(",", ":")) + "\n")
+                self.exported += len(spans)
+            except OSError as e:
+                print(f"❌ 写入追踪文件失败 {self.path}: {e}")
+
+
+# 全局追踪器：首次调用 span() 时按配置创建，未配置 TRACE_FILE 时为 None
+_tracer: Tracer | None = None
+_configured = False
+
+
+def get_tracer() -> Tracer | None:
+    """全局追踪器（未开启追踪时返回 None）"""
+    global _tracer, _configured
+    if not _configured:
+        if settings.TRACE_FILE:
+            _tracer = Tracer(settings.TRACE_FILE)
+            atexit.register(_tracer.flush)
+        _configured = True
+    return _tracer
+
+
+def span(name: str, attributes: dict | None = None, parent: Span | NoopSpan | None = None):
+    """
+    开始一个 span（with 语句使用，期间成为当前 span）
+    
+    Args:
+        name: span 名称，按 "模块.步骤" 命名
+        attributes: span 属性
+        parent: 父 span，默认为当前 span
+    
+    Returns:
+        Span；追踪关闭时返回共享的空 span
+    """
+    tracer = _tracer if _configured else get_tracer()
+    if tracer is None:
+        return NOOP_SPAN
+    return Span(tracer, name, attributes, _parent(parent))
+
+
+def start_span(name: str, attributes: dict | None = None, parent: Span | NoopSpan | None = None):
+    """
+    开始一个不成为当前 span 的 span，需显式调用 end() 结束
+    
+    用于跨越 yield 的异步生成器：生成器的每一步都在消费方的上下文中执行，
+    with span() 会把当前 span 泄漏给消费方，结束时的 ContextVar.reset
+    也可能发生在另一个上下文中。
+    
+    Args:
+        name: span 名称
+        attributes: span 属性
+        parent: 父 span，默认为当前 span
+    
+    Returns:
+        已开始计时的 Span；追踪关闭时返回共享的空 span
+    """
+    tracer = _tracer if _configured else get_tracer()
+    if tracer is None:
+        return NOOP_SPAN
+    started = Span(tracer, name, attributes, _parent(parent))
+    started.start_ns = time.time_ns()
+    return started
+
+
+def _parent(parent: Span | NoopSpan | None) -> Span | None:
+    if parent is None:
+        return _current_span.get()
+    return parent if isinstance(parent, Span) else None
+
+
+def current_span() -> Span | NoopSpan:
+    """当前 span（没有时返回空 span，可直接 set_attribute）"""
+    return _current_span.get() or NOOP_SPAN
+
+
+def flush_traces():
+    """把尚未写出的 span 写入文件"""
+    if _tracer is not None:
+        _tracer.flush()
@@ -0,0 +1,310 @@
+"""
+LLM 调用用量统计
+
+每次经 LLMClient 发出的调用记录一条 CallUsage（token 数、耗时、排队时间、重试次数），
+再汇总到全局的按模型统计与各会话自己的 SessionUsage 中。
+SessionUsage 可以带 token / 费用预算，LLMClient 在发出请求前按最坏情况
+（估算的 prompt token + max_tokens）检查并预留，超出预算时不发送请求；
+预留在记账或调用失败时释放，因此同一会话的并发调用不会合计超支。
+"""
+from app.core.config import settings
+from app.core.tokens import estimate_tokens
+
+
+class BudgetExceededError(RuntimeError):
+    """会话的 token 或费用预算不足以发出本次请求"""
+
+
+class CallUsage:
+    """一次 LLM 调用的用量"""
+    
+    __slots__ = (
+        "model", "prompt_tokens", "completion_tokens", "cached_tokens", "wall_time",
+        "queue_time", "retries", "coalesced", "estimated"
+    )
+    
+    def __init__(
+        self,
+        model: str,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        cached_tokens: int = 0,
+        wall_time: float = 0.0,
+        queue_time: float = 0.0,
+        retries: int = 0,
+        coalesced: bool = False,
+        estimated: bool = False
+    ):
+        self.model = model
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.cached_tokens = cached_tokens  # prompt 中命中上游 prompt 缓存的部分（已含在 prompt_tokens 中）
+        self.wall_time = wall_time      # 从调用开始到拿到完整回复（含重试与退避）
+        self.queue_time = queue_time    # 等待调度器并发槽位的总时间
+        self.retries = retries
+        self.coalesced = coalesced      # 复用了其他调用方的在途请求（不计 token）
+        self.estimated = estimated      # 上游未返回 usage，token 数为本地估算
+    
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+    
+    @property
+    def cost(self) -> float:
+        return call_cost(self.model, self.prompt_tokens, self.completion_tokens)
+    
+    def to_dict(self) -> dict:
+        return {
+            "model": self.model,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cost": self.cost,
+            "wall_time": self.wall_time,
+            "queue_time": self.queue_time,
+            "retries": self.retries,
+            "coalesced": self.coalesced,
+            "estimated": self.estimated
+        }
+
+
+def call_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """
+    按 settings.LLM_PRICING 计算费用
+    
+    LLM_PRICING 形如 {"模型名": [每百万输入 token 价格, 每百万输出 token 价格]}，
+    未配置价格的模型费用记为 0。
+    """
+    price = settings.LLM_PRICING.get(model)
+    if not price:
+        return 0.0
+    return (prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000
+
+
+def estimate_prompt_tokens(messages: list[dict]) -> int:
+    """估算请求消息的 token 数（兼容分段的 content）"""
+    total = 0
+    for message in messages:
+        content = message.get("content", "")
+        if isinstance(content, list):
+            content = "".join(part.get("text", "") for part in content)
+        total += estimate_tokens(content) + 4
+    return total
+
+
+class UsageTotals:
+    """用量累计"""
+    
+    __slots__ = (
+        "calls", "prompt_tokens", "completion_tokens", "cached_tokens", "cost",
+        "wall_time", "queue_time", "retries", "coalesced", "estimated"
+    )
+    
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.cost = 0.0
+        self.wall_time = 0.0
+        self.queue_time = 0.0
+        self.retries = 0
+        self.coalesced = 0
+        self.estimated = 0
+    
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+    
+    def add(self, usage: CallUsage):
+        self.calls += 1
+        self.prompt_tokens += usage.prompt_tokens
+        self.completion_tokens += usage.completion_tokens
+        self.cached_tokens += usage.cached_tokens
+        self.cost += usage.cost
+        self.wall_time += usage.wall_time
+        self.queue_time += usage.queue_time
+        self.retries += usage.retries
+        self.coalesced += usage.coalesced
+        self.estimated += usage.estimated
+    
+    def to_dict(self) -> dict:
+        calls = self.calls or 1
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cost": round(self.cost, 6),
+            "avg_wall_time": self.wall_time / calls,
+            "avg_queue_time": self.queue_time / calls,
+            "retries": self.retries,
+            "coalesced": self.coalesced,
+            "estimated": self.estimated
+        }
+
+
+class UsageLedger:
+    """按模型汇总的用量"""
+    
+    def __init__(self):
+        self.total = UsageTotals()
+        self.models: dict[str, UsageTotals] = {}
+    
+    def record(self, usage: CallUsage):
+        """记录一次调用"""
+        self.total.add(usage)
+        totals = self.models.get(usage.model)
+        if totals is None:
+            totals = self.models[usage.model] = UsageTotals()
+        totals.add(usage)
+    
+    def to_dict(self) -> dict:
+        return {
+            **self.total.to_dict(),
+            "models": {model: totals.to_dict() for model, totals in self.models.items()}
+        }
+
+
+class BudgetReservation:
+    """check() 为一次调用预留的最坏情况用量，记账或释放后失效"""
+    
+    __slots__ = ("ledgers", "tokens", "cost", "settled")
+    
+    def __init__(self, ledgers: list["SessionUsage"], tokens: int, cost: float):
+        self.ledgers = ledgers
+        self.tokens = tokens
+        self.cost = cost
+        self.settled = False
+
+
+class SessionUsage(UsageLedger):
+    """单个会话的用量与预算"""
+    
+    def __init__(
+        self,
+        token_budget: int | None = None,
+        cost_budget: float | None = None,
+        parent: "SessionUsage | None" = None
+    ):
+        """
+        Args:
+            token_budget: 会话 token 预算（0 表示不限），默认读取 settings.SESSION_TOKEN_BUDGET
+            cost_budget: 会话费用预算（0 表示不限），默认读取 settings.SESSION_COST_BUDGET
+            parent: 上级账本，提供时调用同时受其预算约束并记入其中
+        """
+        super().__init__()
+        self.token_budget = settings.SESSION_TOKEN_BUDGET if token_budget is None else token_budget
+        self.cost_budget = settings.SESSION_COST_BUDGET if cost_budget is None else cost_budget
+        self.parent = parent
+        self.rejected = 0
+        self.reserved_tokens = 0
+        self.reserved_cost = 0.0
+    
+    def child(self, token_budget: int = 0, cost_budget: float = 0.0) -> "SessionUsage":
+        """
+        创建子账本：调用同时受子账本与本账本的预算约束，用量记入两者
+        
+        Args:
+            token_budget: 子账本的 token 上限（0 表示只受本账本约束）
+            cost_budget: 子账本的费用上限（0 表示只受本账本约束）
+        """
+        return SessionUsage(token_budget=token_budget, cost_budget=cost_budget, parent=self)
+    
+    @classmethod
+    def restore(
+        cls,
+        token_budget: int,
+        cost_budget: float,
+        calls: int,
+        prompt_tokens: int,
+        completion_tokens: int,
+        cost: float,
+        rejected: int = 0
+    ) -> "SessionUsage":
+        """从持久化的预算与已用总量恢复（按模型的明细不持久化）"""
+        usage = cls(token_budget=token_budget, cost_budget=cost_budget)
+        usage.total.calls = calls
+        usage.total.prompt_tokens = prompt_tokens
+        usage.total.completion_tokens = completion_tokens
+        usage.total.cost = cost
+        usage.rejected = rejected
+        return usage
+    
+    def check(self, model: str, messages: list[dict], max_tokens: int) -> BudgetReservation | None:
+        """
+        发送前检查预算：按 prompt 估算值 + max_tokens 计算本次调用的最大用量并预留
+        
+        已预留但尚未记账的用量同样计入，调用方须在完成后把预留交给 record()，
+        失败时交给 release()。
+        
+        Returns:
+            本次预留，账本链上都没有预算时为 None
+        
+        Raises:
+            BudgetExceededError: 发出本次请求可能超出预算
+        """
+        ledgers = []
+        ledger = self
+        while ledger is not None:
+            if ledger.token_budget or ledger.cost_budget:
+                ledgers.append(ledger)
+            ledger = ledger.parent
+        if not ledgers:
+            return None
+        
+        prompt_tokens = estimate_prompt_tokens(messages)
+        tokens = prompt_tokens + max_tokens
+        worst_cost = call_cost(model, prompt_tokens, max_tokens)
+        for ledger in ledgers:
+            ledger._check_budget(tokens, worst_cost)
+        
+        for ledger in ledgers:
+            ledger.reserved_tokens += tokens
+            ledger.reserved_cost += worst_cost
+        return BudgetReservation(ledgers, tokens, worst_cost)
+    
+    def _check_budget(self, tokens: int, worst_cost: float):
+        used = self.total.total_tokens + self.reserved_tokens
+        if self.token_budget and used + tokens > self.token_budget:
+            self.rejected += 1
+            raise BudgetExceededError(
+                f"会话 token 预算不足：已用及预留 {used}，"
+                f"本次最多 {tokens}，预算 {self.token_budget}"
+            )
+        
+        spent = self.total.cost + self.reserved_cost
+        if self.cost_budget and spent + worst_cost > self.cost_budget:
+            self.rejected += 1
+            raise BudgetExceededError(
+                f"会话费用预算不足：已用及预留 {spent:.4f}，"
+                f"本次最多 {worst_cost:.4f}，预算 {self.cost_budget}"
+            )
+    
+    def record(self, usage: CallUsage, reservation: BudgetReservation | None = None):
+        """记录一次调用（同时记入上级账本），并结算其预留"""
+        self.release(reservation)
+        super().record(usage)
+        if self.parent is not None:
+            self.parent.record(usage)
+    
+    @staticmethod
+    def release(reservation: BudgetReservation | None):
+        """释放预留（重复释放无影响）"""
+        if reservation is None or reservation.settled:
+            return
+        reservation.settled = True
+        for ledger in reservation.ledgers:
+            ledger.reserved_tokens -= reservation.tokens
+            ledger.reserved_cost -= reservation.cost
+    
+    def to_dict(self) -> dict:
+        return {
+            **super().to_dict(),
+            "token_budget": self.token_budget,
+            "cost_budget": self.cost_budget,
+            "rejected": self.rejected,
+            "reserved_tokens": self.reserved_tokens,
+            "reserved_cost": round(self.reserved_cost, 6)
+        }
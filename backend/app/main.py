@@ -1,24 +1,115 @@
 """
 情感对话模拟器 - FastAPI 主应用
 
-这个文件将在需要时实现 RESTful API 接口。
-当前版本主要用于项目结构完整性。
+启动（在 backend 目录下）：
+    python -m app.main
+    # 或
+    uvicorn app.main:create_app --factory --workers 4
+
+多进程部署时会话保存在各进程内存中，需要在负载均衡层按会话 ID 保持亲和；
+配置 SESSION_DB_PATH 后，进程重启或重新部署不会丢失会话。
 """
+from contextlib import asynccontextmanager
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+from fastapi.middleware.cors import CORSMiddleware
+
+from app.api import FastJSONResponse, router, ws_router
+from app.core.config import settings
+from app.core.llm_client import llm_client
+from app.core.metrics import metrics_registry
+from app.core.tracing import flush_traces
+from app.core.usage import BudgetExceededError
+from app.services.service_metrics import install_metrics
+from app.services.session_registry import SessionLimitError, session_registry
+from app.services.session_store import get_session_store
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时打开 LLM 连接池，退出时写入会话与追踪数据并关闭连接"""
+    llm_client.open()
+    try:
+        yield
+    finally:
+        store = get_session_store()
+        if store is not None:
+            await store.close()
+        await llm_client.close()
+        flush_traces()
 
-# 未来会添加 FastAPI 相关导入
-# from fastapi import FastAPI
-# from fastapi.middleware.cors import CORSMiddleware
 
-def create_app():
+def create_app() -> FastAPI:
     """创建 FastAPI 应用实例"""
-    # app = FastAPI(
-    #     title="情感对话模拟器 API",
-    #     description="情感能力训练系统后端接口",
-    #     version="0.1.0"
-    # )
+    app = FastAPI(
+        title="情感对话模拟器 API",
+        description="情感能力训练系统后端接口",
+        version="0.1.0",
+        default_response_class=FastJSONResponse,
+        lifespan=lifespan
+    )
+    
+    origins = [origin.strip() for origin in settings.API_CORS_ORIGINS.split(",") if origin.strip()]
+    if origins:
+        app.add_middleware(
+            CORSMiddleware,
+            allow_origins=origins,
+            allow_methods=["*"],
+            allow_headers=["*"]
+        )
+    
+    @app.exception_handler(SessionLimitError)
+    async def session_limit_handler(request: Request, exc: SessionLimitError):
+        return FastJSONResponse(status_code=503, content={"detail": str(exc)})
+    
+    @app.exception_handler(BudgetExceededError)
+    async def budget_handler(request: Request, exc: BudgetExceededError):
+        return FastJSONResponse(status_code=402, content={"detail": str(exc)})
+    
+    @app.exception_handler(httpx.HTTPError)
+    async def upstream_error_handler(request: Request, exc: httpx.HTTPError):
+        print(f"上游 LLM 调用失败: {exc}")
+        return FastJSONResponse(status_code=502, content={"detail": "上游模型服务调用失败"})
     
-    # return app
-    return None
+    @app.get("/health")
+    async def health() -> dict:
+        return {"status": "ok"}
+    
+    if settings.METRICS_ENABLED:
+        install_metrics(session_registry)
+        
+        @app.get("/metrics", response_class=PlainTextResponse)
+        async def metrics() -> PlainTextResponse:
+            """Prometheus 指标（多进程部署时为处理本次请求的 worker 的指标）"""
+            return PlainTextResponse(
+                metrics_registry.render(),
+                media_type="text/plain; version=0.0.4; charset=utf-8"
+            )
+    
+    app.include_router(router)
+    app.include_router(ws_router)
+    return app
+
+
+def run():
+    """按配置启动 uvicorn（支持多进程）"""
+    import uvicorn
+    
+    uvicorn.run(
+        "app.main:create_app",
+        factory=True,
+        host=settings.API_HOST,
+        port=settings.API_PORT,
+        workers=settings.API_WORKERS,
+        log_level="debug" if settings.DEBUG else "info"
+    )
+
 
 # 导出应用创建函数
-__all__ = ["create_app"]
\ No newline at end of file
+__all__ = ["create_app", "run"]
+
+
+if __name__ == "__main__":
+    run()
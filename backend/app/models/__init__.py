@@ -4,12 +4,19 @@
 定义应用中使用的各种数据结构和状态管理。
 """
 
-from .dialogue import Message, DialogueContext
+from .dialogue import Message, MessageRecord, DialogueContext
 from .state import EmotionalState, Scenario
+from .context_window import ContextWindow, estimate_tokens
+from .trajectory import StateTrajectory, TrajectoryPoint
 
 __all__ = [
     "Message", 
+    "MessageRecord",
     "DialogueContext", 
     "EmotionalState", 
-    "Scenario"
+    "Scenario",
+    "ContextWindow",
+    "estimate_tokens",
+    "StateTrajectory",
+    "TrajectoryPoint"
 ]
\ No newline at end of file
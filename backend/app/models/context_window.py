@@ -0,0 +1,155 @@
+"""
+增量维护的上下文窗口
+
+每条消息只在加入时转换一次为 OpenAI 格式，窗口按轮数与 token 预算裁剪；
+超出预算的早期轮次不会直接丢弃，而是折叠进滚动摘要。
+"""
+from collections import deque
+
+from app.core.config import settings
+from app.core.tokens import estimate_tokens
+
+
+# 每条消息在 chat 格式中的固定开销（role、分隔符等）
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+# 摘要中每句话保留的最大字符数
+_SUMMARY_SNIPPET_CHARS = 40
+
+
+class ContextWindow:
+    """带预算的对话上下文窗口"""
+    
+    def __init__(
+        self,
+        max_turns: int | None = None,
+        max_tokens: int | None = None,
+        summary_max_chars: int | None = None
+    ):
+        """
+        Args:
+            max_turns: 窗口内保留的最大轮数，默认 settings.MAX_CONTEXT_TURNS
+            max_tokens: 窗口内消息的 token 预算，默认 settings.MAX_CONTEXT_TOKENS
+            summary_max_chars: 滚动摘要的最大字符数，默认 settings.CONTEXT_SUMMARY_MAX_CHARS
+        """
+        self.max_turns = max_turns or settings.MAX_CONTEXT_TURNS
+        self.max_tokens = max_tokens or settings.MAX_CONTEXT_TOKENS
+        self.summary_max_chars = summary_max_chars or settings.CONTEXT_SUMMARY_MAX_CHARS
+        
+        self._messages: deque[dict] = deque()
+        self._message_tokens: deque[int] = deque()
+        self._total_tokens = 0
+        self._turns = 0  # 窗口内的用户消息数
+        
+        self._summary_lines: deque[str] = deque()
+        self._summary_chars = 0
+        self._dropped_summary_turns = 0
+        self.folded_turns = 0
+    
+    def __len__(self) -> int:
+        return len(self._messages)
+    
+    @property
+    def total_tokens(self) -> int:
+        """窗口内消息的估算 token 数"""
+        return self._total_tokens
+    
+    @property
+    def turns(self) -> int:
+        """窗口内的轮数"""
+        return self._turns
+    
+    def append(self, role: str, content: str):
+        """追加一条消息，并按预算折叠早期轮次"""
+        self.append_message({"role": role, "content": content})
+    
+    def append_message(self, message: dict):
+        """
+        追加一条 OpenAI 格式的消息（直接保存该 dict，不做拷贝）
+        
+        Args:
+            message: 包含 role 与 content 的消息 dict
+        """
+        role = message["role"]
+        tokens = estimate_tokens(message["content"]) + _MESSAGE_OVERHEAD_TOKENS
+        self._messages.append(message)
+        self._message_tokens.append(tokens)
+        self._total_tokens += tokens
+        if role == "user":
+            self._turns += 1
+        
+        self._enforce_budget()
+    
+    def copy(self) -> "ContextWindow":
+        """浅拷贝窗口（消息 dict 共享），用于在不修改原窗口的前提下试加消息"""
+        window = ContextWindow(self.max_turns, self.max_tokens, self.summary_max_chars)
+        window._messages = self._messages.copy()
+        window._message_tokens = self._message_tokens.copy()
+        window._total_tokens = self._total_tokens
+        window._turns = self._turns
+        window._summary_lines = self._summary_lines.copy()
+        window._summary_chars = self._summary_chars
+        window._dropped_summary_turns = self._dropped_summary_turns
+        window.folded_turns = self.folded_turns
+        return window
+    
+    def messages(self) -> list[dict]:
+        """窗口内消息（OpenAI 格式，不含 system）"""
+        return list(self._messages)
+    
+    @property
+    def summary(self) -> str:
+        """已折叠轮次的滚动摘要，没有折叠时为空字符串"""
+        if not self.folded_turns:
+            return ""
+        
+        lines = []
+        if self._dropped_summary_turns:
+            lines.append(f"（更早还有 {self._dropped_summary_turns} 轮对话未列出）")
+        lines.extend(self._summary_lines)
+        return "\n".join(lines)
+    
+    def _enforce_budget(self):
+        """超出轮数或 token 预算时折叠最早的一轮，始终保留最新一轮"""
+        while self._turns > 1 and (
+            self._turns > self.max_turns or self._total_tokens > self.max_tokens
+        ):
+            self._fold_oldest_turn()
+    
+    def _fold_oldest_turn(self):
+        """把最早的一轮（用户消息及其后的回复）折叠进摘要"""
+        parts = []
+        while self._messages:
+            message = self._popleft()
+            parts.append(self._summarize_message(message))
+            if message["role"] == "user":
+                self._turns -= 1
+            if self._messages and self._messages[0]["role"] == "user":
+                break
+        
+        self.folded_turns += 1
+        self._append_summary_line("；".join(p for p in parts if p))
+    
+    def _popleft(self) -> dict:
+        self._total_tokens -= self._message_tokens.popleft()
+        return self._messages.popleft()
+    
+    def _append_summary_line(self, line: str):
+        """追加摘要行，超出字符上限时丢弃最早的摘要行"""
+        self._summary_lines.append(line)
+        self._summary_chars += len(line)
+        while len(self._summary_lines) > 1 and self._summary_chars > self.summary_max_chars:
+            self._summary_chars -= len(self._summary_lines.popleft())
+            self._dropped_summary_turns += 1
+    
+    @staticmethod
+    def _summarize_message(message: dict) -> str:
+        """把单条消息压缩为摘要片段"""
+        speaker = {"user": "用户", "assistant": "对方"}.get(message["role"])
+        if speaker is None:
+            return ""
+        
+        content = message["content"].replace("\n", " ").strip()
+        if len(content) > _SUMMARY_SNIPPET_CHARS:
+            content = content[:_SUMMARY_SNIPPET_CHARS] + "…"
+        return f"{speaker}：{content}"
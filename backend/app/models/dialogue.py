@@ -1,39 +1,100 @@
 """
 对话相关数据模型
+
+Message 是 API 边界上的 pydantic 模型，负责校验外部输入；
+对话内部使用轻量的 MessageRecord，构造时不做校验，
+并在创建时一次性生成 OpenAI 格式的 dict，导出时直接复用。
 """
-from pydantic import BaseModel
-from typing import Literal, Optional
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+
+# 单调时钟与墙上时间的对应关系，用于把单调时间戳换算为 datetime
+_WALL_ANCHOR = datetime.now()
+_MONOTONIC_ANCHOR = time.monotonic()
 
 
 class Message(BaseModel):
-    """单条消息"""
+    """单条消息（API 边界的校验模型）"""
     role: Literal["user", "assistant", "system"]
     content: str
-    timestamp: datetime = datetime.now()
+    timestamp: datetime = Field(default_factory=datetime.now)
+    
+    def to_record(self) -> "MessageRecord":
+        """转换为内部消息记录"""
+        return MessageRecord(self.role, self.content)
 
 
-class DialogueContext(BaseModel):
+class MessageRecord:
+    """
+    内部消息记录
+    
+    created 为创建时的单调时钟读数；wire 是创建时生成的 OpenAI 格式 dict，
+    导出时直接共享，调用方不应修改它。
+    """
+    
+    __slots__ = ("role", "content", "created", "wire")
+    
+    def __init__(self, role: str, content: str):
+        self.role = role
+        self.content = content
+        self.created = time.monotonic()
+        self.wire = {"role": role, "content": content}
+    
+    @classmethod
+    def restore(cls, role: str, content: str, timestamp: datetime) -> "MessageRecord":
+        """按已知的创建时间重建记录（从持久化存储恢复时使用）"""
+        record = cls(role, content)
+        record.created = _MONOTONIC_ANCHOR + (timestamp - _WALL_ANCHOR).total_seconds()
+        return record
+    
+    @property
+    def timestamp(self) -> datetime:
+        """创建时间（由单调时间戳换算）"""
+        return _WALL_ANCHOR + timedelta(seconds=self.created - _MONOTONIC_ANCHOR)
+    
+    def to_message(self) -> Message:
+        """转换为 pydantic 模型（用于 API 输出）"""
+        return Message(role=self.role, content=self.content, timestamp=self.timestamp)
+    
+    def __repr__(self) -> str:
+        return f"MessageRecord(role={self.role!r}, content={self.content!r})"
+
+
+class DialogueContext:
     """对话上下文"""
-    scenario_id: str  # 情境 ID
-    messages: list[Message] = []
     
-    def add_message(self, role: str, content: str):
+    __slots__ = ("scenario_id", "messages")
+    
+    def __init__(self, scenario_id: str, messages: list[MessageRecord] | None = None):
+        """
+        Args:
+            scenario_id: 情境 ID
+            messages: 已有的消息记录
+        """
+        self.scenario_id = scenario_id
+        self.messages: list[MessageRecord] = messages if messages is not None else []
+    
+    @classmethod
+    def from_messages(cls, scenario_id: str, messages: list[Message]) -> "DialogueContext":
+        """从经过校验的 Message 列表构造（API 边界使用）"""
+        return cls(scenario_id, [message.to_record() for message in messages])
+    
+    def add_message(self, role: str, content: str) -> MessageRecord:
         """添加消息"""
-        self.messages.append(Message(role=role, content=content))
+        record = MessageRecord(role, content)
+        self.messages.append(record)
+        return record
     
-    def get_recent_messages(self, n: int) -> list[Message]:
+    def get_recent_messages(self, n: int) -> list[MessageRecord]:
         """获取最近 n 条消息"""
         return self.messages[-n:] if len(self.messages) > n else self.messages
     
     def to_openai_format(self, include_system: bool = True) -> list[dict]:
-        """转换为 OpenAI API 格式"""
-        result = []
-        for msg in self.messages:
-            if not include_system and msg.role == "system":
-                continue
-            result.append({
-                "role": msg.role,
-                "content": msg.content
-            })
-        return result
\ No newline at end of file
+        """转换为 OpenAI API 格式（共享各消息的 wire dict，不做拷贝）"""
+        if include_system:
+            return [msg.wire for msg in self.messages]
+        return [msg.wire for msg in self.messages if msg.role != "system"]
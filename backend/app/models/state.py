@@ -5,6 +5,22 @@ from pydantic import BaseModel, Field
 from typing import Literal
 
 
+# 情绪维度顺序（批量存储、列式归档、词典增量等按此顺序排列）
+DIMENSIONS = ("valence", "arousal", "trust", "openness", "distance")
+
+# 各维度的取值范围与离散化阈值（低于下阈值为 0 档，高于上阈值为 2 档），
+# 与 EmotionalState 的字段约束及 discretize 保持一致
+DIMENSION_BOUNDS = ((-1.0, 1.0), (-1.0, 1.0), (0.0, 1.0), (0.0, 1.0), (0.0, 1.0))
+LEVEL_THRESHOLDS = ((-0.3, 0.3), (-0.3, 0.3), (0.4, 0.6), (0.4, 0.6), (0.4, 0.6))
+
+# 各维度离散档位对应的描述（下标 0/1/2 = 低/中/高）
+MOOD_LEVELS = ("心情低落", "情绪平稳", "心情不错")
+ENERGY_LEVELS = ("，比较疲惫", "", "，较为激动")
+TRUST_LEVELS = ("保持警惕", "谨慎", "信任")
+OPENNESS_LEVELS = ("有所保留", "适度交流", "愿意分享")
+DISTANCE_LEVELS = ("关系亲近", "保持适当距离", "感觉疏远")
+
+
 class EmotionalState(BaseModel):
     """情绪状态（内部使用）"""
     
@@ -20,44 +36,53 @@ class EmotionalState(BaseModel):
     def update_from_interaction(self, delta_valence: float = 0, 
                                 delta_trust: float = 0,
                                 delta_openness: float = 0,
-                                delta_distance: float = 0):
+                                delta_distance: float = 0,
+                                delta_arousal: float = 0):
         """根据交互更新状态"""
         self.valence = max(-1.0, min(1.0, self.valence + delta_valence))
+        self.arousal = max(-1.0, min(1.0, self.arousal + delta_arousal))
         self.trust = max(0.0, min(1.0, self.trust + delta_trust))
         self.openness = max(0.0, min(1.0, self.openness + delta_openness))
         self.distance = max(0.0, min(1.0, self.distance + delta_distance))
     
     def to_prompt_context(self) -> str:
         """转换为 Prompt 上下文（供 Model A 使用）"""
-        emotion_desc = self._get_emotion_description()
-        relation_desc = self._get_relation_description()
+        return self.describe_levels(self.discretize())
+    
+    def discretize(self) -> tuple[int, int, int, int, int]:
+        """
+        离散化为描述档位
+        
+        Returns:
+            (效价档, 唤醒档, 信任档, 开放档, 距离档)，每档取值 0/1/2（低/中/高）
+        """
+        return (
+            2 if self.valence > 0.3 else 0 if self.valence < -0.3 else 1,
+            2 if self.arousal > 0.3 else 0 if self.arousal < -0.3 else 1,
+            2 if self.trust > 0.6 else 0 if self.trust < 0.4 else 1,
+            2 if self.openness > 0.6 else 0 if self.openness < 0.4 else 1,
+            2 if self.distance > 0.6 else 0 if self.distance < 0.4 else 1,
+        )
+    
+    @staticmethod
+    def describe_levels(levels: tuple[int, int, int, int, int]) -> str:
+        """根据离散档位生成 Prompt 上下文"""
+        mood, energy, trust, openness, distance = levels
+        emotion_desc = MOOD_LEVELS[mood] + ENERGY_LEVELS[energy]
+        relation_desc = (
+            f"{TRUST_LEVELS[trust]}，{OPENNESS_LEVELS[openness]}，{DISTANCE_LEVELS[distance]}"
+        )
         return f"当前情绪状态：{emotion_desc}\n当前关系状态：{relation_desc}"
     
     def _get_emotion_description(self) -> str:
         """获取情绪描述"""
-        if self.valence > 0.3:
-            mood = "心情不错"
-        elif self.valence < -0.3:
-            mood = "心情低落"
-        else:
-            mood = "情绪平稳"
-        
-        if self.arousal > 0.3:
-            energy = "，较为激动"
-        elif self.arousal < -0.3:
-            energy = "，比较疲惫"
-        else:
-            energy = ""
-        
-        return mood + energy
+        mood, energy, _, _, _ = self.discretize()
+        return MOOD_LEVELS[mood] + ENERGY_LEVELS[energy]
     
     def _get_relation_description(self) -> str:
         """获取关系描述"""
-        trust_level = "信任" if self.trust > 0.6 else "保持警惕" if self.trust < 0.4 else "谨慎"
-        openness_level = "愿意分享" if self.openness > 0.6 else "有所保留" if self.openness < 0.4 else "适度交流"
-        distance_level = "感觉疏远" if self.distance > 0.6 else "关系亲近" if self.distance < 0.4 else "保持适当距离"
-        
-        return f"{trust_level}，{openness_level}，{distance_level}"
+        _, _, trust, openness, distance = self.discretize()
+        return f"{TRUST_LEVELS[trust]}，{OPENNESS_LEVELS[openness]}，{DISTANCE_LEVELS[distance]}"
 
 
 class Scenario(BaseModel):
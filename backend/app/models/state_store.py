@@ -0,0 +1,257 @@
+"""
+基于 NumPy 的批量情绪状态存储
+
+把 N 个会话的五个情绪维度放在连续数组中（每个维度一行），
+支持向量化的批量增量 + 截断、批量离散化与描述生成，
+并提供行为与 EmotionalState 一致的视图对象，供现有调用方直接使用。
+列式归档的词典重评分（TranscriptArchive.rescore）以此批量推演各会话的状态。
+"""
+import numpy as np
+
+from app.models.state import (
+    DIMENSIONS,
+    DIMENSION_BOUNDS,
+    LEVEL_THRESHOLDS,
+    EmotionalState
+)
+from app.models.trajectory import decode_levels
+
+
+_LOWER = np.array([b[0] for b in DIMENSION_BOUNDS]).reshape(-1, 1)
+_UPPER = np.array([b[1] for b in DIMENSION_BOUNDS]).reshape(-1, 1)
+_LEVEL_LOW = np.array([low for low, _ in LEVEL_THRESHOLDS])
+_LEVEL_HIGH = np.array([high for _, high in LEVEL_THRESHOLDS])
+# 五个维度档位的三进制权重，与 encode_levels 一致
+_LEVEL_WEIGHTS = np.array([81, 27, 9, 3, 1], dtype=np.uint8)
+
+# 243 种档位组合对应的 Prompt 描述
+_DESCRIPTIONS = tuple(
+    EmotionalState.describe_levels(decode_levels(code)) for code in range(243)
+)
+
+
+def discretize_values(values: np.ndarray) -> np.ndarray:
+    """
+    向量化离散化（与 EmotionalState.discretize 一致）
+    
+    Args:
+        values: 形状为 (行数, 5) 的状态数值，应为原始 float64 精度，
+            float32 数值在阈值附近可能落入相邻档位
+    
+    Returns:
+        形状相同的档位数组（uint8，取值 0/1/2）
+    """
+    return 1 + (values > _LEVEL_HIGH).astype(np.uint8) - (values < _LEVEL_LOW).astype(np.uint8)
+
+
+def level_codes(values: np.ndarray) -> np.ndarray:
+    """
+    向量化计算档位编码（与 encode_levels(EmotionalState.discretize()) 一致）
+    
+    Args:
+        values: 形状为 (行数, 5) 的状态数值，精度要求同 discretize_values
+    
+    Returns:
+        每行的档位编码（uint8，0~242）
+    """
+    return discretize_values(values) @ _LEVEL_WEIGHTS
+
+
+class EmotionalStateStore:
+    """批量情绪状态存储"""
+    
+    def __init__(self, capacity: int = 1024):
+        """
+        Args:
+            capacity: 初始容量，不足时自动翻倍扩容
+        """
+        self._data = np.zeros((len(DIMENSIONS), capacity), dtype=np.float64)
+        self._size = 0
+        self._free: list[int] = []
+    
+    def __len__(self) -> int:
+        return self._size - len(self._free)
+    
+    @property
+    def capacity(self) -> int:
+        return self._data.shape[1]
+    
+    @property
+    def data(self) -> np.ndarray:
+        """底层数组视图，形状为 (5, 已分配槽位数)"""
+        return self._data[:, :self._size]
+    
+    def allocate(self, state: EmotionalState | None = None) -> int:
+        """
+        分配一个槽位
+        
+        Args:
+            state: 初始状态，默认使用 EmotionalState 的默认值
+        
+        Returns:
+            槽位编号
+        """
+        if self._free:
+            slot = self._free.pop()
+        else:
+            if self._size == self.capacity:
+                self._grow()
+            slot = self._size
+            self._size += 1
+        
+        state = state or EmotionalState()
+        self._data[:, slot] = [getattr(state, dim) for dim in DIMENSIONS]
+        return slot
+    
+    def allocate_many(self, count: int, state: EmotionalState | None = None) -> np.ndarray:
+        """批量分配连续槽位（不复用已释放槽位）"""
+        state = state or EmotionalState()
+        values = np.array([getattr(state, dim) for dim in DIMENSIONS])
+        return self.allocate_values(np.broadcast_to(values, (count, len(DIMENSIONS))))
+    
+    def allocate_values(self, values: np.ndarray) -> np.ndarray:
+        """
+        批量分配连续槽位并逐个写入初始数值（不复用已释放槽位）
+        
+        Args:
+            values: 形状为 (槽位数, 5) 的初始状态，超出取值范围的部分会被截断
+        
+        Returns:
+            槽位编号数组
+        """
+        count = len(values)
+        while self._size + count > self.capacity:
+            self._grow()
+        slots = np.arange(self._size, self._size + count)
+        self._data[:, slots] = np.clip(np.asarray(values, dtype=np.float64).T, _LOWER, _UPPER)
+        self._size += count
+        return slots
+    
+    def release(self, slot: int):
+        """释放槽位，之后可被复用"""
+        self._free.append(slot)
+    
+    def view(self, slot: int) -> "EmotionalStateView":
+        """获取某个槽位的 EmotionalState 兼容视图"""
+        return EmotionalStateView(self, slot)
+    
+    def to_state(self, slot: int) -> EmotionalState:
+        """导出为独立的 EmotionalState"""
+        return EmotionalState(**dict(zip(DIMENSIONS, self._data[:, slot].tolist())))
+    
+    def apply_deltas(self, slots: np.ndarray | None, deltas: np.ndarray):
+        """
+        向量化地应用增量并截断到取值范围
+        
+        Args:
+            slots: 槽位编号数组，None 表示全部已分配槽位；允许重复，重复项的增量会累加
+            deltas: 增量，形状为 (5,)（对所有槽位相同）或 (len(slots), 5)
+        """
+        deltas = np.asarray(deltas, dtype=np.float64)
+        if slots is None:
+            data = self.data
+            data += deltas.T if deltas.ndim == 2 else deltas.reshape(-1, 1)
+            np.clip(data, _LOWER, _UPPER, out=data)
+            return
+        
+        slots = np.asarray(slots)
+        if deltas.ndim == 1:
+            deltas = np.broadcast_to(deltas, (len(slots), len(DIMENSIONS)))
+        for i in range(len(DIMENSIONS)):
+            np.add.at(self._data[i], slots, deltas[:, i])
+        touched = np.unique(slots)
+        self._data[:, touched] = np.clip(self._data[:, touched], _LOWER, _UPPER)
+    
+    def discretize(self, slots: np.ndarray | None = None) -> np.ndarray:
+        """
+        向量化离散化
+        
+        Returns:
+            形状为 (len(slots), 5) 的档位数组，取值 0/1/2
+        """
+        return discretize_values(self.values(slots))
+    
+    def values(self, slots: np.ndarray | None = None) -> np.ndarray:
+        """按行导出状态数值，形状为 (len(slots), 5)"""
+        values = self.data if slots is None else self._data[:, np.asarray(slots)]
+        return values.T
+    
+    def level_codes(self, slots: np.ndarray | None = None) -> np.ndarray:
+        """把档位编码为 0~242 的整数（可直接作为 Prompt 缓存键）"""
+        return level_codes(self.values(slots))
+    
+    def describe(self, slots: np.ndarray | None = None) -> list[str]:
+        """批量生成 Prompt 状态描述（与 EmotionalState.to_prompt_context 一致）"""
+        return [_DESCRIPTIONS[code] for code in self.level_codes(slots).tolist()]
+    
+    def _grow(self):
+        data = np.zeros((len(DIMENSIONS), max(1, self.capacity * 2)), dtype=np.float64)
+        data[:, :self._size] = self._data[:, :self._size]
+        self._data = data
+
+
+class EmotionalStateView:
+    """
+    指向 EmotionalStateStore 某个槽位的视图
+    
+    与 EmotionalState 的读写接口保持一致，修改直接写回存储。
+    """
+    
+    __slots__ = ("_store", "_slot")
+    
+    def __init__(self, store: EmotionalStateStore, slot: int):
+        self._store = store
+        self._slot = slot
+    
+    def _get(self, index: int) -> float:
+        return float(self._store._data[index, self._slot])
+    
+    def _set(self, index: int, value: float):
+        low, high = DIMENSION_BOUNDS[index]
+        if not low <= value <= high:
+            raise ValueError(f"{DIMENSIONS[index]} 超出取值范围 [{low}, {high}]: {value}")
+        self._store._data[index, self._slot] = value
+    
+    valence = property(lambda self: self._get(0), lambda self, v: self._set(0, v))
+    arousal = property(lambda self: self._get(1), lambda self, v: self._set(1, v))
+    trust = property(lambda self: self._get(2), lambda self, v: self._set(2, v))
+    openness = property(lambda self: self._get(3), lambda self, v: self._set(3, v))
+    distance = property(lambda self: self._get(4), lambda self, v: self._set(4, v))
+    
+    @property
+    def slot(self) -> int:
+        return self._slot
+    
+    def update_from_interaction(self, delta_valence: float = 0,
+                                delta_trust: float = 0,
+                                delta_openness: float = 0,
+                                delta_distance: float = 0,
+                                delta_arousal: float = 0):
+        """根据交互更新状态"""
+        column = self._store._data[:, self._slot]
+        column += (delta_valence, delta_arousal, delta_trust, delta_openness, delta_distance)
+        np.clip(column, _LOWER.ravel(), _UPPER.ravel(), out=column)
+    
+    def discretize(self) -> tuple[int, int, int, int, int]:
+        return self.to_state().discretize()
+    
+    def to_prompt_context(self) -> str:
+        return self.to_state().to_prompt_context()
+    
+    def _get_emotion_description(self) -> str:
+        return self.to_state()._get_emotion_description()
+    
+    def _get_relation_description(self) -> str:
+        return self.to_state()._get_relation_description()
+    
+    def to_state(self) -> EmotionalState:
+        """导出为独立的 EmotionalState"""
+        return self._store.to_state(self._slot)
+    
+    def model_copy(self, deep: bool = False) -> EmotionalState:
+        """与 EmotionalState.model_copy 兼容：返回脱离存储的副本"""
+        return self.to_state()
+    
+    def __repr__(self) -> str:
+        fields = " ".join(f"{dim}={self._get(i)!r}" for i, dim in enumerate(DIMENSIONS))
+        return f"EmotionalStateView(slot={self._slot} {fields})"
@@ -0,0 +1,184 @@
+"""
+紧凑的列式情绪轨迹
+
+每个维度一列 float32（array.array，原地追加），另有一列 uint8 保存追加时
+按 float64 原值计算的离散档位编码，保证描述文本与 EmotionalState 完全一致。
+相比逐轮保存深拷贝的 pydantic 对象，每轮只占 21 字节。
+"""
+import struct
+import sys
+from array import array
+
+from app.models.state import (
+    DIMENSIONS,
+    DISTANCE_LEVELS,
+    ENERGY_LEVELS,
+    MOOD_LEVELS,
+    OPENNESS_LEVELS,
+    TRUST_LEVELS,
+    EmotionalState
+)
+
+
+_MAGIC = b"TRJ1"
+_HEADER = struct.Struct("<4sI")
+_BIG_ENDIAN = sys.byteorder == "big"
+
+# 情绪描述只取决于前两个维度的档位，即 code // 27（0~8）
+_EMOTION_DESCRIPTIONS = tuple(
+    MOOD_LEVELS[mood] + ENERGY_LEVELS[energy] for mood in range(3) for energy in range(3)
+)
+
+
+def encode_levels(levels: tuple[int, int, int, int, int]) -> int:
+    """把五个维度的档位编码为 0~242 的整数"""
+    mood, energy, trust, openness, distance = levels
+    return (((mood * 3 + energy) * 3 + trust) * 3 + openness) * 3 + distance
+
+
+def decode_levels(code: int) -> tuple[int, int, int, int, int]:
+    """encode_levels 的逆运算"""
+    return (code // 81, code // 27 % 3, code // 9 % 3, code // 3 % 3, code % 3)
+
+
+class TrajectoryPoint:
+    """指向轨迹中某一轮的游标（只读）"""
+    
+    __slots__ = ("_trajectory", "_index")
+    
+    def __init__(self, trajectory: "StateTrajectory", index: int):
+        self._trajectory = trajectory
+        self._index = index
+    
+    @property
+    def index(self) -> int:
+        return self._index
+    
+    valence = property(lambda self: self._trajectory._columns[0][self._index])
+    arousal = property(lambda self: self._trajectory._columns[1][self._index])
+    trust = property(lambda self: self._trajectory._columns[2][self._index])
+    openness = property(lambda self: self._trajectory._columns[3][self._index])
+    distance = property(lambda self: self._trajectory._columns[4][self._index])
+    
+    def discretize(self) -> tuple[int, int, int, int, int]:
+        return decode_levels(self._trajectory._levels[self._index])
+    
+    def _get_emotion_description(self) -> str:
+        return _EMOTION_DESCRIPTIONS[self._trajectory._levels[self._index] // 27]
+    
+    def _get_relation_description(self) -> str:
+        _, _, trust, openness, distance = self.discretize()
+        return f"{TRUST_LEVELS[trust]}，{OPENNESS_LEVELS[openness]}，{DISTANCE_LEVELS[distance]}"
+    
+    def to_prompt_context(self) -> str:
+        return EmotionalState.describe_levels(self.discretize())
+    
+    def to_state(self) -> EmotionalState:
+        """还原为 EmotionalState（数值为 float32 精度）"""
+        return EmotionalState(**{
+            dim: column[self._index]
+            for dim, column in zip(DIMENSIONS, self._trajectory._columns)
+        })
+
+
+class StateTrajectory:
+    """列式情绪轨迹"""
+    
+    __slots__ = ("_columns", "_levels")
+    
+    def __init__(self, states=()):
+        """
+        Args:
+            states: 初始状态序列
+        """
+        self._columns = tuple(array("f") for _ in DIMENSIONS)
+        self._levels = array("B")
+        for state in states:
+            self.append(state)
+    
+    @classmethod
+    def from_buffers(cls, columns, levels) -> "StateTrajectory":
+        """
+        从现成的缓冲区构造（不经过 EmotionalState）
+        
+        Args:
+            columns: 五个维度各自的 float32 原始字节（DIMENSIONS 顺序）
+            levels: 每轮档位编码（uint8 字节）
+        """
+        trajectory = cls.__new__(cls)
+        trajectory._columns = tuple(array("f", bytes(column)) for column in columns)
+        trajectory._levels = array("B", bytes(levels))
+        return trajectory
+    
+    def __len__(self) -> int:
+        return len(self._levels)
+    
+    def append(self, state: EmotionalState):
+        """追加一轮状态（摊还 O(1)）"""
+        valence, arousal, trust, openness, distance = self._columns
+        valence.append(state.valence)
+        arousal.append(state.arousal)
+        trust.append(state.trust)
+        openness.append(state.openness)
+        distance.append(state.distance)
+        self._levels.append(encode_levels(state.discretize()))
+    
+    def __getitem__(self, key):
+        """整数下标返回游标，切片返回新的轨迹（按轮次范围）"""
+        if isinstance(key, slice):
+            sliced = StateTrajectory.__new__(StateTrajectory)
+            sliced._columns = tuple(column[key] for column in self._columns)
+            sliced._levels = self._levels[key]
+            return sliced
+        
+        length = len(self._levels)
+        if key < 0:
+            key += length
+        if not 0 <= key < length:
+            raise IndexError("trajectory index out of range")
+        return TrajectoryPoint(self, key)
+    
+    def __iter__(self):
+        for index in range(len(self._levels)):
+            yield TrajectoryPoint(self, index)
+    
+    def column(self, dimension: str) -> array:
+        """获取某个维度的整列数据（float32）"""
+        return self._columns[DIMENSIONS.index(dimension)]
+    
+    @property
+    def level_codes(self) -> array:
+        """每轮的离散档位编码"""
+        return self._levels
+    
+    def to_bytes(self) -> bytes:
+        """序列化：头部 + 五列 float32 + 一列档位编码（小端）"""
+        parts = [_HEADER.pack(_MAGIC, len(self._levels))]
+        for column in self._columns:
+            column = array("f", column)
+            if _BIG_ENDIAN:
+                column.byteswap()
+            parts.append(column.tobytes())
+        parts.append(self._levels.tobytes())
+        return b"".join(parts)
+    
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "StateTrajectory":
+        """从 to_bytes 的结果还原"""
+        magic, length = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError("不是有效的轨迹数据")
+        
+        trajectory = cls.__new__(cls)
+        offset = _HEADER.size
+        columns = []
+        for _ in DIMENSIONS:
+            column = array("f")
+            column.frombytes(data[offset:offset + length * 4])
+            if _BIG_ENDIAN:
+                column.byteswap()
+            columns.append(column)
+            offset += length * 4
+        trajectory._columns = tuple(columns)
+        trajectory._levels = array("B", data[offset:offset + length])
+        return trajectory
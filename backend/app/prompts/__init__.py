@@ -5,11 +5,19 @@
 """
 
 from .model_a_prompts import SCENARIO_FIRST_MEET, build_model_a_system_prompt
-from .model_b_prompts import ANALYSIS_SYSTEM_PROMPT, build_analysis_prompt
+from .model_b_prompts import (
+    ANALYSIS_SYSTEM_PROMPT,
+    build_analysis_prompt,
+    build_incremental_analysis_prompt
+)
+from .prompt_compiler import PromptCompiler, prompt_compiler
 
 __all__ = [
     "SCENARIO_FIRST_MEET",
     "build_model_a_system_prompt", 
     "ANALYSIS_SYSTEM_PROMPT",
-    "build_analysis_prompt"
+    "build_analysis_prompt",
+    "build_incremental_analysis_prompt",
+    "PromptCompiler",
+    "prompt_compiler"
 ]
\ No newline at end of file
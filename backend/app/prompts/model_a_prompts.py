@@ -1,12 +1,22 @@
 """
 Model A (情感模拟模型) Prompt 模板
+
+更多情境以 JSON 文件的形式放在 app/data/scenarios/，由 ScenarioCatalog 加载。
 """
+from app.models.state import Scenario
 
-# 基础情境：初识阶段
+# 内置基础情境：初识阶段（情境目录中没有同名文件时使用）
 SCENARIO_FIRST_MEET = {
     "id": "first_meet",
     "name": "初次见面",
     "description": "你们刚刚通过朋友介绍认识，这是第一次线上聊天",
+    "initial_state": {
+        "valence": 0.0,
+        "arousal": 0.0,
+        "trust": 0.5,
+        "openness": 0.4,
+        "distance": 0.6
+    },
     "system_prompt": """你是一个真实的普通人，正在和一个刚认识不久的人进行线上聊天。
 
 【核心原则】
@@ -40,20 +50,40 @@ SCENARIO_FIRST_MEET = {
 }
 
 
-def build_model_a_system_prompt(scenario: dict, emotional_state: str) -> str:
+def build_model_a_system_prompt(
+    scenario: Scenario,
+    emotional_state: str,
+    context_summary: str = ""
+) -> str:
     """
     构建 Model A 的完整 system prompt
     
+    情境设定在最前面、保持逐字节不变，便于上游的前缀缓存命中；
+    随状态变化的部分都放在其后。
+    
     Args:
-        scenario: 情境配置
+        scenario: 情境
         emotional_state: 当前情绪状态描述
+        context_summary: 已折叠的早期对话摘要
     
     Returns:
         完整的 system prompt
     """
-    base_prompt = scenario["system_prompt"]
+    base_prompt = scenario.system_prompt
+    state_context = build_state_section(emotional_state)
     
+    return base_prompt + state_context + build_summary_section(context_summary)
+
+
+def build_state_section(emotional_state: str) -> str:
+    """构建内在状态段落"""
     state_context = f"\n\n【你当前的内在状态】\n{emotional_state}\n"
     state_context += "\n根据这个状态，自然地调整你的回应语气和内容。不要明说你的状态，而是通过言行表现出来。"
-    
-    return base_prompt + state_context
\ No newline at end of file
+    return state_context
+
+
+def build_summary_section(context_summary: str) -> str:
+    """构建早期对话摘要段落，没有摘要时为空"""
+    if not context_summary:
+        return ""
+    return f"\n\n【你们之前聊过的内容（摘要）】\n{context_summary}"
@@ -62,4 +62,45 @@ def build_analysis_prompt(dialogue_history: str, emotional_trajectory: str) -> s
 
 请保持友善、建设性的语气，像一个有经验的朋友在帮助复盘。"""
     
-    return prompt
\ No newline at end of file
+    return prompt
+
+
+def build_incremental_analysis_prompt(
+    previous_analysis: str,
+    new_dialogue: str,
+    new_trajectory: str
+) -> str:
+    """
+    构建增量分析请求 prompt
+    
+    只发送上次分析之后新增的对话，并附上上次的分析结论，由模型合并为一份完整报告。
+    
+    Args:
+        previous_analysis: 上一次的分析结果
+        new_dialogue: 新增的对话记录
+        new_trajectory: 新增的情绪变化轨迹描述
+    
+    Returns:
+        增量分析请求 prompt
+    """
+    prompt = f"""以下是你之前对这段对话的分析：
+
+【上一次的分析】
+{previous_analysis}
+
+此后对话又继续了，新增内容如下：
+
+【新增对话记录】
+{new_dialogue}
+
+【对方新增的情绪变化】
+{new_trajectory}
+
+请结合新增内容更新你的分析，输出一份完整的复盘（而不只是新增部分）：
+- 保留上一次分析中依然成立的观察
+- 补充新增对话带来的变化，特别是对方情绪与关系的走向
+- 如果新的对话修正了之前的判断，请直接给出更新后的看法
+
+结构仍然按照「沟通效果观察」「可能的改进方向」「可迁移的沟通原则」组织，保持友善、建设性的语气。"""
+    
+    return prompt
@@ -0,0 +1,137 @@
+"""
+Model A system prompt 编译缓存
+
+情绪状态在 Prompt 中只以离散档位出现（每个维度 3 档），
+因此每个情境最多只有 3^5 = 243 种不同的 system prompt。
+这里按 (情境 ID, 离散档位) 预先拼好并复用同一个字符串对象，
+避免每轮重复拼接，同时统计缓存命中率。
+"""
+from itertools import product
+
+from app.core.lazy import LazyProxy
+from app.models.state import EmotionalState, Scenario
+from app.prompts.model_a_prompts import build_state_section, build_summary_section
+
+
+class CompiledPrompt:
+    """编译后的 system prompt"""
+    
+    __slots__ = ("prefix", "suffix", "text")
+    
+    def __init__(self, prefix: str, suffix: str):
+        self.prefix = prefix  # 情境设定，同一情境下逐字节不变
+        self.suffix = suffix  # 状态段落
+        self.text = prefix + suffix
+
+
+class PromptCompiler:
+    """system prompt 编译器"""
+    
+    def __init__(self):
+        self._cache: dict[tuple[str, tuple[int, ...]], CompiledPrompt] = {}
+        self.hits = 0
+        self.misses = 0  # 查询时才编译的次数（情境已预编译时为 0）
+        self.compiled = 0  # 累计编译次数（含预编译与情境热加载后的重新编译）
+    
+    def compile(self, scenario: Scenario, emotional_state: EmotionalState) -> CompiledPrompt:
+        """
+        获取 (情境, 离散状态) 对应的 system prompt
+        
+        Args:
+            scenario: 情境
+            emotional_state: 当前情绪状态
+        
+        Returns:
+            编译后的 system prompt
+        """
+        key = (scenario.id, emotional_state.discretize())
+        compiled = self._cache.get(key)
+        if compiled is not None:
+            self.hits += 1
+            return compiled
+        
+        self.misses += 1
+        return self._compile_levels(scenario, key)
+    
+    def precompile(self, scenario: Scenario) -> int:
+        """
+        预先编译某个情境的全部档位组合
+        
+        Returns:
+            新编译的条目数
+        """
+        count = 0
+        for levels in product(range(3), repeat=5):
+            key = (scenario.id, levels)
+            if key not in self._cache:
+                self._compile_levels(scenario, key)
+                count += 1
+        return count
+    
+    def system_message(
+        self,
+        scenario: Scenario,
+        emotional_state: EmotionalState,
+        context_summary: str = "",
+        cache_control: bool = False
+    ) -> dict:
+        """
+        构建 system 消息
+        
+        Args:
+            scenario: 情境
+            emotional_state: 当前情绪状态
+            context_summary: 已折叠的早期对话摘要
+            cache_control: 是否把情境设定拆为单独的内容块并标记 cache_control，
+                供支持显式缓存断点的上游（如 Anthropic 兼容接口）使用
+        
+        Returns:
+            OpenAI 格式的 system 消息
+        """
+        compiled = self.compile(scenario, emotional_state)
+        summary_section = build_summary_section(context_summary)
+        
+        if not cache_control:
+            content = compiled.text + summary_section if summary_section else compiled.text
+            return {"role": "system", "content": content}
+        
+        return {
+            "role": "system",
+            "content": [
+                {
+                    "type": "text",
+                    "text": compiled.prefix,
+                    "cache_control": {"type": "ephemeral"}
+                },
+                {"type": "text", "text": compiled.suffix + summary_section}
+            ]
+        }
+    
+    def invalidate(self, scenario_id: str | None = None):
+        """清除缓存（情境内容变化时调用）"""
+        if scenario_id is None:
+            self._cache.clear()
+            return
+        for key in [k for k in self._cache if k[0] == scenario_id]:
+            del self._cache[key]
+    
+    def stats(self) -> dict:
+        """缓存统计"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "compiled": self.compiled,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+    
+    def _compile_levels(self, scenario: Scenario, key: tuple[str, tuple[int, ...]]) -> CompiledPrompt:
+        state_desc = EmotionalState.describe_levels(key[1])
+        compiled = CompiledPrompt(scenario.system_prompt, build_state_section(state_desc))
+        self._cache[key] = compiled
+        self.compiled += 1
+        return compiled
+
+
+prompt_compiler: PromptCompiler = LazyProxy(PromptCompiler)  # type: ignore[assignment]
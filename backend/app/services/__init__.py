@@ -6,10 +6,49 @@
 
 from .dialogue_manager import DialogueManager
 from .model_a import ModelAService
-from .model_b import ModelBService
+from .model_b import ModelBService, AnalysisRecord
+from .scenario_catalog import ScenarioCatalog, ScenarioNotFoundError, scenario_catalog
+from .session_store import SessionStore, SessionSnapshot, get_session_store
+from .session_registry import (
+    SessionRegistry,
+    SessionLimitError,
+    SessionBusyError,
+    session_registry
+)
+
+# 离线分析相关模块依赖 NumPy，按需导入，不拖慢 CLI 与 API 进程的启动
+_LAZY_EXPORTS = {
+    "TranscriptArchive": ".transcript_archive",
+    "TranscriptArchiveWriter": ".transcript_archive",
+    "export_store": ".transcript_archive",
+    "BulkAnalysisRunner": ".bulk_analysis",
+}
+
+
+def __getattr__(name: str):
+    module = _LAZY_EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+    return getattr(import_module(module, __name__), name)
 
 __all__ = [
     "DialogueManager",
     "ModelAService", 
-    "ModelBService"
+    "ModelBService",
+    "AnalysisRecord",
+    "ScenarioCatalog",
+    "ScenarioNotFoundError",
+    "scenario_catalog",
+    "SessionStore",
+    "SessionSnapshot",
+    "get_session_store",
+    "TranscriptArchive",
+    "TranscriptArchiveWriter",
+    "export_store",
+    "BulkAnalysisRunner",
+    "SessionRegistry",
+    "SessionLimitError",
+    "SessionBusyError",
+    "session_registry"
 ]
\ No newline at end of file
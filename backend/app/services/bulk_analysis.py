@@ -0,0 +1,187 @@
+"""
+批量 Model B 分析流水线
+
+从归档（或会话存储）流式读取会话，以有界并发调用 Model B 分析，
+结果逐条追加写入 JSONL 文件，该文件同时作为断点：
+重新运行时跳过已有结果（且分析配置指纹相同）的会话，从中断处继续。
+
+并发请求统一走 LLMClient 的调度器（BACKGROUND 优先级），
+429/5xx 的退避重试与自适应并发收缩由调度器负责，不会挤占交互请求。
+"""
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import AsyncIterator, Iterable
+
+from app.core.llm_client import Priority
+from app.models.dialogue import DialogueContext
+from app.models.trajectory import StateTrajectory
+from app.services.model_b import model_b_service
+from app.services.session_store import SessionStore
+from app.services.transcript_archive import TranscriptArchive
+
+
+# 待分析的会话：(会话 ID, 对话上下文, 情绪轨迹)
+SessionItem = tuple[str, DialogueContext, StateTrajectory]
+
+
+async def iter_archive_sessions(
+    archive: TranscriptArchive,
+    indices: Iterable[int] | None = None
+) -> AsyncIterator[SessionItem]:
+    """从归档中逐个读取会话"""
+    for session in archive.iter_sessions(indices):
+        yield session.session_id, session.context(), session.trajectory()
+
+
+async def iter_store_sessions(store: SessionStore, page_size: int = 500) -> AsyncIterator[SessionItem]:
+    """从会话存储中逐个读取会话（按会话 ID 分页）"""
+    after = ""
+    while True:
+        session_ids = await store.list_sessions(after=after, limit=page_size)
+        for session_id in session_ids:
+            snapshot = await store.load_session(session_id, max_messages=0)
+            if snapshot is None:
+                continue
+            context = DialogueContext(snapshot.scenario_id)
+            async for _, message in store.iter_messages(session_id, page_size=page_size):
+                context.messages.append(message)
+            trajectory = StateTrajectory()
+            async for _, state in store.iter_states(session_id, page_size=page_size):
+                trajectory.append(state)
+            yield session_id, context, trajectory
+        if len(session_ids) < page_size:
+            return
+        after = session_ids[-1]
+
+
+def load_checkpoint(output: Path, fingerprint: str) -> set[str]:
+    """读取已完成的会话 ID（只认可指纹相同的结果，忽略被截断的末行）"""
+    done: set[str] = set()
+    if not output.exists():
+        return done
+    with open(output, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("fingerprint") == fingerprint:
+                done.add(record["session_id"])
+    return done
+
+
+class BulkAnalysisRunner:
+    """批量分析执行器"""
+    
+    def __init__(
+        self,
+        output: str | Path,
+        concurrency: int = 8,
+        recent_turns: int = 5,
+        progress_every: int = 100
+    ):
+        """
+        Args:
+            output: 结果 JSONL 路径（同时作为断点）
+            concurrency: 同时进行的分析数上限
+            recent_turns: 每个会话分析最近几轮
+            progress_every: 每完成多少个会话打印一次进度
+        """
+        self.output = Path(output)
+        self.concurrency = concurrency
+        self.recent_turns = recent_turns
+        self.progress_every = progress_every
+        self.fingerprint = model_b_service.fingerprint()
+        
+        self.completed = 0
+        self.skipped = 0
+        self.failed = 0
+        self._started = 0.0
+    
+    async def run(self, sessions: AsyncIterator[SessionItem]) -> dict:
+        """
+        执行批量分析
+        
+        Args:
+            sessions: 待分析会话的异步迭代器
+        
+        Returns:
+            统计信息
+        
+        Raises:
+            ExceptionGroup: 某个 worker 意外退出（单个会话的分析失败只计数，不会退出），
+                此时其余 worker 与读取都会被取消
+        """
+        done = load_checkpoint(self.output, self.fingerprint)
+        self.output.parent.mkdir(parents=True, exist_ok=True)
+        self._started = time.perf_counter()
+        
+        # 有界队列：读取速度受分析速度约束，内存中最多保留 2 × 并发数个会话
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        
+        # TaskGroup：任一 worker 意外退出时取消读取方，否则读取方会在
+        # 没有消费者的队列上永远阻塞
+        with open(self.output, "a", encoding="utf-8") as out:
+            async with asyncio.TaskGroup() as group:
+                for _ in range(self.concurrency):
+                    group.create_task(self._worker(queue, out))
+                async for item in sessions:
+                    if item[0] in done:
+                        self.skipped += 1
+                        continue
+                    await queue.put(item)
+                for _ in range(self.concurrency):
+                    await queue.put(None)
+        
+        return self.stats()
+    
+    async def _worker(self, queue: asyncio.Queue, out):
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            session_id, context, trajectory = item
+            start = time.perf_counter()
+            try:
+                record = await model_b_service.analyze(
+                    context=context,
+                    emotional_states=trajectory,
+                    recent_turns=self.recent_turns,
+                    priority=Priority.BACKGROUND
+                )
+            except Exception as e:
+                # 失败的会话不写入结果，下次运行时重试
+                self.failed += 1
+                print(f"分析失败 {session_id}: {e}")
+                continue
+            
+            out.write(json.dumps({
+                "session_id": session_id,
+                "fingerprint": self.fingerprint,
+                "analysis": record.content,
+                "message_count": record.message_count,
+                "state_count": record.state_count,
+                "elapsed": round(time.perf_counter() - start, 3)
+            }, ensure_ascii=False) + "\n")
+            out.flush()
+            
+            self.completed += 1
+            if self.progress_every and self.completed % self.progress_every == 0:
+                self._print_progress()
+    
+    def _print_progress(self):
+        elapsed = time.perf_counter() - self._started
+        rate = self.completed / elapsed if elapsed else 0.0
+        print(f"已完成 {self.completed}（跳过 {self.skipped}，失败 {self.failed}），{rate:.1f} 个/秒")
+    
+    def stats(self) -> dict:
+        """运行统计"""
+        return {
+            "completed": self.completed,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "elapsed": time.perf_counter() - self._started,
+            "fingerprint": self.fingerprint
+        }
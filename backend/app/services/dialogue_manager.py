@@ -1,21 +1,91 @@
 """
 对话管理服务
 """
-from app.models.dialogue import DialogueContext, Message
+import asyncio
+import time
+from typing import Awaitable
+
+from app.core.cassette import cassette_scope
+from app.core.config import settings
+from app.core.llm_client import ChunkCallback, Priority
+from app.core.tracing import span
+from app.core.usage import SessionUsage
+from app.models.context_window import ContextWindow
+from app.models.dialogue import DialogueContext, MessageRecord
 from app.models.state import EmotionalState, Scenario
+from app.models.trajectory import StateTrajectory
 from app.services.model_a import model_a_service
-from app.services.model_b import model_b_service
-from app.prompts.model_a_prompts import SCENARIO_FIRST_MEET
+from app.services.model_b import AnalysisRecord, model_b_service
+from app.services.scenario_catalog import scenario_catalog
+from app.services.session_store import SessionSnapshot, SessionStore
+
+
+# 全进程共享的后台预分析并发上限（首次使用时创建）
+_prefetch_semaphore: asyncio.Semaphore | None = None
+
+
+def _get_prefetch_semaphore() -> asyncio.Semaphore:
+    global _prefetch_semaphore
+    if _prefetch_semaphore is None:
+        _prefetch_semaphore = asyncio.Semaphore(settings.ANALYSIS_PREFETCH_CONCURRENCY)
+    return _prefetch_semaphore
+
+
+class DialogueHooks:
+    """
+    DialogueManager 事件回调
+    
+    指标等观察者继承后覆盖需要的方法，并加入 DialogueManager.hooks（所有会话共享）。
+    """
+    
+    def on_turn(self, manager: "DialogueManager", seconds: float):
+        """一轮对话完成（seconds 为整轮耗时）"""
+    
+    def on_analysis(self, manager: "DialogueManager", seconds: float, prefetched: bool):
+        """一次分析完成（prefetched 表示直接使用了后台预分析结果）"""
 
 
 class DialogueManager:
     """对话管理器"""
     
-    def __init__(self):
+    hooks: list[DialogueHooks] = []
+    
+    def __init__(
+        self,
+        session_id: str | None = None,
+        prefetch_every: int | None = None,
+        store: SessionStore | None = None,
+        usage: SessionUsage | None = None
+    ):
+        """
+        Args:
+            session_id: 会话 ID
+            prefetch_every: 每隔几轮在后台预先跑一次分析，0 表示关闭，
+                默认读取 settings.ANALYSIS_PREFETCH_EVERY_N_TURNS
+            store: 会话持久化存储，提供时每轮的消息与情绪状态写入其缓冲区（需要 session_id）
+            usage: 会话用量与预算，默认按 settings 中的会话预算创建
+        """
+        self.session_id = session_id
+        self.store = store if session_id else None
+        self._message_seq = 0  # 会话的消息总数（恢复会话时内存中只保留最近一段，以此计算轮数）
         self.context: DialogueContext | None = None
-        self.current_scenario: dict | None = None
-        self.emotional_states: list[EmotionalState] = []
+        self.window: ContextWindow | None = None
+        self.current_scenario: Scenario | None = None
+        self.emotional_states = StateTrajectory()
         self.current_state: EmotionalState | None = None
+        self.last_analysis: AnalysisRecord | None = None
+        self.usage = usage if usage is not None else SessionUsage()
+        
+        # 后台预分析（用量记入会话账本，另受预分析自己的费用上限约束）
+        if prefetch_every is None:
+            prefetch_every = settings.ANALYSIS_PREFETCH_EVERY_N_TURNS
+        self.prefetch_every = prefetch_every
+        self.prefetch_budget = settings.ANALYSIS_PREFETCH_MAX_RUNS
+        self.prefetch_usage = self.usage.child(cost_budget=settings.ANALYSIS_PREFETCH_COST_BUDGET)
+        self.prefetch_runs = 0
+        self.prefetch_hits = 0
+        self._prefetch_task: asyncio.Task | None = None
+        self._prefetch_key: tuple | None = None
     
     def start_new_dialogue(self, scenario_id: str = "first_meet"):
         """
@@ -23,30 +93,65 @@ class DialogueManager:
         
         Args:
             scenario_id: 情境 ID
+        
+        Raises:
+            ScenarioNotFoundError: 情境不存在
         """
-        # 加载情境（MVP 阶段只有一个情境）
-        self.current_scenario = SCENARIO_FIRST_MEET
+        self.current_scenario = scenario_catalog.get(scenario_id)
         
         # 初始化对话上下文
         self.context = DialogueContext(scenario_id=scenario_id)
+        self.window = ContextWindow()
         
-        # 初始化情绪状态
-        initial_state = EmotionalState(
-            valence=0.0,
-            arousal=0.0,
-            trust=0.5,
-            openness=0.4,
-            distance=0.6
-        )
+        # 初始化情绪状态（情境中的初始状态是共享的，必须复制）
+        initial_state = self.current_scenario.initial_state.model_copy()
         self.current_state = initial_state
-        self.emotional_states = [initial_state]
+        self.emotional_states = StateTrajectory([initial_state])
+        self.last_analysis = None
+        self._cancel_prefetch()
+        self.prefetch_runs = 0
+        self._message_seq = 0
+        
+        if self.store:
+            self.store.record_session(self.session_id, scenario_id, reset=True)
+            self.store.record_state(self.session_id, 0, initial_state)
+            self.store.record_usage(self.session_id, self.usage)
+    
+    def restore(self, snapshot: SessionSnapshot):
+        """
+        从持久化数据恢复对话
+        
+        Args:
+            snapshot: SessionStore.load_session 的结果
+        """
+        self.current_scenario = scenario_catalog.get(snapshot.scenario_id)
+        self.context = DialogueContext(snapshot.scenario_id, snapshot.messages)
+        self.window = ContextWindow()
+        for message in snapshot.messages:
+            self.window.append_message(message.wire)
+        
+        self.emotional_states = StateTrajectory(snapshot.states)
+        self.current_state = snapshot.states[-1].model_copy()
+        self.last_analysis = None
+        self._cancel_prefetch()
+        self.prefetch_runs = 0
+        self._message_seq = snapshot.message_count
+        if snapshot.usage is not None:
+            # 恢复创建时的预算与已用量，淘汰 / 重启后不会从零开始计费
+            self.usage = snapshot.usage
+            self.prefetch_usage = self.usage.child(cost_budget=settings.ANALYSIS_PREFETCH_COST_BUDGET)
     
-    async def process_user_input(self, user_input: str) -> str:
+    async def process_user_input(
+        self,
+        user_input: str,
+        on_chunk: ChunkCallback | None = None
+    ) -> str:
         """
         处理用户输入并生成回复
         
         Args:
             user_input: 用户输入
+            on_chunk: 流式回调，提供时回复按增量文本逐段推送
         
         Returns:
             AI 回复
@@ -54,48 +159,138 @@ class DialogueManager:
         if not self.context or not self.current_state:
             raise ValueError("对话未初始化，请先调用 start_new_dialogue()")
         
-        # 添加用户消息
-        self.context.add_message("user", user_input)
+        start = time.perf_counter()
+        # 录制 / 回放按会话区分同一请求的多次调用（后台预分析任务会继承该作用域）
+        with cassette_scope(self.session_id), span("dialogue.turn", self._span_attributes()) as turn:
+            # 新的轮次到来，之前的预分析已过时
+            self._cancel_prefetch()
+            
+            with span("dialogue.context_build") as build:
+                # 用户消息先加入窗口副本，回复成功后才提交到对话中，
+                # 预算不足或上游出错时不会留下没有回复的用户消息
+                user_message = MessageRecord("user", user_input)
+                window = self.window.copy()
+                window.append_message(user_message.wire)
+                
+                # 准备消息历史（窗口内增量维护，不包含 system）
+                messages = window.messages()
+                build.set_attribute("dialogue.window_messages", len(messages))
+            
+            # 调用 Model A 生成回复
+            response, updated_state = await model_a_service.generate_response(
+                messages=messages,
+                scenario=self.current_scenario,
+                emotional_state=self.current_state,
+                on_chunk=on_chunk,
+                context_summary=window.summary,
+                usage=self.usage
+            )
+            
+            # 更新状态
+            self.current_state = updated_state
+            self.emotional_states.append(updated_state)
+            
+            # 提交用户消息并添加 AI 回复
+            self.context.messages.append(user_message)
+            self.window = window
+            reply_message = self.context.add_message("assistant", response)
+            self.window.append_message(reply_message.wire)
+            
+            with span("dialogue.persist"):
+                self._persist_turn(user_message, reply_message)
+            
+            self._schedule_prefetch()
+            turn.set_attribute("dialogue.reply_chars", len(response))
         
-        # 准备消息历史（不包含 system）
-        messages = self.context.to_openai_format(include_system=False)
-        
-        # 调用 Model A 生成回复
-        response, updated_state = await model_a_service.generate_response(
-            messages=messages,
-            scenario=self.current_scenario,
-            emotional_state=self.current_state
-        )
-        
-        # 更新状态
-        self.current_state = updated_state
-        self.emotional_states.append(updated_state)
-        
-        # 添加 AI 回复
-        self.context.add_message("assistant", response)
+        elapsed = time.perf_counter() - start
+        for hook in self.hooks:
+            hook.on_turn(self, elapsed)
         
         return response
     
-    async def get_analysis(self, recent_turns: int = 5) -> str:
+    async def get_analysis(self, recent_turns: int = 5, incremental: bool | None = None) -> str:
         """
         获取对话分析
         
         Args:
             recent_turns: 分析最近几轮
+            incremental: 是否增量分析（只发送上次分析后新增的轮次），默认读取
+                settings.MODEL_B_INCREMENTAL
         
         Returns:
             分析结果
         """
+        return await self.begin_analysis(recent_turns, incremental)
+    
+    def begin_analysis(
+        self,
+        recent_turns: int = 5,
+        incremental: bool | None = None
+    ) -> Awaitable[str]:
+        """
+        开始一次对话分析：同步拍下当前对话与情绪轨迹的快照，返回只读取快照的协程
+        
+        调用方只需在调用本方法时持有会话锁，之后可以在锁外等待结果，
+        分析期间同一会话的新轮次不会被阻塞。
+        
+        Args:
+            recent_turns: 分析最近几轮
+            incremental: 是否增量分析，默认读取 settings.MODEL_B_INCREMENTAL
+        
+        Returns:
+            返回分析结果的协程
+        """
         if not self.context:
             raise ValueError("对话未初始化")
         
-        analysis = await model_b_service.analyze_dialogue(
-            context=self.context,
-            emotional_states=self.emotional_states,
-            recent_turns=recent_turns
+        if incremental is None:
+            incremental = settings.MODEL_B_INCREMENTAL
+        
+        return self._analyze(
+            key=self._analysis_key(recent_turns, incremental),
+            context=DialogueContext(self.context.scenario_id, list(self.context.messages)),
+            emotional_states=self.emotional_states[:],
+            recent_turns=recent_turns,
+            previous=self.last_analysis if incremental else None,
+            attributes=self._span_attributes()
         )
+    
+    async def _analyze(
+        self,
+        key: tuple,
+        context: DialogueContext,
+        emotional_states: StateTrajectory,
+        recent_turns: int,
+        previous: AnalysisRecord | None,
+        attributes: dict
+    ) -> str:
+        """在对话快照上执行分析（见 begin_analysis）"""
+        start = time.perf_counter()
+        with cassette_scope(self.session_id), span("dialogue.analysis", attributes) as analysis:
+            # 优先使用与快照对应的后台预分析结果
+            record = await self._take_prefetched(key)
+            prefetched = record is not None
+            analysis.set_attribute("dialogue.prefetch_hit", prefetched)
+            if prefetched:
+                self.prefetch_hits += 1
+            else:
+                record = await model_b_service.analyze(
+                    context=context,
+                    emotional_states=emotional_states,
+                    recent_turns=recent_turns,
+                    previous=previous,
+                    usage=self.usage
+                )
+                self._persist_usage()
+            # 锁外并发的分析可能乱序完成，只保留覆盖范围最新的结果
+            if self.last_analysis is None or record.message_count >= self.last_analysis.message_count:
+                self.last_analysis = record
+        
+        elapsed = time.perf_counter() - start
+        for hook in self.hooks:
+            hook.on_analysis(self, elapsed, prefetched)
         
-        return analysis
+        return record.content
     
     def get_dialogue_summary(self) -> dict:
         """获取对话摘要（用于调试）"""
@@ -103,10 +298,121 @@ class DialogueManager:
             return {}
         
         return {
-            "total_turns": len(self.context.messages) // 2,
+            # 恢复的会话内存中只有最近一段消息，轮数以会话的消息总数为准
+            "total_turns": self._message_seq // 2,
             "current_emotion": self.current_state._get_emotion_description(),
             "current_relation": self.current_state._get_relation_description()
         }
-
-
-dialogue_manager = DialogueManager()
\ No newline at end of file
+    
+    def close(self):
+        """释放会话资源（取消后台任务，写入最终用量）"""
+        self._cancel_prefetch()
+        self._persist_usage()
+    
+    def _span_attributes(self) -> dict:
+        """追踪 span 的会话属性"""
+        return {
+            "session.id": self.session_id or "",
+            "scenario.id": self.context.scenario_id,
+            "dialogue.turn": self._message_seq // 2 + 1
+        }
+    
+    def _persist_turn(self, user_message: MessageRecord, reply_message: MessageRecord):
+        """把本轮写入持久化缓冲区（不等待 I/O），并推进会话的消息总数"""
+        seq = self._message_seq
+        self._message_seq += 2
+        if not self.store:
+            return
+        self.store.record_message(self.session_id, seq, user_message)
+        self.store.record_message(self.session_id, seq + 1, reply_message)
+        # 恢复的轨迹只含最近一段，轮次按消息总数计算
+        self.store.record_state(self.session_id, self._message_seq // 2, self.current_state)
+        self.store.record_session(self.session_id, self.context.scenario_id)
+        self.store.record_usage(self.session_id, self.usage)
+    
+    def _persist_usage(self):
+        """把会话预算与已用量写入持久化缓冲区"""
+        if self.store:
+            self.store.record_usage(self.session_id, self.usage)
+    
+    def _analysis_key(self, recent_turns: int, incremental: bool) -> tuple:
+        """标识一次分析请求的输入范围"""
+        previous_count = self.last_analysis.message_count if (
+            incremental and self.last_analysis
+        ) else None
+        return (len(self.context.messages), recent_turns, incremental, previous_count)
+    
+    def _schedule_prefetch(self, recent_turns: int = 5):
+        """按配置在后台预先分析当前对话"""
+        if self.prefetch_every <= 0:
+            return
+        if (self._message_seq // 2) % self.prefetch_every:
+            return
+        if self.prefetch_runs >= self.prefetch_budget:
+            return
+        
+        incremental = settings.MODEL_B_INCREMENTAL
+        self._prefetch_key = self._analysis_key(recent_turns, incremental)
+        self._prefetch_task = asyncio.create_task(
+            self._run_prefetch(recent_turns, self.last_analysis if incremental else None)
+        )
+    
+    async def _run_prefetch(
+        self,
+        recent_turns: int,
+        previous: AnalysisRecord | None
+    ) -> AnalysisRecord | None:
+        """后台预分析任务（受全局并发上限约束，失败不影响对话）"""
+        async with _get_prefetch_semaphore():
+            if self.prefetch_runs >= self.prefetch_budget:
+                return None
+            self.prefetch_runs += 1
+            try:
+                record = await model_b_service.analyze(
+                    context=self.context,
+                    emotional_states=self.emotional_states,
+                    recent_turns=recent_turns,
+                    previous=previous,
+                    priority=Priority.BACKGROUND,
+                    usage=self.prefetch_usage
+                )
+            except Exception as e:
+                print(f"后台预分析失败: {e}")
+                return None
+            self._persist_usage()
+            return record
+    
+    async def _take_prefetched(self, key: tuple) -> AnalysisRecord | None:
+        """
+        取出与 key 匹配的预分析结果，进行中则等待其完成
+        
+        等待期间任务仍登记在 _prefetch_task 上：调用方被取消时，
+        之后的新轮次、close() 或淘汰仍能取消它。
+        """
+        task = self._prefetch_task
+        if task is None or key != self._prefetch_key:
+            return None
+        
+        try:
+            record = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.cancelled():
+                raise
+            record = None
+        
+        if self._prefetch_task is task:
+            self._prefetch_task = None
+            self._prefetch_key = None
+        return record
+    
+    def _cancel_prefetch(self):
+        """
+        取消尚未完成的预分析
+        
+        取消会一直传递到 LLMClient：没有其他等待方时上游请求随之取消并归还调度槽位，
+        预分析信号量也只在请求真正结束后才释放。
+        """
+        if self._prefetch_task is not None and not self._prefetch_task.done():
+            self._prefetch_task.cancel()
+        self._prefetch_task = None
+        self._prefetch_key = None
\ No newline at end of file
@@ -0,0 +1,201 @@
+"""
+基于线索词典的情绪状态引擎
+
+按情境从 app/data/lexicons/ 加载带权重的线索词典（负面、正面、越界、追问等），
+编译为 Aho-Corasick 多模式自动机，对用户消息单次扫描即可找出全部命中线索，
+匹配耗时只与消息长度相关，不随词典规模增长。
+命中线索按 权重 × 类别增量 求和，作用于全部五个情绪维度。
+"""
+import json
+from collections import deque
+from pathlib import Path
+
+from app.models.state import DIMENSIONS, EmotionalState
+
+
+LEXICON_DIR = Path(__file__).resolve().parent.parent / "data" / "lexicons"
+
+
+class AhoCorasickMatcher:
+    """Aho-Corasick 多模式匹配自动机"""
+    
+    def __init__(self, patterns: list[str]):
+        """
+        Args:
+            patterns: 模式串列表，匹配结果以其下标表示
+        """
+        self.patterns = patterns
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._output: list[tuple[int, ...]] = [()]
+        
+        for index, pattern in enumerate(patterns):
+            self._insert(pattern, index)
+        self._build_failure_links()
+    
+    def _insert(self, pattern: str, index: int):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            state = next_state
+        self._output[state] += (index,)
+    
+    def _build_failure_links(self):
+        """BFS 构建失败指针，并把失败链上的输出合并到各状态"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] += self._output[self._fail[next_state]]
+    
+    def find(self, text: str) -> set[int]:
+        """单次扫描文本，返回命中的模式下标集合"""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        found: set[int] = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+class CueEvaluation:
+    """一条消息的线索匹配结果"""
+    
+    __slots__ = ("deltas", "matches")
+    
+    def __init__(self, deltas: dict[str, float], matches: list[tuple[str, str, float]]):
+        self.deltas = deltas    # 各维度的增量
+        self.matches = matches  # 命中的 (类别, 线索, 权重)
+
+
+class LexiconStateEngine:
+    """线索词典情绪引擎"""
+    
+    def __init__(self, lexicon: dict):
+        """
+        Args:
+            lexicon: 已合并继承关系的词典配置
+        """
+        self.max_step = lexicon.get("max_step", 0.2)
+        
+        cues: list[str] = []
+        self._cue_info: list[tuple[str, float]] = []  # 下标 -> (类别, 权重)
+        self._cue_weights: dict[tuple[str, str], float] = {}  # (类别, 线索) -> 权重
+        self._category_deltas: dict[str, tuple[float, ...]] = {}
+        
+        for category, config in lexicon["categories"].items():
+            delta = config.get("delta", {})
+            self._category_deltas[category] = tuple(
+                float(delta.get(dim, 0.0)) for dim in DIMENSIONS
+            )
+            for cue, weight in config.get("cues", {}).items():
+                cues.append(cue.lower())
+                self._cue_info.append((category, float(weight)))
+                self._cue_weights[(category, cue.lower())] = float(weight)
+        
+        self._matcher = AhoCorasickMatcher(cues)
+    
+    @classmethod
+    def from_file(cls, path: Path) -> "LexiconStateEngine":
+        """从词典文件加载"""
+        return cls(_load_lexicon(path))
+    
+    def evaluate(self, text: str) -> CueEvaluation:
+        """
+        计算一条消息带来的情绪增量
+        
+        每个命中的线索贡献 权重 × 类别增量，总增量在每个维度上限制在 ±max_step 内。
+        """
+        found = self._matcher.find(text.lower())
+        totals = [0.0] * len(DIMENSIONS)
+        matches = []
+        for index in sorted(found):
+            category, weight = self._cue_info[index]
+            matches.append((category, self._matcher.patterns[index], weight))
+            for i, delta in enumerate(self._category_deltas[category]):
+                totals[i] += weight * delta
+        
+        limit = self.max_step
+        deltas = {
+            dim: max(-limit, min(limit, total))
+            for dim, total in zip(DIMENSIONS, totals)
+            if total
+        }
+        return CueEvaluation(deltas, matches)
+    
+    def cue_delta(self, category: str, cue: str) -> tuple[float, ...]:
+        """
+        某个类别下的线索单独命中时贡献的增量（权重 × 类别增量，未截断）
+        
+        Returns:
+            按 DIMENSIONS 顺序的增量，词典中没有该线索时全部为 0
+        """
+        weight = self._cue_weights.get((category, cue))
+        if weight is None:
+            return (0.0,) * len(DIMENSIONS)
+        return tuple(weight * delta for delta in self._category_deltas[category])
+    
+    def apply(self, state: EmotionalState, text: str) -> CueEvaluation:
+        """把消息带来的增量作用到状态上（原地修改）"""
+        evaluation = self.evaluate(text)
+        if evaluation.deltas:
+            state.update_from_interaction(
+                **{f"delta_{dim}": value for dim, value in evaluation.deltas.items()}
+            )
+        return evaluation
+
+
+def _load_lexicon(path: Path) -> dict:
+    """加载词典文件，递归合并 extends 指定的父词典"""
+    with open(path, encoding="utf-8") as f:
+        lexicon = json.load(f)
+    
+    parent_name = lexicon.get("extends")
+    if not parent_name:
+        return lexicon
+    
+    merged = _load_lexicon(path.parent / f"{parent_name}.json")
+    merged["max_step"] = lexicon.get("max_step", merged.get("max_step", 0.2))
+    for category, config in lexicon.get("categories", {}).items():
+        base = merged["categories"].setdefault(category, {"delta": {}, "cues": {}})
+        if "delta" in config:
+            base["delta"] = config["delta"]
+        base.setdefault("cues", {}).update(config.get("cues", {}))
+    return merged
+
+
+_engines: dict[str, LexiconStateEngine] = {}
+
+
+def get_lexicon_engine(scenario_id: str) -> LexiconStateEngine:
+    """
+    获取情境对应的词典引擎（编译结果按情境缓存）
+    
+    优先使用 lexicons/{scenario_id}.json，不存在时退回 default.json。
+    """
+    engine = _engines.get(scenario_id)
+    if engine is None:
+        path = LEXICON_DIR / f"{scenario_id}.json"
+        if not path.exists():
+            path = LEXICON_DIR / "default.json"
+        engine = LexiconStateEngine.from_file(path)
+        _engines[scenario_id] = engine
+    return engine
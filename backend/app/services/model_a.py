@@ -1,10 +1,14 @@
 """
 Model A 情感模拟服务
 """
-from app.core.llm_client import llm_client
+from app.core.llm_client import ChunkCallback, Priority, llm_client
 from app.core.config import settings
-from app.models.state import EmotionalState
-from app.prompts.model_a_prompts import build_model_a_system_prompt
+from app.core.usage import SessionUsage
+from app.core.lazy import LazyProxy
+from app.core.tracing import span
+from app.models.state import EmotionalState, Scenario
+from app.prompts.prompt_compiler import prompt_compiler
+from app.services.lexicon_engine import get_lexicon_engine
 
 
 class ModelAService:
@@ -14,47 +18,76 @@ class ModelAService:
         self.model_name = settings.MODEL_A_NAME
         self.temperature = settings.MODEL_A_TEMPERATURE
         self.max_tokens = settings.MODEL_A_MAX_TOKENS
+        self.prompt_cache_control = settings.MODEL_A_PROMPT_CACHE_CONTROL
     
     async def generate_response(
         self,
         messages: list[dict],
-        scenario: dict,
-        emotional_state: EmotionalState
+        scenario: Scenario,
+        emotional_state: EmotionalState,
+        on_chunk: ChunkCallback | None = None,
+        context_summary: str = "",
+        usage: SessionUsage | None = None
     ) -> tuple[str, EmotionalState]:
         """
         生成情感化回复
         
         Args:
             messages: 对话历史（OpenAI 格式）
-            scenario: 当前情境配置
+            scenario: 当前情境
             emotional_state: 当前情绪状态
+            on_chunk: 流式回调，提供时按增量文本逐段回调；情绪状态仍在完整回复拼好后更新
+            context_summary: 窗口外早期对话的滚动摘要
+            usage: 会话用量（发送前检查预算，完成后记账）
         
         Returns:
             (回复内容, 更新后的情绪状态)
         """
-        # 构建 system prompt
-        state_desc = emotional_state.to_prompt_context()
-        system_prompt = build_model_a_system_prompt(scenario, state_desc)
-        
-        # 准备完整消息
-        full_messages = [
-            {"role": "system", "content": system_prompt}
-        ] + messages
-        
-        # 调用 LLM
-        response = await llm_client.chat_completion(
-            messages=full_messages,
-            model=self.model_name,
-            temperature=self.temperature,
-            max_tokens=self.max_tokens
-        )
-        
-        # 简单的情绪状态更新逻辑（后续可以用 LLM 来推理）
-        updated_state = self._update_emotional_state(
-            emotional_state,
-            messages[-1]["content"] if messages else "",
-            response
-        )
+        with span("model_a.generate", {"scenario.id": scenario.id, "llm.stream": on_chunk is not None}):
+            # 构建 system prompt（按离散状态复用已编译的 prompt）
+            with span("model_a.system_prompt"):
+                system_message = prompt_compiler.system_message(
+                    scenario,
+                    emotional_state,
+                    context_summary=context_summary,
+                    cache_control=self.prompt_cache_control
+                )
+            
+            # 准备完整消息
+            full_messages = [system_message] + messages
+            
+            # 调用 LLM
+            if on_chunk is None:
+                response = await llm_client.chat_completion(
+                    messages=full_messages,
+                    model=self.model_name,
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                    priority=Priority.INTERACTIVE,
+                    usage=usage
+                )
+            else:
+                chunks = []
+                async for chunk in llm_client.stream_chat_completion(
+                    messages=full_messages,
+                    model=self.model_name,
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                    priority=Priority.INTERACTIVE,
+                    usage=usage
+                ):
+                    chunks.append(chunk)
+                    await on_chunk(chunk)
+                response = "".join(chunks)
+            
+            # 基于线索词典的情绪状态更新（后续可以用 LLM 来推理）
+            with span("model_a.state_update"):
+                updated_state = self._update_emotional_state(
+                    emotional_state,
+                    messages[-1]["content"] if messages else "",
+                    response,
+                    scenario_id=scenario.id
+                )
         
         return response, updated_state
     
@@ -62,36 +95,19 @@ class ModelAService:
         self,
         current_state: EmotionalState,
         user_message: str,
-        ai_response: str
+        ai_response: str,
+        scenario_id: str = "first_meet"
     ) -> EmotionalState:
         """
-        根据交互更新情绪状态（简化版）
+        根据交互更新情绪状态
         
-        这里使用启发式规则，后续可以改用 LLM 推理
+        使用情境对应的线索词典对用户消息单次扫描，命中线索的加权增量作用于全部五个维度，
+        后续可以改用 LLM 推理
         """
-        new_state = current_state.model_copy(deep=True)
-        
-        # 简单的启发式判断
-        user_lower = user_message.lower()
-        
-        # 负面信号
-        if any(word in user_lower for word in ["为什么", "你怎么", "难道"]):
-            new_state.update_from_interaction(
-                delta_valence=-0.1,
-                delta_trust=-0.05,
-                delta_distance=0.05
-            )
-        
-        # 正面信号
-        elif any(word in user_lower for word in ["理解", "谢谢", "有意思", "同感"]):
-            new_state.update_from_interaction(
-                delta_valence=0.1,
-                delta_trust=0.05,
-                delta_openness=0.05,
-                delta_distance=-0.05
-            )
-        
+        # 所有字段都是 float，浅拷贝即可得到独立副本
+        new_state = current_state.model_copy()
+        get_lexicon_engine(scenario_id).apply(new_state, user_message)
         return new_state
 
 
-model_a_service = ModelAService()
\ No newline at end of file
+model_a_service: ModelAService = LazyProxy(ModelAService)  # type: ignore[assignment]
\ No newline at end of file
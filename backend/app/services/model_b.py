@@ -1,11 +1,31 @@
 """
 Model B 对话分析服务
 """
-from app.core.llm_client import llm_client
+import hashlib
+import json
+from collections import OrderedDict
+
+from pydantic import BaseModel
+
+from app.core.llm_client import Priority, llm_client
 from app.core.config import settings
+from app.core.lazy import LazyProxy
+from app.core.tracing import current_span, span
+from app.core.usage import SessionUsage
 from app.models.dialogue import DialogueContext
-from app.models.state import EmotionalState
-from app.prompts.model_b_prompts import ANALYSIS_SYSTEM_PROMPT, build_analysis_prompt
+from app.models.trajectory import StateTrajectory
+from app.prompts.model_b_prompts import (
+    ANALYSIS_SYSTEM_PROMPT,
+    build_analysis_prompt,
+    build_incremental_analysis_prompt
+)
+
+
+class AnalysisRecord(BaseModel):
+    """一次分析的结果及其覆盖范围"""
+    content: str
+    message_count: int  # 分析覆盖到的消息数
+    state_count: int    # 分析覆盖到的情绪状态数
 
 
 class ModelBService:
@@ -15,11 +35,17 @@ class ModelBService:
         self.model_name = settings.MODEL_B_NAME
         self.temperature = settings.MODEL_B_TEMPERATURE
         self.max_tokens = settings.MODEL_B_MAX_TOKENS
+        
+        # 分析结果缓存：请求内容哈希 -> 分析结果（LRU）
+        self.cache_size = settings.MODEL_B_CACHE_SIZE
+        self._cache: OrderedDict[str, str] = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
     
     async def analyze_dialogue(
         self,
         context: DialogueContext,
-        emotional_states: list[EmotionalState],
+        emotional_states: StateTrajectory,
         recent_turns: int = 5
     ) -> str:
         """
@@ -27,39 +53,143 @@ class ModelBService:
         
         Args:
             context: 对话上下文
-            emotional_states: 情绪状态历史
+            emotional_states: 情绪状态轨迹
             recent_turns: 分析最近几轮对话
         
         Returns:
             分析结果
         """
-        # 获取最近的对话
-        recent_messages = context.get_recent_messages(recent_turns * 2)
-        
-        # 构建对话历史文本
-        dialogue_text = self._format_dialogue_history(recent_messages)
-        
-        # 构建情绪轨迹描述
-        emotional_trajectory = self._format_emotional_trajectory(emotional_states)
+        record = await self.analyze(context, emotional_states, recent_turns)
+        return record.content
+    
+    async def analyze(
+        self,
+        context: DialogueContext,
+        emotional_states: StateTrajectory,
+        recent_turns: int = 5,
+        previous: AnalysisRecord | None = None,
+        priority: Priority = Priority.ANALYSIS,
+        usage: SessionUsage | None = None
+    ) -> AnalysisRecord:
+        """
+        分析对话表现，支持增量模式
         
-        # 构建分析 prompt
-        analysis_prompt = build_analysis_prompt(dialogue_text, emotional_trajectory)
+        Args:
+            context: 对话上下文
+            emotional_states: 情绪状态轨迹
+            recent_turns: 全量分析时分析最近几轮对话
+            previous: 上一次分析结果；提供时只发送其后新增的轮次，并由模型合并为完整报告
+            priority: LLM 调度优先级（后台预分析使用 BACKGROUND）
+            usage: 会话用量（发送前检查预算，完成后记账；命中缓存时不计）
         
-        # 调用 LLM
-        messages = [
-            {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
-            {"role": "user", "content": analysis_prompt}
-        ]
+        Returns:
+            分析结果及其覆盖范围
+        """
+        with span("model_b.analyze", {"model_b.incremental": previous is not None}) as analysis:
+            message_count = len(context.messages)
+            state_count = len(emotional_states)
+            analysis.set_attribute("model_b.messages", message_count)
+            
+            if previous is not None and previous.message_count <= message_count:
+                # 自上次分析以来没有新内容，直接复用
+                if previous.message_count == message_count:
+                    return previous
+                
+                new_messages = context.messages[previous.message_count:]
+                new_states = emotional_states[previous.state_count:]
+                analysis_prompt = build_incremental_analysis_prompt(
+                    previous.content,
+                    self._format_dialogue_history(new_messages),
+                    self._format_emotional_trajectory(new_states, start=previous.state_count)
+                )
+            else:
+                # 获取最近的对话
+                recent_messages = context.get_recent_messages(recent_turns * 2)
+                
+                # 构建对话历史文本
+                dialogue_text = self._format_dialogue_history(recent_messages)
+                
+                # 构建情绪轨迹描述
+                emotional_trajectory = self._format_emotional_trajectory(emotional_states)
+                
+                # 构建分析 prompt
+                analysis_prompt = build_analysis_prompt(dialogue_text, emotional_trajectory)
+            
+            # 调用 LLM
+            messages = [
+                {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+                {"role": "user", "content": analysis_prompt}
+            ]
+            analysis = await self._complete_cached(messages, priority, usage)
+            
+            return AnalysisRecord(
+                content=analysis,
+                message_count=message_count,
+                state_count=state_count
+            )
+    
+    def fingerprint(self) -> str:
+        """分析配置指纹（模型参数与 Prompt 模板），配置变化后批量分析会重新处理"""
+        raw = json.dumps(
+            [
+                self.model_name, self.temperature, self.max_tokens,
+                ANALYSIS_SYSTEM_PROMPT, build_analysis_prompt("{dialogue}", "{trajectory}")
+            ],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+    
+    def cache_stats(self) -> dict:
+        """分析缓存统计"""
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "entries": len(self._cache),
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_rate": self.cache_hits / lookups if lookups else 0.0
+        }
+    
+    async def _complete_cached(
+        self,
+        messages: list[dict],
+        priority: Priority,
+        usage: SessionUsage | None = None
+    ) -> str:
+        """按请求内容哈希缓存的 LLM 调用"""
+        key = self._cache_key(messages)
+        cached = self._cache.get(key)
+        current_span().set_attribute("model_b.cache_hit", cached is not None)
+        if cached is not None:
+            self.cache_hits += 1
+            self._cache.move_to_end(key)
+            return cached
         
+        self.cache_misses += 1
         analysis = await llm_client.chat_completion(
             messages=messages,
             model=self.model_name,
             temperature=self.temperature,
-            max_tokens=self.max_tokens
+            max_tokens=self.max_tokens,
+            priority=priority,
+            usage=usage
         )
         
+        if self.cache_size > 0:
+            self._cache[key] = analysis
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        
         return analysis
     
+    def _cache_key(self, messages: list[dict]) -> str:
+        """请求内容哈希（覆盖模型参数、对话片段与情绪轨迹）"""
+        raw = json.dumps(
+            [self.model_name, self.temperature, self.max_tokens, messages],
+            ensure_ascii=False,
+            separators=(",", ":")
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    
     def _format_dialogue_history(self, messages: list) -> str:
         """格式化对话历史"""
         lines = []
@@ -70,17 +200,23 @@ class ModelBService:
                 lines.append(f"对方：{msg.content}")
         return "\n".join(lines)
     
-    def _format_emotional_trajectory(self, states: list[EmotionalState]) -> str:
-        """格式化情绪轨迹"""
+    def _format_emotional_trajectory(self, states: StateTrajectory, start: int = 0) -> str:
+        """
+        格式化情绪轨迹
+        
+        Args:
+            states: 情绪状态轨迹（或其按轮次切出的片段）
+            start: 序列中第一个状态在完整轨迹中的下标（用于增量分析时的轮次编号）
+        """
         if not states:
             return "无情绪记录"
         
         trajectory = []
-        for i, state in enumerate(states):
+        for i, state in enumerate(states, start=start):
             desc = state._get_emotion_description()
             trajectory.append(f"第 {i+1} 轮后：{desc}")
         
         return "\n".join(trajectory)
 
 
-model_b_service = ModelBService()
\ No newline at end of file
+model_b_service: ModelBService = LazyProxy(ModelBService)  # type: ignore[assignment]
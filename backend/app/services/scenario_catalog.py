@@ -0,0 +1,155 @@
+"""
+情境目录
+
+内置的 first_meet 情境之外，app/data/scenarios/ 下的每个 JSON 文件定义一个情境
+（文件名不限，以其中的 id 为准，同名时覆盖内置情境）。
+情境按 ID 建立字典索引，查找为 O(1)；加载时即为每个情境预编译全部 243 种
+system prompt，首轮对话无需现拼。
+开启热加载时，get() 最多每 SCENARIO_RELOAD_INTERVAL 秒检查一次文件修改时间，
+文件变化后重新解析、让旧的 Prompt 缓存失效并重新预编译；
+解析失败的文件只打印错误，继续使用旧版本。
+"""
+import json
+import time
+from pathlib import Path
+
+from app.core.config import settings
+from app.core.lazy import LazyProxy
+from app.models.state import Scenario
+from app.prompts.model_a_prompts import SCENARIO_FIRST_MEET
+from app.prompts.prompt_compiler import prompt_compiler
+
+
+SCENARIO_DIR = Path(__file__).resolve().parent.parent / "data" / "scenarios"
+
+
+class ScenarioNotFoundError(KeyError):
+    """情境不存在"""
+
+
+class ScenarioCatalog:
+    """按 ID 索引的情境目录"""
+    
+    def __init__(self, directory: str | Path | None = None, reload_interval: float | None = None):
+        """
+        Args:
+            directory: 情境文件目录，默认读取 settings.SCENARIO_DIR（为空时使用内置目录）
+            reload_interval: 检查文件变化的最短间隔（秒），0 表示不热加载，
+                默认读取 settings.SCENARIO_RELOAD_INTERVAL
+        """
+        self.directory = Path(directory or settings.SCENARIO_DIR or SCENARIO_DIR)
+        if reload_interval is None:
+            reload_interval = settings.SCENARIO_RELOAD_INTERVAL
+        self.reload_interval = reload_interval
+        
+        self._builtin = Scenario.model_validate(SCENARIO_FIRST_MEET)
+        self._scenarios: dict[str, Scenario] = {}
+        self._sources: dict[Path, tuple[float, str]] = {}  # 文件 -> (修改时间, 情境 ID)
+        self._next_check = 0.0
+        self.reloads = 0
+        
+        self._register(self._builtin)
+        self._scan()
+        self.reloads = 0  # 只统计启动之后的热加载次数
+        self._next_check = time.monotonic() + self.reload_interval
+    
+    def get(self, scenario_id: str) -> Scenario:
+        """
+        按 ID 获取情境
+        
+        Raises:
+            ScenarioNotFoundError: 情境不存在
+        """
+        if self.reload_interval and time.monotonic() >= self._next_check:
+            self.refresh()
+        scenario = self._scenarios.get(scenario_id)
+        if scenario is None:
+            raise ScenarioNotFoundError(scenario_id)
+        return scenario
+    
+    def list(self) -> list[Scenario]:
+        """全部情境（按 ID 排序）"""
+        if self.reload_interval and time.monotonic() >= self._next_check:
+            self.refresh()
+        return [self._scenarios[key] for key in sorted(self._scenarios)]
+    
+    def __contains__(self, scenario_id: str) -> bool:
+        return scenario_id in self._scenarios
+    
+    def __len__(self) -> int:
+        return len(self._scenarios)
+    
+    def refresh(self) -> int:
+        """
+        重新检查目录中的文件，加载新增或修改过的情境
+        
+        Returns:
+            本次重新加载的情境数
+        """
+        self._next_check = time.monotonic() + self.reload_interval
+        return self._scan()
+    
+    def _scan(self) -> int:
+        try:
+            paths = {path: path.stat().st_mtime for path in self.directory.glob("*.json")}
+        except OSError as e:
+            print(f"❌ 读取情境目录失败 {self.directory}: {e}")
+            return 0
+        
+        # 删除的文件：移除对应情境（内置情境恢复为默认版本）
+        for path in [p for p in self._sources if p not in paths]:
+            _, scenario_id = self._sources.pop(path)
+            self._unregister(scenario_id)
+        
+        loaded = 0
+        for path in sorted(paths):
+            mtime = paths[path]
+            source = self._sources.get(path)
+            if source is not None and source[0] == mtime:
+                continue
+            scenario = self._load_file(path)
+            if scenario is None:
+                # 保留旧版本，但记下修改时间，避免每次检查都重复报错
+                if source is not None:
+                    self._sources[path] = (mtime, source[1])
+                continue
+            if source is not None and source[1] != scenario.id:
+                self._unregister(source[1])
+            self._sources[path] = (mtime, scenario.id)
+            self._register(scenario)
+            loaded += 1
+        
+        self.reloads += loaded
+        return loaded
+    
+    def _load_file(self, path: Path) -> Scenario | None:
+        try:
+            with open(path, encoding="utf-8") as f:
+                return Scenario.model_validate(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"❌ 情境文件无效 {path.name}: {e}")
+            return None
+    
+    def _register(self, scenario: Scenario):
+        self._scenarios[scenario.id] = scenario
+        prompt_compiler.invalidate(scenario.id)
+        prompt_compiler.precompile(scenario)
+    
+    def _unregister(self, scenario_id: str):
+        if scenario_id == self._builtin.id:
+            self._register(self._builtin)
+            return
+        self._scenarios.pop(scenario_id, None)
+        prompt_compiler.invalidate(scenario_id)
+    
+    def stats(self) -> dict:
+        """目录统计"""
+        return {
+            "scenarios": len(self._scenarios),
+            "files": len(self._sources),
+            "reloads": self.reloads
+        }
+
+
+# 全局实例（首次使用时加载）
+scenario_catalog: ScenarioCatalog = LazyProxy(ScenarioCatalog)  # type: ignore[assignment]
@@ -0,0 +1,154 @@
+"""
+服务指标
+
+基于 LLMClient 与 DialogueManager 的事件回调收集指标：
+- 直方图：整轮对话耗时、首 token 延迟、分析（Model B）耗时、单次 LLM 调用耗时
+- 计数器：LLM 调用数、token 数（含命中上游 prompt 缓存的部分）、上游错误（按状态码，含 429）、重试次数
+- 仪表：活跃会话数、在途 LLM 请求数、自适应并发上限、排队请求数、连接池使用情况
+  （仪表在导出时读取，不占用热路径）
+"""
+import httpx
+
+from app.core.config import settings
+from app.core.llm_client import LLMClientHooks, Priority, llm_client
+from app.core.metrics import MetricsFileWriter, metrics_registry
+from app.core.usage import CallUsage
+from app.services.dialogue_manager import DialogueHooks, DialogueManager
+from app.services.session_registry import SessionRegistry
+
+
+TURN_DURATION = metrics_registry.histogram(
+    "dialogue_turn_duration_seconds", "整轮对话耗时（含 Model A 调用）"
+)
+ANALYSIS_DURATION = metrics_registry.histogram(
+    "dialogue_analysis_duration_seconds", "对话分析（Model B）耗时", labels=("source",)
+)
+LLM_TTFT = metrics_registry.histogram(
+    "llm_time_to_first_token_seconds", "流式调用的首 token 延迟", labels=("priority",)
+)
+LLM_DURATION = metrics_registry.histogram(
+    "llm_request_duration_seconds", "单次 LLM 调用耗时（含排队与重试）", labels=("model", "priority")
+)
+LLM_QUEUE_TIME = metrics_registry.histogram(
+    "llm_queue_wait_seconds", "等待调度器并发槽位的时间", labels=("priority",),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+)
+LLM_REQUESTS = metrics_registry.counter(
+    "llm_requests_total", "成功完成的 LLM 调用数", labels=("model", "priority")
+)
+LLM_TOKENS = metrics_registry.counter(
+    "llm_tokens_total", "LLM token 用量（kind 为 cached 时是 prompt 中命中上游缓存的部分）",
+    labels=("model", "kind")
+)
+LLM_ERRORS = metrics_registry.counter(
+    "llm_upstream_errors_total", "上游请求失败次数（status 为 HTTP 状态码或 transport）",
+    labels=("status",)
+)
+LLM_RETRIES = metrics_registry.counter("llm_retries_total", "上游请求重试次数")
+
+ACTIVE_SESSIONS = metrics_registry.gauge("dialogue_active_sessions", "内存中的会话数")
+BUSY_SESSIONS = metrics_registry.gauge("dialogue_busy_sessions", "正在处理请求的会话数")
+LLM_IN_FLIGHT = metrics_registry.gauge("llm_in_flight_requests", "占用并发槽位的 LLM 请求数")
+LLM_LIMIT = metrics_registry.gauge("llm_concurrency_limit", "自适应并发上限")
+LLM_QUEUED = metrics_registry.gauge("llm_queued_requests", "等待并发槽位的请求数", labels=("priority",))
+LLM_POOL = metrics_registry.gauge("llm_pool_connections", "LLM 连接池连接数", labels=("state",))
+
+
+# 优先级标签值，按优先级数值下标（避免在热路径上读取枚举属性或计算枚举的哈希）
+_PRIORITY_LABELS = [priority.name.lower() for priority in sorted(Priority)]
+
+
+class _LLMMetricsHooks(LLMClientHooks):
+    def __init__(self):
+        # (模型, 优先级) -> 该组标签对应的子指标，首次出现时解析一次
+        self._children: dict[tuple[str, int], tuple] = {}
+    
+    def on_call(self, call: CallUsage, priority: Priority):
+        key = (call.model, int(priority))
+        children = self._children.get(key)
+        if children is None:
+            name = _PRIORITY_LABELS[priority]
+            children = self._children[key] = (
+                LLM_REQUESTS.labels(call.model, name),
+                LLM_DURATION.labels(call.model, name),
+                LLM_QUEUE_TIME.labels(name),
+                LLM_TOKENS.labels(call.model, "prompt"),
+                LLM_TOKENS.labels(call.model, "completion"),
+                LLM_TOKENS.labels(call.model, "cached")
+            )
+        requests, duration, queue_time, prompt_tokens, completion_tokens, cached_tokens = children
+        requests.inc()
+        duration.observe(call.wall_time)
+        queue_time.observe(call.queue_time)
+        prompt_tokens.inc(call.prompt_tokens)
+        completion_tokens.inc(call.completion_tokens)
+        if call.cached_tokens:
+            cached_tokens.inc(call.cached_tokens)
+    
+    def on_first_token(self, ttft: float, priority: Priority):
+        LLM_TTFT.labels(_PRIORITY_LABELS[priority]).observe(ttft)
+    
+    def on_error(self, error: httpx.HTTPError, retrying: bool):
+        if isinstance(error, httpx.HTTPStatusError):
+            status = str(error.response.status_code)
+        else:
+            status = "transport"
+        LLM_ERRORS.labels(status).inc()
+        if retrying:
+            LLM_RETRIES.inc()
+
+
+class _DialogueMetricsHooks(DialogueHooks):
+    def on_turn(self, manager: DialogueManager, seconds: float):
+        TURN_DURATION.observe(seconds)
+    
+    def on_analysis(self, manager: DialogueManager, seconds: float, prefetched: bool):
+        ANALYSIS_DURATION.labels("prefetch" if prefetched else "llm").observe(seconds)
+
+
+_installed = False
+
+
+def install_metrics(registry: SessionRegistry | None = None):
+    """
+    挂载指标回调（重复调用无副作用）
+    
+    Args:
+        registry: 会话注册表，提供时导出会话数仪表（CLI 没有注册表时不提供）
+    """
+    global _installed
+    if registry is not None:
+        ACTIVE_SESSIONS.set_function(lambda: registry.stats()["sessions"])
+        BUSY_SESSIONS.set_function(lambda: registry.stats()["busy_sessions"])
+    if _installed:
+        return
+    _installed = True
+    
+    llm_client.hooks.append(_LLMMetricsHooks())
+    DialogueManager.hooks.append(_DialogueMetricsHooks())
+    
+    LLM_IN_FLIGHT.set_function(lambda: llm_client.scheduler.in_flight)
+    LLM_LIMIT.set_function(lambda: llm_client.scheduler.limit)
+    for name in _PRIORITY_LABELS:
+        LLM_QUEUED.labels(name).set_function(
+            lambda name=name: llm_client.scheduler.stats()["queued"][name]
+        )
+    for state in ("active", "idle"):
+        LLM_POOL.labels(state).set_function(
+            lambda state=state: llm_client.pool_stats().get(state, 0)
+        )
+
+
+def start_metrics_file() -> MetricsFileWriter | None:
+    """
+    为没有 HTTP 服务的进程（CLI）启动旁路指标文件
+    
+    Returns:
+        已启动的写入器；未配置 METRICS_FILE 时返回 None
+    """
+    if not settings.METRICS_FILE:
+        return None
+    install_metrics()
+    writer = MetricsFileWriter(metrics_registry, settings.METRICS_FILE, settings.METRICS_FILE_INTERVAL)
+    writer.start()
+    return writer
@@ -0,0 +1,267 @@
+"""
+多会话注册表
+
+按会话 ID 管理大量相互独立的 DialogueManager 实例：
+- 同一会话的轮次通过会话级 asyncio.Lock 串行执行
+- 不同会话之间完全并行
+- 超过容量上限时按 LRU 淘汰空闲会话
+- 配置了持久化存储时，不在内存中的会话（被淘汰或进程重启）在首次使用时从存储恢复
+"""
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable
+
+from app.core.config import settings
+from app.core.lazy import LazyProxy
+from app.core.llm_client import ChunkCallback
+from app.services.dialogue_manager import DialogueManager
+from app.services.session_store import SessionStore, get_session_store
+
+
+class SessionLimitError(RuntimeError):
+    """会话数已达上限且没有可淘汰的空闲会话"""
+
+
+class SessionBusyError(RuntimeError):
+    """会话正在处理轮次（或有调用在排队），不能移除"""
+
+
+class _SessionEntry:
+    """注册表内部条目"""
+    
+    __slots__ = ("manager", "lock", "last_active", "pending")
+    
+    def __init__(self, manager: DialogueManager):
+        self.manager = manager
+        self.lock = asyncio.Lock()
+        self.last_active = time.monotonic()
+        self.pending = 0  # 正在等待或持有锁的调用数
+    
+    @property
+    def idle(self) -> bool:
+        return self.pending == 0
+
+
+class SessionRegistry:
+    """会话注册表"""
+    
+    def __init__(
+        self,
+        max_sessions: int | None = None,
+        manager_factory: Callable[[str], DialogueManager] | None = None,
+        store: SessionStore | None = None
+    ):
+        """
+        Args:
+            max_sessions: 最大会话数，默认读取 settings.MAX_SESSIONS
+            manager_factory: 根据会话 ID 创建 DialogueManager 的工厂函数
+            store: 会话持久化存储，默认使用 get_session_store()（未配置时不持久化）
+        """
+        self.max_sessions = max_sessions or settings.MAX_SESSIONS
+        self.store = store or get_session_store()
+        self._manager_factory = manager_factory or (
+            lambda session_id: DialogueManager(session_id=session_id, store=self.store)
+        )
+        self._sessions: OrderedDict[str, _SessionEntry] = OrderedDict()
+        self._resuming: dict[str, asyncio.Task] = {}
+        self.evicted_count = 0
+        self.resumed_count = 0
+    
+    def __len__(self) -> int:
+        return len(self._sessions)
+    
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+    
+    async def create(
+        self,
+        session_id: str | None = None,
+        scenario_id: str = "first_meet",
+        token_budget: int | None = None,
+        cost_budget: float | None = None
+    ) -> str:
+        """
+        创建并初始化新会话
+        
+        Args:
+            session_id: 会话 ID，为空时自动生成
+            scenario_id: 情境 ID
+            token_budget: 会话 token 预算，默认读取 settings.SESSION_TOKEN_BUDGET
+            cost_budget: 会话费用预算，默认读取 settings.SESSION_COST_BUDGET
+        
+        Returns:
+            会话 ID
+        
+        Raises:
+            ValueError: 会话已存在（在内存中，或已持久化但被淘汰 / 进程重启）
+        """
+        if session_id is None:
+            session_id = uuid.uuid4().hex
+        elif self.store is not None and await self.store.has_session(session_id):
+            # 已持久化的会话（被淘汰或进程重启）重新创建会清空其历史，应通过 resume 继续使用
+            raise ValueError(f"会话已存在: {session_id}")
+        if session_id in self._sessions:
+            raise ValueError(f"会话已存在: {session_id}")
+        
+        self._evict_idle(reserve=1)
+        
+        manager = self._manager_factory(session_id)
+        if token_budget is not None:
+            manager.usage.token_budget = token_budget
+        if cost_budget is not None:
+            manager.usage.cost_budget = cost_budget
+        manager.start_new_dialogue(scenario_id)
+        self._sessions[session_id] = _SessionEntry(manager)
+        return session_id
+    
+    def get(self, session_id: str) -> DialogueManager | None:
+        """获取会话（不加锁，仅用于只读查看）"""
+        entry = self._sessions.get(session_id)
+        return entry.manager if entry else None
+    
+    async def resume(self, session_id: str) -> bool:
+        """
+        从持久化存储恢复会话到内存（已在内存中时直接返回 True）
+        
+        Returns:
+            会话是否可用
+        """
+        if session_id in self._sessions:
+            return True
+        if self.store is None:
+            return False
+        
+        # 同一会话的并发恢复只读取一次
+        task = self._resuming.get(session_id)
+        if task is None:
+            task = asyncio.ensure_future(self.store.load_session(session_id))
+            self._resuming[session_id] = task
+        try:
+            snapshot = await asyncio.shield(task)
+        finally:
+            self._resuming.pop(session_id, None)
+        
+        if snapshot is None:
+            return False
+        if session_id not in self._sessions:
+            self._evict_idle(reserve=1)
+            manager = self._manager_factory(session_id)
+            manager.restore(snapshot)
+            self._sessions[session_id] = _SessionEntry(manager)
+            self.resumed_count += 1
+        return True
+    
+    def remove(self, session_id: str) -> bool:
+        """
+        移除内存中的会话（已持久化的数据保留，之后仍可恢复）
+        
+        Returns:
+            会话是否存在
+        
+        Raises:
+            SessionBusyError: 会话正在使用中；此时移除会让排队的调用找不到会话
+        """
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return False
+        if not entry.idle:
+            raise SessionBusyError(f"会话正在使用中: {session_id}")
+        del self._sessions[session_id]
+        entry.manager.close()
+        return True
+    
+    @asynccontextmanager
+    async def session(self, session_id: str) -> AsyncIterator[DialogueManager]:
+        """
+        独占地使用某个会话
+        
+        持有期间该会话不会被淘汰，同一会话的其他调用会排队等待。
+        
+        Raises:
+            KeyError: 会话不存在（内存与持久化存储中都没有）
+        """
+        entry = self._sessions.get(session_id)
+        if entry is None and await self.resume(session_id):
+            entry = self._sessions.get(session_id)
+        if entry is None:
+            raise KeyError(session_id)
+        
+        entry.pending += 1
+        try:
+            async with entry.lock:
+                self._touch(session_id, entry)
+                yield entry.manager
+        finally:
+            entry.pending -= 1
+            entry.last_active = time.monotonic()
+    
+    async def process_user_input(
+        self,
+        session_id: str,
+        user_input: str,
+        on_chunk: ChunkCallback | None = None
+    ) -> str:
+        """在指定会话中处理一轮用户输入"""
+        async with self.session(session_id) as manager:
+            return await manager.process_user_input(user_input, on_chunk=on_chunk)
+    
+    async def get_analysis(
+        self,
+        session_id: str,
+        recent_turns: int = 5,
+        incremental: bool | None = None
+    ) -> str:
+        """
+        获取指定会话的对话分析
+        
+        会话锁只在拍下对话快照时持有，Model B 调用在锁外进行，
+        分析期间同一会话的新轮次不会被阻塞。
+        """
+        async with self.session(session_id) as manager:
+            analysis = manager.begin_analysis(recent_turns=recent_turns, incremental=incremental)
+        return await analysis
+    
+    def stats(self) -> dict:
+        """注册表统计信息"""
+        busy = sum(1 for entry in self._sessions.values() if not entry.idle)
+        return {
+            "sessions": len(self._sessions),
+            "busy_sessions": busy,
+            "max_sessions": self.max_sessions,
+            "evicted": self.evicted_count,
+            "resumed": self.resumed_count
+        }
+    
+    def _touch(self, session_id: str, entry: _SessionEntry):
+        """标记为最近使用"""
+        entry.last_active = time.monotonic()
+        self._sessions.move_to_end(session_id)
+    
+    def _evict_idle(self, reserve: int = 0):
+        """按 LRU 顺序淘汰空闲会话，直到能容纳 reserve 个新会话"""
+        overflow = len(self._sessions) + reserve - self.max_sessions
+        if overflow <= 0:
+            return
+        
+        # OrderedDict 头部为最久未使用的会话
+        victims = []
+        for session_id, entry in self._sessions.items():
+            if entry.idle:
+                victims.append(session_id)
+                if len(victims) >= overflow:
+                    break
+        
+        if len(victims) < overflow:
+            raise SessionLimitError(
+                f"会话数已达上限 {self.max_sessions}，且没有可淘汰的空闲会话"
+            )
+        
+        for session_id in victims:
+            self._sessions.pop(session_id).manager.close()
+        self.evicted_count += len(victims)
+
+
+session_registry: SessionRegistry = LazyProxy(SessionRegistry)  # type: ignore[assignment]
@@ -0,0 +1,449 @@
+"""
+会话持久化存储（SQLite WAL + 后台批量写入）
+
+对话路径上只把写操作追加到内存缓冲区，不做任何 I/O；
+后台任务按间隔（或积压达到阈值时）把缓冲区在一个事务内批量写入，
+实际的数据库操作通过 asyncio.to_thread 在线程中执行，不阻塞事件循环。
+
+读取前会先写入积压数据，长历史通过按序号的键集分页（keyset）分批读取，内存占用有界。
+"""
+import asyncio
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator
+
+from app.core.config import BASE_DIR, settings
+from app.core.usage import SessionUsage
+from app.models.dialogue import MessageRecord
+from app.models.state import DIMENSIONS, EmotionalState
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    scenario_id TEXT NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS states (
+    session_id TEXT NOT NULL,
+    turn INTEGER NOT NULL,
+    valence REAL NOT NULL,
+    arousal REAL NOT NULL,
+    trust REAL NOT NULL,
+    openness REAL NOT NULL,
+    distance REAL NOT NULL,
+    PRIMARY KEY (session_id, turn)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS session_usage (
+    session_id TEXT PRIMARY KEY,
+    token_budget INTEGER NOT NULL,
+    cost_budget REAL NOT NULL,
+    calls INTEGER NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    cost REAL NOT NULL,
+    rejected INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+# 缓冲区中的操作类型 -> SQL（同类操作用 executemany 批量执行）
+_STATEMENTS = {
+    "reset_messages": "DELETE FROM messages WHERE session_id = ?",
+    "reset_states": "DELETE FROM states WHERE session_id = ?",
+    "session": (
+        "INSERT INTO sessions (session_id, scenario_id, created, updated) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT (session_id) DO UPDATE SET "
+        "scenario_id = excluded.scenario_id, updated = excluded.updated"
+    ),
+    "message": (
+        "INSERT OR REPLACE INTO messages (session_id, seq, role, content, created) "
+        "VALUES (?, ?, ?, ?, ?)"
+    ),
+    "state": (
+        "INSERT OR REPLACE INTO states (session_id, turn, valence, arousal, trust, openness, distance) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)"
+    ),
+    "usage": (
+        "INSERT OR REPLACE INTO session_usage (session_id, token_budget, cost_budget, calls, "
+        "prompt_tokens, completion_tokens, cost, rejected) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+    ),
+}
+
+
+class SessionSnapshot:
+    """从存储中恢复的会话数据"""
+    
+    __slots__ = (
+        "session_id", "scenario_id", "message_count", "messages", "state_count", "states", "usage"
+    )
+    
+    def __init__(
+        self,
+        session_id: str,
+        scenario_id: str,
+        message_count: int,
+        messages: list[MessageRecord],
+        states: list[EmotionalState],
+        usage: SessionUsage | None = None,
+        state_count: int | None = None
+    ):
+        self.session_id = session_id
+        self.scenario_id = scenario_id
+        self.message_count = message_count  # 会话的消息总数（messages 只包含最近一段）
+        self.messages = messages
+        # 状态总数；states 只包含初始状态与最近一段
+        self.state_count = len(states) if state_count is None else state_count
+        self.states = states
+        self.usage = usage  # 会话预算与已用量（没有记录时为 None）
+
+
+class SessionStore:
+    """SQLite 会话存储"""
+    
+    def __init__(
+        self,
+        path: str | Path,
+        flush_interval: float | None = None,
+        flush_batch: int | None = None
+    ):
+        """
+        Args:
+            path: 数据库文件路径（相对路径相对于项目根目录）
+            flush_interval: 后台写入间隔（秒），默认读取 settings.SESSION_FLUSH_INTERVAL
+            flush_batch: 积压达到该条数时立即写入，默认读取 settings.SESSION_FLUSH_BATCH
+        """
+        path = Path(path)
+        self.path = path if path.is_absolute() else BASE_DIR / path
+        self.flush_interval = flush_interval or settings.SESSION_FLUSH_INTERVAL
+        self.flush_batch = flush_batch or settings.SESSION_FLUSH_BATCH
+        
+        self._pending: list[tuple[str, tuple]] = []
+        self._wakeup: asyncio.Event | None = None
+        self._flusher: asyncio.Task | None = None
+        self._flush_lock: asyncio.Lock | None = None
+        
+        # 写连接与读连接分开（WAL 下读写互不阻塞），各自用线程锁串行化
+        self._write_conn: sqlite3.Connection | None = None
+        self._read_conn: sqlite3.Connection | None = None
+        self._write_guard = threading.Lock()
+        self._read_guard = threading.Lock()
+        
+        self.flushed_batches = 0
+        self.flushed_ops = 0
+    
+    # ---------- 写入（对话路径，仅追加到缓冲区） ----------
+    
+    def record_session(self, session_id: str, scenario_id: str, reset: bool = False):
+        """
+        记录会话元数据
+        
+        Args:
+            reset: 是否清空该会话已有的消息与状态（重新开始对话时使用）
+        """
+        if reset:
+            self._enqueue("reset_messages", (session_id,))
+            self._enqueue("reset_states", (session_id,))
+        now = time.time()
+        self._enqueue("session", (session_id, scenario_id, now, now))
+    
+    def record_message(self, session_id: str, seq: int, message: MessageRecord):
+        """记录一条消息（seq 为会话内从 0 开始的序号）"""
+        self._enqueue("message", (
+            session_id, seq, message.role, message.content, message.timestamp.timestamp()
+        ))
+    
+    def record_state(self, session_id: str, turn: int, state: EmotionalState):
+        """记录第 turn 轮之后的情绪状态（0 为初始状态）"""
+        self._enqueue("state", (session_id, turn, *(getattr(state, dim) for dim in DIMENSIONS)))
+    
+    def record_usage(self, session_id: str, usage: SessionUsage):
+        """记录会话预算与已用总量（覆盖之前的记录）"""
+        total = usage.total
+        self._enqueue("usage", (
+            session_id, usage.token_budget, usage.cost_budget, total.calls,
+            total.prompt_tokens, total.completion_tokens, total.cost, usage.rejected
+        ))
+    
+    def _enqueue(self, kind: str, params: tuple):
+        self._pending.append((kind, params))
+        self._ensure_flusher()
+        if len(self._pending) >= self.flush_batch and self._wakeup is not None:
+            self._wakeup.set()
+    
+    @property
+    def pending(self) -> int:
+        """尚未写入数据库的操作数"""
+        return len(self._pending)
+    
+    # ---------- 后台批量写入 ----------
+    
+    def _ensure_flusher(self):
+        """在有事件循环时启动后台写入任务（没有事件循环时只缓冲，由 flush 写入）"""
+        if self._flusher is not None and not self._flusher.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._wakeup = asyncio.Event()
+        self._flusher = loop.create_task(self._flush_loop())
+    
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                # 写入失败的批次已放回缓冲区，下个周期重试
+                print(f"会话持久化写入失败: {e}")
+    
+    async def flush(self):
+        """把缓冲区中的操作在一个事务内写入数据库"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            except Exception:
+                self._pending[:0] = batch
+                raise
+            self.flushed_batches += 1
+            self.flushed_ops += len(batch)
+    
+    def _write_batch(self, batch: list[tuple[str, tuple]]):
+        """按顺序把连续的同类操作合并为 executemany，整批一个事务"""
+        with self._write_guard:
+            conn = self._connect_writer()
+            with conn:
+                start = 0
+                while start < len(batch):
+                    kind = batch[start][0]
+                    end = start
+                    while end < len(batch) and batch[end][0] == kind:
+                        end += 1
+                    conn.executemany(_STATEMENTS[kind], [params for _, params in batch[start:end]])
+                    start = end
+    
+    def _connect_writer(self) -> sqlite3.Connection:
+        if self._write_conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._write_conn = conn
+        return self._write_conn
+    
+    def _connect_reader(self) -> sqlite3.Connection:
+        if self._read_conn is None:
+            with self._write_guard:
+                self._connect_writer()  # 确保数据库与表结构已创建
+            self._read_conn = sqlite3.connect(self.path, check_same_thread=False)
+        return self._read_conn
+    
+    def _query(self, sql: str, params: tuple) -> list[tuple]:
+        with self._read_guard:
+            return self._connect_reader().execute(sql, params).fetchall()
+    
+    # ---------- 读取 ----------
+    
+    async def load_session(
+        self,
+        session_id: str,
+        max_messages: int | None = None,
+        max_states: int | None = None
+    ) -> SessionSnapshot | None:
+        """
+        恢复会话
+        
+        消息与情绪状态都只加载最近一段，长会话恢复时的内存占用有上限；
+        完整历史通过 iter_messages / iter_states 分页读取。
+        
+        Args:
+            session_id: 会话 ID
+            max_messages: 加载到内存的最近消息数，默认读取 settings.SESSION_RESUME_MESSAGES
+            max_states: 除初始状态外加载的最近状态数，默认与最近消息覆盖的轮数相同
+        
+        Returns:
+            会话数据，不存在时返回 None
+        """
+        await self.flush()
+        if max_messages is None:
+            max_messages = settings.SESSION_RESUME_MESSAGES
+        if max_states is None:
+            max_states = max_messages // 2
+        return await asyncio.to_thread(self._load_session, session_id, max_messages, max_states)
+    
+    def _load_session(
+        self,
+        session_id: str,
+        max_messages: int,
+        max_states: int
+    ) -> SessionSnapshot | None:
+        rows = self._query("SELECT scenario_id FROM sessions WHERE session_id = ?", (session_id,))
+        if not rows:
+            return None
+        
+        count_rows = self._query(
+            "SELECT COALESCE(MAX(seq) + 1, 0) FROM messages WHERE session_id = ?", (session_id,)
+        )
+        message_count = count_rows[0][0]
+        message_rows = self._query(
+            "SELECT role, content, created FROM messages WHERE session_id = ? AND seq >= ? ORDER BY seq",
+            (session_id, max(0, message_count - max_messages))
+        )
+        state_count = self._query(
+            "SELECT COALESCE(MAX(turn) + 1, 0) FROM states WHERE session_id = ?", (session_id,)
+        )[0][0]
+        # 初始状态（第 0 行）加最近 max_states 轮
+        state_rows = self._query(
+            "SELECT valence, arousal, trust, openness, distance FROM states "
+            "WHERE session_id = ? AND (turn = 0 OR turn >= ?) ORDER BY turn",
+            (session_id, max(1, state_count - max_states))
+        )
+        usage_rows = self._query(
+            "SELECT token_budget, cost_budget, calls, prompt_tokens, completion_tokens, cost, rejected "
+            "FROM session_usage WHERE session_id = ?",
+            (session_id,)
+        )
+        return SessionSnapshot(
+            session_id=session_id,
+            scenario_id=rows[0][0],
+            message_count=message_count,
+            messages=[
+                MessageRecord.restore(role, content, datetime.fromtimestamp(created))
+                for role, content, created in message_rows
+            ],
+            states=[EmotionalState(**dict(zip(DIMENSIONS, row))) for row in state_rows],
+            usage=SessionUsage.restore(*usage_rows[0]) if usage_rows else None,
+            state_count=state_count
+        )
+    
+    async def iter_messages(
+        self,
+        session_id: str,
+        after_seq: int = -1,
+        page_size: int = 500
+    ) -> AsyncIterator[tuple[int, MessageRecord]]:
+        """
+        按序号分页读取完整历史，每次只在内存中保留一页
+        
+        Args:
+            session_id: 会话 ID
+            after_seq: 从该序号之后开始读取
+            page_size: 每页条数
+        
+        Yields:
+            (序号, 消息记录)
+        """
+        await self.flush()
+        while True:
+            rows = await asyncio.to_thread(
+                self._query,
+                "SELECT seq, role, content, created FROM messages "
+                "WHERE session_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+                (session_id, after_seq, page_size)
+            )
+            for seq, role, content, created in rows:
+                yield seq, MessageRecord.restore(role, content, datetime.fromtimestamp(created))
+            if len(rows) < page_size:
+                return
+            after_seq = rows[-1][0]
+    
+    async def iter_states(
+        self,
+        session_id: str,
+        after_turn: int = -1,
+        page_size: int = 500
+    ) -> AsyncIterator[tuple[int, EmotionalState]]:
+        """
+        按轮次分页读取完整情绪轨迹，每次只在内存中保留一页
+        
+        Yields:
+            (轮次, 该轮结束后的状态)，轮次 0 为初始状态
+        """
+        await self.flush()
+        while True:
+            rows = await asyncio.to_thread(
+                self._query,
+                "SELECT turn, valence, arousal, trust, openness, distance FROM states "
+                "WHERE session_id = ? AND turn > ? ORDER BY turn LIMIT ?",
+                (session_id, after_turn, page_size)
+            )
+            for turn, *values in rows:
+                yield turn, EmotionalState(**dict(zip(DIMENSIONS, values)))
+            if len(rows) < page_size:
+                return
+            after_turn = rows[-1][0]
+    
+    async def has_session(self, session_id: str) -> bool:
+        """会话是否已持久化"""
+        await self.flush()
+        rows = await asyncio.to_thread(
+            self._query, "SELECT 1 FROM sessions WHERE session_id = ?", (session_id,)
+        )
+        return bool(rows)
+    
+    async def list_sessions(self, after: str = "", limit: int = 100) -> list[str]:
+        """按会话 ID 分页列出已持久化的会话"""
+        await self.flush()
+        rows = await asyncio.to_thread(
+            self._query,
+            "SELECT session_id FROM sessions WHERE session_id > ? ORDER BY session_id LIMIT ?",
+            (after, limit)
+        )
+        return [row[0] for row in rows]
+    
+    def stats(self) -> dict:
+        """写入统计"""
+        return {
+            "pending": len(self._pending),
+            "flushed_batches": self.flushed_batches,
+            "flushed_ops": self.flushed_ops
+        }
+    
+    async def close(self):
+        """停止后台任务，写入剩余数据并关闭连接"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush()
+        for conn in (self._write_conn, self._read_conn):
+            if conn is not None:
+                conn.close()
+        self._write_conn = None
+        self._read_conn = None
+
+
+_session_store: SessionStore | None = None
+
+
+def get_session_store() -> SessionStore | None:
+    """全局会话存储（首次调用时按配置创建，未配置 SESSION_DB_PATH 时返回 None）"""
+    global _session_store
+    if _session_store is None and settings.SESSION_DB_PATH:
+        _session_store = SessionStore(settings.SESSION_DB_PATH)
+    return _session_store
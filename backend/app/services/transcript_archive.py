@@ -0,0 +1,561 @@
+"""
+内存映射的列式对话归档（离线分析用）
+
+一个归档是一个目录，每一列是一个定长记录的二进制文件，可直接用 np.memmap 打开：
+    
+    sessions.bin  每个会话一条：会话 ID、情境编号，以及在各列中的起始位置与条数
+    states.bin    情绪轨迹，float32 × 5（DIMENSIONS 顺序），每轮一行
+    levels.bin    每行状态的离散档位编码（uint8，0~242）
+    messages.bin  每条消息：角色、正文在 text.bin 中的偏移与字节数、字符数、创建时间
+    text.bin      全部消息正文（UTF-8 拼接），按偏移读取
+    cues.bin      每条用户消息命中的线索：消息下标、所在轮次、类别编号、线索编号、权重
+    meta.json     各列条数，以及情境、类别、线索的名称表
+
+轨迹与消息长度的筛选不需要解析任何文本；扫描按块进行，内存占用与归档大小无关。
+修改词典后可用 rescore 按已归档的线索命中重新推演各会话的最终状态，同样不解析文本。
+"""
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from app.models.dialogue import DialogueContext, MessageRecord
+from app.models.state import DIMENSIONS
+from app.models.state_store import EmotionalStateStore, level_codes
+from app.models.trajectory import StateTrajectory, encode_levels
+from app.services.lexicon_engine import LexiconStateEngine, get_lexicon_engine
+from app.services.scenario_catalog import scenario_catalog
+from app.services.session_store import SessionStore
+
+
+ARCHIVE_VERSION = 1
+
+ROLES = ("user", "assistant", "system")
+
+# 会话 ID 的最大字节数（UTF-8），与 SESSION_DTYPE 的 S64 一致
+MAX_SESSION_ID_BYTES = 64
+
+SESSION_DTYPE = np.dtype([
+    ("session_id", "S64"),
+    ("scenario", "<u2"),
+    ("message_start", "<i8"),
+    ("message_count", "<i4"),
+    ("state_start", "<i8"),
+    ("state_count", "<i4"),
+    ("cue_start", "<i8"),
+    ("cue_count", "<i4"),
+])
+
+MESSAGE_DTYPE = np.dtype([
+    ("role", "u1"),
+    ("text_offset", "<i8"),
+    ("text_bytes", "<u4"),
+    ("chars", "<u4"),
+    ("created", "<f8"),
+])
+
+CUE_DTYPE = np.dtype([
+    ("message", "<i8"),   # 全局消息下标
+    ("turn", "<i4"),      # 会话内轮次（对应 states 中该会话的第 turn 行）
+    ("category", "<u2"),
+    ("cue", "<u4"),
+    ("weight", "<f4"),
+])
+
+STATE_DTYPE = np.dtype("<f4")
+
+_COLUMNS = {
+    "sessions": SESSION_DTYPE,
+    "states": STATE_DTYPE,
+    "levels": np.dtype("u1"),
+    "messages": MESSAGE_DTYPE,
+    "text": np.dtype("u1"),
+    "cues": CUE_DTYPE,
+}
+
+
+def _intern(table: dict[str, int], name: str, dtype: np.dtype, label: str) -> int:
+    """把名称映射为编号，编号超出列类型的取值范围时报错而不是溢出"""
+    index = table.get(name)
+    if index is None:
+        index = len(table)
+        if index > np.iinfo(dtype).max:
+            raise ValueError(f"{label}数量超过归档上限 {np.iinfo(dtype).max + 1}")
+        table[name] = index
+    return index
+
+
+class TranscriptArchiveWriter:
+    """
+    归档写入器
+    
+    逐个会话写入：begin_session → add_message / add_state → end_session，
+    内存中只保留当前会话的缓冲。
+    
+    用法：
+        with TranscriptArchiveWriter(path) as writer:
+            writer.add_dialogue(session_id, context, trajectory)
+    """
+    
+    def __init__(self, path: str | Path, evaluate_cues: bool = True):
+        """
+        Args:
+            path: 归档目录（已存在的归档会被覆盖）
+            evaluate_cues: 是否用情境词典重新评估用户消息，写入线索列
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.evaluate_cues = evaluate_cues
+        self._files = {name: open(self.path / f"{name}.bin", "wb") for name in _COLUMNS}
+        self._counts = {name: 0 for name in _COLUMNS}
+        self._scenarios: dict[str, int] = {}
+        self._categories: dict[str, int] = {}
+        self._cues: dict[str, int] = {}
+        self._session: dict | None = None
+    
+    def __enter__(self) -> "TranscriptArchiveWriter":
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            # 出错时丢弃写了一半的会话，已完成的会话仍然可读
+            self._session = None
+        self.close()
+    
+    def begin_session(self, session_id: str, scenario_id: str):
+        """
+        开始写入一个会话
+        
+        Raises:
+            RuntimeError: 上一个会话尚未结束
+            ValueError: 会话 ID 超过 MAX_SESSION_ID_BYTES 字节，或情境数超出编号范围
+        """
+        if self._session is not None:
+            raise RuntimeError("上一个会话尚未结束")
+        
+        encoded_id = session_id.encode("utf-8")
+        if len(encoded_id) > MAX_SESSION_ID_BYTES:
+            # 定长字段会静默截断，读出的 ID 将与原会话对不上
+            raise ValueError(
+                f"会话 ID 超过 {MAX_SESSION_ID_BYTES} 字节，无法写入归档: {session_id!r}"
+            )
+        scenario = _intern(self._scenarios, scenario_id, SESSION_DTYPE["scenario"], "情境")
+        
+        engine = get_lexicon_engine(scenario_id) if self.evaluate_cues else None
+        
+        self._session = {
+            "session_id": encoded_id,
+            "scenario": scenario,
+            "messages": [],
+            "texts": [],
+            "text_bytes": 0,
+            "states": [],
+            "levels": [],
+            "cues": [],
+            "user_turns": 0,
+            "engine": engine,
+        }
+    
+    def add_message(self, message: MessageRecord):
+        """
+        写入一条消息（按对话顺序）
+        
+        Raises:
+            ValueError: 角色不在 ROLES 中
+        """
+        if message.role not in ROLES:
+            raise ValueError(f"归档不支持的消息角色: {message.role!r}")
+        session = self._session
+        data = message.content.encode("utf-8")
+        index = self._counts["messages"] + len(session["messages"])
+        offset = self._counts["text"] + session["text_bytes"]
+        session["messages"].append((
+            ROLES.index(message.role),
+            offset,
+            len(data),
+            len(message.content),
+            message.timestamp.timestamp()
+        ))
+        session["texts"].append(data)
+        session["text_bytes"] += len(data)
+        
+        if message.role == "user":
+            session["user_turns"] += 1
+            if session["engine"] is not None:
+                for category, cue, weight in session["engine"].evaluate(message.content).matches:
+                    session["cues"].append((
+                        index,
+                        session["user_turns"],
+                        _intern(self._categories, category, CUE_DTYPE["category"], "线索类别"),
+                        _intern(self._cues, cue, CUE_DTYPE["cue"], "线索"),
+                        weight
+                    ))
+    
+    def add_state(self, state):
+        """写入一行情绪状态（EmotionalState 或 TrajectoryPoint）"""
+        self._session["states"].append(tuple(getattr(state, dim) for dim in DIMENSIONS))
+        self._session["levels"].append(encode_levels(state.discretize()))
+    
+    def add_states(self, states: Iterable):
+        """
+        批量写入情绪状态
+        
+        StateTrajectory 直接复用其中的档位编码；EmotionalState 序列按 float64 原值
+        向量化离散化，不逐行调用 discretize。
+        """
+        session = self._session
+        if isinstance(states, StateTrajectory):
+            session["states"].extend(zip(*(states.column(dim) for dim in DIMENSIONS)))
+            session["levels"].extend(states.level_codes)
+            return
+        
+        rows = [tuple(getattr(state, dim) for dim in DIMENSIONS) for state in states]
+        if rows:
+            session["states"].extend(rows)
+            session["levels"].extend(level_codes(np.array(rows, dtype=np.float64)).tolist())
+    
+    def end_session(self):
+        """把当前会话写入各列文件"""
+        session = self._session
+        self._session = None
+        
+        record = np.array([(
+            session["session_id"],
+            session["scenario"],
+            self._counts["messages"], len(session["messages"]),
+            self._counts["states"], len(session["states"]),
+            self._counts["cues"], len(session["cues"]),
+        )], dtype=SESSION_DTYPE)
+        
+        self._write("sessions", record)
+        self._write("messages", np.array(session["messages"], dtype=MESSAGE_DTYPE))
+        self._write("text", np.frombuffer(b"".join(session["texts"]), dtype=np.uint8))
+        self._write("states", np.array(session["states"], dtype=STATE_DTYPE).reshape(-1, len(DIMENSIONS)))
+        self._write("levels", np.array(session["levels"], dtype=np.uint8))
+        self._write("cues", np.array(session["cues"], dtype=CUE_DTYPE))
+    
+    def add_session(
+        self,
+        session_id: str,
+        scenario_id: str,
+        messages: Iterable[MessageRecord],
+        states: Iterable
+    ):
+        """写入一个完整会话"""
+        self.begin_session(session_id, scenario_id)
+        for message in messages:
+            self.add_message(message)
+        self.add_states(states)
+        self.end_session()
+    
+    def add_dialogue(self, session_id: str, context: DialogueContext, trajectory: Iterable):
+        """写入内存中的对话（DialogueContext + 情绪轨迹）"""
+        self.add_session(session_id, context.scenario_id, context.messages, trajectory)
+    
+    def _write(self, name: str, array: np.ndarray):
+        array.tofile(self._files[name])
+        self._counts[name] += len(array)
+    
+    def close(self):
+        """关闭列文件并写入 meta.json"""
+        if self._session is not None:
+            raise RuntimeError("还有未结束的会话")
+        for file in self._files.values():
+            file.close()
+        
+        meta = {
+            "version": ARCHIVE_VERSION,
+            "counts": self._counts,
+            "dimensions": list(DIMENSIONS),
+            "roles": list(ROLES),
+            "scenarios": list(self._scenarios),
+            "categories": list(self._categories),
+            "cues": list(self._cues),
+        }
+        with open(self.path / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+
+class ArchivedSession:
+    """归档中某个会话的视图（各字段为内存映射数组的切片，不复制数据）"""
+    
+    __slots__ = ("_archive", "_record", "index")
+    
+    def __init__(self, archive: "TranscriptArchive", index: int):
+        self._archive = archive
+        self._record = archive.sessions[index]
+        self.index = index
+    
+    @property
+    def session_id(self) -> str:
+        return self._record["session_id"].decode("utf-8")
+    
+    @property
+    def scenario_id(self) -> str:
+        return self._archive.scenarios[self._record["scenario"]]
+    
+    @property
+    def states(self) -> np.ndarray:
+        """情绪轨迹，形状为 (轮数 + 1, 5)；没有状态行的会话为 (0, 5)"""
+        start = self._record["state_start"]
+        return self._archive.states[start:start + self._record["state_count"]]
+    
+    @property
+    def messages(self) -> np.ndarray:
+        start = self._record["message_start"]
+        return self._archive.messages[start:start + self._record["message_count"]]
+    
+    @property
+    def cues(self) -> np.ndarray:
+        start = self._record["cue_start"]
+        return self._archive.cues[start:start + self._record["cue_count"]]
+    
+    @property
+    def levels(self) -> np.ndarray:
+        start = self._record["state_start"]
+        return self._archive.levels[start:start + self._record["state_count"]]
+    
+    def trajectory(self) -> StateTrajectory:
+        """还原为 StateTrajectory（没有状态行的会话得到空轨迹）"""
+        states = self.states
+        return StateTrajectory.from_buffers(
+            [np.ascontiguousarray(states[:, i]).tobytes() for i in range(len(DIMENSIONS))],
+            self.levels.tobytes()
+        )
+    
+    def context(self) -> DialogueContext:
+        """还原为 DialogueContext（解码全部消息正文）"""
+        return DialogueContext(self.scenario_id, [
+            MessageRecord.restore(
+                ROLES[message["role"]],
+                self._archive.message_text(message),
+                datetime.fromtimestamp(float(message["created"]))
+            )
+            for message in self.messages
+        ])
+    
+    def texts(self) -> Iterator[tuple[str, str]]:
+        """逐条解码消息正文，返回 (角色, 正文)"""
+        for message in self.messages:
+            yield ROLES[message["role"]], self._archive.message_text(message)
+
+
+class TranscriptArchive:
+    """归档读取器（所有列以只读内存映射方式打开）"""
+    
+    def __init__(self, path: str | Path):
+        """
+        Args:
+            path: 归档目录
+        """
+        self.path = Path(path)
+        with open(self.path / "meta.json", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta["version"] != ARCHIVE_VERSION:
+            raise ValueError(f"不支持的归档版本: {self.meta['version']}")
+        
+        self.scenarios: list[str] = self.meta["scenarios"]
+        self.categories: list[str] = self.meta["categories"]
+        self.cue_names: list[str] = self.meta["cues"]
+        
+        counts = self.meta["counts"]
+        self.sessions = self._map("sessions", counts["sessions"])
+        self.states = self._map("states", counts["states"]).reshape(-1, len(DIMENSIONS))
+        self.levels = self._map("levels", counts["levels"])
+        self.messages = self._map("messages", counts["messages"])
+        self.text = self._map("text", counts["text"])
+        self.cues = self._map("cues", counts["cues"])
+    
+    def _map(self, name: str, count: int) -> np.ndarray:
+        dtype = _COLUMNS[name]
+        if name == "states":
+            count *= len(DIMENSIONS)
+        if count == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self.path / f"{name}.bin", dtype=dtype, mode="r", shape=(count,))
+    
+    def __len__(self) -> int:
+        return len(self.sessions)
+    
+    def __getitem__(self, index: int) -> ArchivedSession:
+        return ArchivedSession(self, index)
+    
+    def message_text(self, message: np.void) -> str:
+        """按偏移解码一条消息正文"""
+        offset = int(message["text_offset"])
+        return self.text[offset:offset + int(message["text_bytes"])].tobytes().decode("utf-8")
+    
+    def iter_sessions(self, indices: Iterable[int] | None = None) -> Iterator[ArchivedSession]:
+        """逐个会话流式遍历（可只遍历筛选出的下标）"""
+        for index in (range(len(self.sessions)) if indices is None else indices):
+            yield ArchivedSession(self, int(index))
+    
+    def iter_session_blocks(self, block_size: int = 65536) -> Iterator[np.ndarray]:
+        """按块遍历会话记录，每块为 sessions 列的一个切片"""
+        for start in range(0, len(self.sessions), block_size):
+            yield self.sessions[start:start + block_size]
+    
+    def final_states(self, block_size: int = 65536) -> Iterator[tuple[int, np.ndarray]]:
+        """
+        按块计算各会话的最终情绪状态
+        
+        没有状态行的会话（如存储中只有消息的会话）最终状态全部为 NaN。
+        
+        Yields:
+            (块中第一个会话的下标, 形状为 (块大小, 5) 的最终状态)
+        """
+        for start in range(0, len(self.sessions), block_size):
+            block = self.sessions[start:start + block_size]
+            count = block["state_count"]
+            final = np.full((len(block), len(DIMENSIONS)), np.nan, dtype=STATE_DTYPE)
+            has_states = count > 0
+            last = block["state_start"][has_states] + count[has_states] - 1
+            final[has_states] = self.states[last]
+            yield start, final
+    
+    def select(self, predicate, block_size: int = 65536) -> np.ndarray:
+        """
+        按最终情绪状态筛选会话
+        
+        Args:
+            predicate: 接收 (块大小, 5) 的最终状态数组，返回布尔掩码
+        
+        Returns:
+            满足条件的会话下标（没有状态行的会话从不入选）
+        """
+        selected = []
+        for start, states in self.final_states(block_size):
+            mask = predicate(states) & ~np.isnan(states[:, 0])
+            selected.append(np.flatnonzero(mask) + start)
+        return np.concatenate(selected) if selected else np.empty(0, dtype=np.int64)
+    
+    def cue_counts(self, block_size: int = 1 << 20) -> dict[str, int]:
+        """统计各线索的命中次数（按块扫描线索列）"""
+        totals = np.zeros(len(self.cue_names), dtype=np.int64)
+        for start in range(0, len(self.cues), block_size):
+            block = self.cues[start:start + block_size]
+            totals += np.bincount(block["cue"], minlength=len(self.cue_names))
+        return {name: int(count) for name, count in zip(self.cue_names, totals) if count}
+    
+    def rescore(
+        self,
+        engines: dict[str, LexiconStateEngine] | None = None,
+        block_size: int = 65536
+    ) -> Iterator[tuple[int, EmotionalStateStore]]:
+        """
+        按词典重新推演各会话的最终情绪状态（修改词典后评估其影响，不解析文本）
+        
+        每个会话从第 0 行状态出发（没有状态行时取情境的初始状态），按轮次依次叠加该轮
+        已归档线索在给定词典下的增量：与 LexiconStateEngine.apply 一致，每轮的合计增量
+        先按 max_step 截断，再截断到取值范围。只重评已归档的命中，词典中新增的线索
+        需要重新导出归档才会命中。
+        
+        Args:
+            engines: 情境 ID -> 词典引擎，未提供的情境使用 get_lexicon_engine
+            block_size: 每块的会话数
+        
+        Yields:
+            (块中第一个会话的下标, 状态存储)，存储的第 i 个槽位对应块中第 i 个会话
+        
+        Raises:
+            ScenarioNotFoundError: 归档中的情境已不在情境目录中
+        """
+        engines = engines or {}
+        scenario_engines = [
+            engines.get(name) or get_lexicon_engine(name) for name in self.scenarios
+        ]
+        max_steps = np.array([engine.max_step for engine in scenario_engines], dtype=np.float64)
+        category_count, cue_count = len(self.categories), len(self.cue_names)
+        
+        for start in range(0, len(self.sessions), block_size):
+            block = self.sessions[start:start + block_size]
+            store = EmotionalStateStore(capacity=len(block))
+            slots = store.allocate_values(self._initial_states(block))
+            
+            first = block["cue_start"][0]
+            cues = self.cues[first:block["cue_start"][-1] + block["cue_count"][-1]]
+            owners = np.repeat(np.arange(len(block)), block["cue_count"])
+            
+            # 每个 (情境, 类别, 线索) 组合只向词典查询一次
+            keys = (
+                block["scenario"][owners].astype(np.int64) * category_count + cues["category"]
+            ) * cue_count + cues["cue"]
+            unique, inverse = np.unique(keys, return_inverse=True)
+            table = np.array([
+                scenario_engines[key // (category_count * cue_count)].cue_delta(
+                    self.categories[key // cue_count % category_count],
+                    self.cue_names[key % cue_count]
+                )
+                for key in unique.tolist()
+            ], dtype=np.float64).reshape(-1, len(DIMENSIONS))
+            deltas = table[inverse.ravel()]
+            
+            turns = cues["turn"]
+            for turn in np.unique(turns):
+                mask = turns == turn
+                sessions, rows = np.unique(owners[mask], return_inverse=True)
+                totals = np.zeros((len(sessions), len(DIMENSIONS)))
+                np.add.at(totals, rows.ravel(), deltas[mask])
+                limit = max_steps[block["scenario"][sessions]].reshape(-1, 1)
+                store.apply_deltas(slots[sessions], np.clip(totals, -limit, limit))
+            yield start, store
+    
+    def _initial_states(self, block: np.ndarray) -> np.ndarray:
+        """
+        各会话的初始状态
+        
+        取第 0 行状态；它恰是情境初始状态的 float32 舍入时改用情境的 float64 原值
+        （如 0.6 舍入后略大于阈值，会落入相邻档位）。没有状态行的会话直接取情境初始状态。
+        """
+        defaults = np.array([
+            [getattr(scenario_catalog.get(name).initial_state, dim) for dim in DIMENSIONS]
+            for name in self.scenarios
+        ], dtype=np.float64)
+        initial = defaults[block["scenario"]]
+        has_states = block["state_count"] > 0
+        archived = self.states[block["state_start"][has_states]]
+        rounded = (archived == initial[has_states].astype(STATE_DTYPE)).all(axis=1)
+        initial[np.flatnonzero(has_states)[~rounded]] = archived[~rounded]
+        return initial
+
+
+async def export_store(
+    store: SessionStore,
+    path: str | Path,
+    page_size: int = 500,
+    evaluate_cues: bool = True
+) -> int:
+    """
+    把会话存储中的全部会话流式导出为归档
+    
+    Args:
+        store: 会话存储
+        path: 归档目录
+        page_size: 读取会话列表与消息的分页大小
+        evaluate_cues: 是否写入线索列
+    
+    Returns:
+        导出的会话数
+    """
+    exported = 0
+    with TranscriptArchiveWriter(path, evaluate_cues=evaluate_cues) as writer:
+        after = ""
+        while True:
+            session_ids = await store.list_sessions(after=after, limit=page_size)
+            for session_id in session_ids:
+                snapshot = await store.load_session(session_id, max_messages=0)
+                if snapshot is None:
+                    continue
+                writer.begin_session(session_id, snapshot.scenario_id)
+                async for _, message in store.iter_messages(session_id, page_size=page_size):
+                    writer.add_message(message)
+                writer.add_states([
+                    state async for _, state in store.iter_states(session_id, page_size=page_size)
+                ])
+                writer.end_session()
+                exported += 1
+            if len(session_ids) < page_size:
+                return exported
+            after = session_ids[-1]
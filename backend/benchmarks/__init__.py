@@ -0,0 +1,5 @@
+"""
+性能基准模块
+
+包含各类基准测试脚本，统一在 backend 目录下以 `python -m benchmarks.<name>` 运行。
+"""
@@ -0,0 +1,42 @@
+"""
+基准测试公共工具：桩 LLM
+
+所有基准测试都不访问真实 API，用固定延迟的桩函数替换 LLMClient 的调用。
+"""
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+# 基准测试不需要真实密钥
+os.environ.setdefault("AIHUBMIX_API_KEY", "benchmark")
+
+backend_dir = Path(__file__).resolve().parent.parent
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+
+def install_stub_llm(latency: float = 0.05, reply: str = "嗯，挺好的。"):
+    """
+    用固定延迟的桩函数替换全局 llm_client.chat_completion
+
+    Args:
+        latency: 每次调用的模拟延迟（秒）
+        reply: 固定回复内容
+    """
+    from app.core.llm_client import llm_client
+
+    async def fake_chat_completion(messages, model, temperature=0.7, max_tokens=1000,
+                                   stream=False, **kwargs):
+        await asyncio.sleep(latency)
+        return reply
+
+    async def fake_stream_chat_completion(messages, model, temperature=0.7, max_tokens=1000,
+                                          **kwargs):
+        await asyncio.sleep(latency)
+        for char in reply:
+            yield char
+
+    llm_client.chat_completion = fake_chat_completion
+    llm_client.stream_chat_completion = fake_stream_chat_completion
+    return llm_client
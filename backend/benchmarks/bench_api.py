@@ -0,0 +1,184 @@
+"""
+HTTP API 吞吐基准
+
+启动本地桩 LLM 服务与 API 服务（uvicorn，可多进程），
+N 个并发客户端各自创建会话并发送若干轮消息，报告吞吐与延迟分布。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.bench_api --clients 100 --turns 5 --workers 4
+    python -m benchmarks.bench_api --stream      # 使用 SSE 流式接口
+    python -m benchmarks.bench_api --websocket   # 使用 WebSocket 长连接
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks._stub import backend_dir
+from benchmarks.load_test import _USER_LINES, percentile, spawn_stub
+
+
+def spawn_api(args) -> subprocess.Popen:
+    """在子进程中启动 API 服务并等待就绪"""
+    env = dict(os.environ)
+    env.setdefault("AIHUBMIX_API_KEY", "stub")
+    env["AIHUBMIX_BASE_URL"] = f"http://127.0.0.1:{args.stub_port}/v1"
+    # 让 API 自身的 LLM 并发与重试不成为瓶颈
+    env.setdefault("LLM_INITIAL_CONCURRENCY", "256")
+    env.setdefault("LLM_MAX_CONCURRENCY", "512")
+    
+    command = [
+        sys.executable, "-m", "uvicorn", "app.main:create_app", "--factory",
+        "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning",
+    ]
+    process = subprocess.Popen(command, cwd=str(backend_dir), env=env)
+    
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{args.port}/health", timeout=0.5)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    
+    process.terminate()
+    raise RuntimeError("API 服务启动超时")
+
+
+async def simulate_client(index: int, args, latencies: list[float]) -> int:
+    """
+    一个客户端：创建会话并发送若干轮，返回出错次数
+    
+    每个客户端只使用一条保持连接，多进程时同一连接始终由同一个工作进程处理，
+    与生产环境按会话保持亲和的效果相同。
+    """
+    async with httpx.AsyncClient(
+        base_url=f"http://127.0.0.1:{args.port}",
+        limits=httpx.Limits(max_connections=1, max_keepalive_connections=1),
+        timeout=120.0
+    ) as client:
+        return await _run_turns(client, index, args, latencies)
+
+
+async def _run_turns(client: httpx.AsyncClient, index: int, args, latencies: list[float]) -> int:
+    errors = 0
+    response = await client.post("/api/sessions", json={})
+    if response.status_code != 201:
+        return args.turns
+    session_id = response.json()["session_id"]
+    
+    if args.websocket:
+        return await _run_websocket_turns(session_id, index, args, latencies)
+    
+    for turn in range(args.turns):
+        content = f"{_USER_LINES[(index + turn) % len(_USER_LINES)]}（{index}-{turn}）"
+        start = time.perf_counter()
+        try:
+            if args.stream:
+                async with client.stream(
+                    "POST", f"/api/sessions/{session_id}/turns/stream", json={"content": content}
+                ) as response:
+                    body = b"".join([chunk async for chunk in response.aiter_bytes()])
+                ok = response.status_code == 200 and b"event: done" in body
+            else:
+                response = await client.post(
+                    f"/api/sessions/{session_id}/turns", json={"content": content}
+                )
+                ok = response.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        
+        if ok:
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors += 1
+    return errors
+
+
+async def _run_websocket_turns(session_id: str, index: int, args, latencies: list[float]) -> int:
+    """通过 WebSocket 长连接发送全部轮次"""
+    import websockets
+    
+    errors = 0
+    url = f"ws://127.0.0.1:{args.port}/api/sessions/{session_id}/ws"
+    async with websockets.connect(url, max_size=None) as ws:
+        for turn in range(args.turns):
+            content = f"{_USER_LINES[(index + turn) % len(_USER_LINES)]}（{index}-{turn}）"
+            start = time.perf_counter()
+            await ws.send(json.dumps({"type": "turn", "content": content}))
+            while True:
+                message = json.loads(await ws.recv())
+                if message["type"] in ("reply", "error"):
+                    break
+            if message["type"] == "reply":
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+    return errors
+
+
+async def run_benchmark(args) -> dict:
+    latencies: list[float] = []
+    start = time.perf_counter()
+    errors = await asyncio.gather(*(
+        simulate_client(i, args, latencies) for i in range(args.clients)
+    ))
+    elapsed = time.perf_counter() - start
+    
+    return {
+        "turns": len(latencies),
+        "errors": sum(errors),
+        "elapsed": elapsed,
+        "throughput": len(latencies) / elapsed,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP API 吞吐基准")
+    parser.add_argument("--clients", type=int, default=100, help="并发客户端数")
+    parser.add_argument("--turns", type=int, default=5, help="每个客户端的轮数")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn 工作进程数")
+    parser.add_argument("--stream", action="store_true", help="使用 SSE 流式接口")
+    parser.add_argument("--websocket", action="store_true", help="使用 WebSocket 长连接")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--stub-port", type=int, default=8900)
+    parser.add_argument("--stub-latency", type=float, default=0.05)
+    parser.add_argument("--stub-tokens-per-second", type=float, default=0.0,
+                        help="桩服务的流式速度（0 表示不限速）")
+    args = parser.parse_args()
+    
+    # spawn_stub 需要的其余参数
+    args.stub_error_rate = 0.0
+    args.stub_rate_limit_rate = 0.0
+    
+    stub = spawn_stub(args)
+    api = None
+    try:
+        api = spawn_api(args)
+        summary = asyncio.run(run_benchmark(args))
+    finally:
+        for process in (api, stub):
+            if process is not None:
+                process.terminate()
+                process.wait()
+    
+    mode = "WebSocket " if args.websocket else "SSE 流式" if args.stream else "普通"
+    print("=" * 60)
+    print(f"{mode}接口，工作进程 {args.workers}，并发客户端 {args.clients}，每客户端 {args.turns} 轮")
+    print(f"完成轮次：{summary['turns']}，错误：{summary['errors']}，耗时 {summary['elapsed']:.2f}s")
+    print(f"吞吐：{summary['throughput']:.1f} 轮/s")
+    print(f"延迟 p50 {summary['p50'] * 1000:.1f} ms，p95 {summary['p95'] * 1000:.1f} ms，"
+          f"p99 {summary['p99'] * 1000:.1f} ms")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+对话归档基准：列式内存映射归档 vs pydantic JSON
+
+生成 N 个合成会话，分别写成列式归档与每会话一行的 JSON，
+然后执行同一个查询（最终信任度低于 0.4 的会话，及其用户消息的平均字符数）。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.bench_archive --sessions 20000 --turns 20
+"""
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from pydantic import BaseModel
+
+import benchmarks._stub  # noqa: F401  设置导入路径
+
+
+_USER_LINES = ["你好呀", "谢谢你愿意聊这些", "为什么不回我消息", "你住哪里？", "哈哈有意思", "嗯"]
+
+
+class _JsonSession(BaseModel):
+    """对照组：以 pydantic 模型整体序列化的会话"""
+    session_id: str
+    scenario_id: str
+    messages: list[dict]
+    states: list[dict]
+
+
+def synthesize(count: int, turns: int, seed: int = 0):
+    """生成合成会话：(session_id, messages, states)"""
+    from app.models.dialogue import MessageRecord
+    from app.models.state import EmotionalState
+    
+    rng = random.Random(seed)
+    for i in range(count):
+        state = EmotionalState(trust=0.5, openness=0.4, distance=0.6)
+        messages, states = [], [state]
+        for _ in range(turns):
+            messages.append(MessageRecord("user", rng.choice(_USER_LINES)))
+            messages.append(MessageRecord("assistant", "嗯，我一般在家看看书，偶尔出去走走。"))
+            state = state.model_copy()
+            state.update_from_interaction(delta_trust=rng.uniform(-0.05, 0.05))
+            states.append(state)
+        yield f"session-{i:08d}", messages, states
+
+
+def query_archive(path: Path) -> tuple[int, float]:
+    from app.services.transcript_archive import ROLES, TranscriptArchive
+    
+    archive = TranscriptArchive(path)
+    trust = list(archive.meta["dimensions"]).index("trust")
+    selected = archive.select(lambda states: states[:, trust] < 0.4)
+    
+    user = ROLES.index("user")
+    chars = total = 0
+    for session in archive.iter_sessions(selected):
+        messages = session.messages
+        mask = messages["role"] == user
+        chars += int(messages["chars"][mask].sum())
+        total += int(mask.sum())
+    return len(selected), chars / max(total, 1)
+
+
+def query_json(path: Path) -> tuple[int, float]:
+    selected = chars = total = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            session = _JsonSession.model_validate_json(line)
+            if session.states[-1]["trust"] >= 0.4:
+                continue
+            selected += 1
+            for message in session.messages:
+                if message["role"] == "user":
+                    chars += len(message["content"])
+                    total += 1
+    return selected, chars / max(total, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对话归档基准")
+    parser.add_argument("--sessions", type=int, default=20_000)
+    parser.add_argument("--turns", type=int, default=20)
+    args = parser.parse_args()
+    
+    from app.services.transcript_archive import TranscriptArchiveWriter
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        archive_path = Path(tmp) / "archive"
+        json_path = Path(tmp) / "sessions.jsonl"
+        
+        start = time.perf_counter()
+        with TranscriptArchiveWriter(archive_path) as writer, open(json_path, "w", encoding="utf-8") as f:
+            for session_id, messages, states in synthesize(args.sessions, args.turns):
+                writer.add_session(session_id, "first_meet", messages, states)
+                f.write(_JsonSession(
+                    session_id=session_id,
+                    scenario_id="first_meet",
+                    messages=[{"role": m.role, "content": m.content} for m in messages],
+                    states=[s.model_dump() for s in states]
+                ).model_dump_json() + "\n")
+        print(f"生成 {args.sessions} 个会话 × {args.turns} 轮：{time.perf_counter() - start:.1f} 秒")
+        
+        archive_size = sum(p.stat().st_size for p in archive_path.iterdir())
+        print(f"归档大小 {archive_size / 1e6:.1f} MB，JSON 大小 {json_path.stat().st_size / 1e6:.1f} MB")
+        
+        start = time.perf_counter()
+        archive_result = query_archive(archive_path)
+        archive_time = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        json_result = query_json(json_path)
+        json_time = time.perf_counter() - start
+        
+        assert archive_result[0] == json_result[0]
+        assert np.isclose(archive_result[1], json_result[1])
+        print(f"命中会话 {archive_result[0]} 个，用户消息平均 {archive_result[1]:.2f} 字")
+        print(f"{'列式归档':<12}{archive_time * 1000:>10.1f} ms")
+        print(f"{'pydantic JSON':<12}{json_time * 1000:>10.1f} ms ({json_time / archive_time:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+每轮热路径 CPU 微基准
+
+覆盖每轮对话在本进程内的 CPU 开销（不含 LLM 调用），
+每个用例在 10 / 100 / 1000 轮的历史长度下运行。
+结果保存为 JSON，并可与基线对比以发现性能回退。
+
+用法（在 backend 目录下）：
+    # 运行并保存结果
+    python -m benchmarks.bench_hot_path --output benchmarks/results/latest.json
+    
+    # 保存为基线
+    python -m benchmarks.bench_hot_path --output benchmarks/results/baseline.json
+    
+    # 与基线对比，单项变慢超过 20% 时以非零状态码退出
+    python -m benchmarks.bench_hot_path --baseline benchmarks/results/baseline.json
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import timeit
+from pathlib import Path
+from typing import Callable
+
+from benchmarks._stub import backend_dir
+
+
+HISTORY_LENGTHS = (10, 100, 1000)
+DEFAULT_RESULTS_DIR = backend_dir / "benchmarks" / "results"
+
+# 用例注册表：名称 -> setup(历史轮数) -> 被测的零参函数
+CASES: dict[str, Callable[[int], Callable[[], object]]] = {}
+
+
+def case(name: str):
+    """注册基准用例"""
+    def decorator(setup: Callable[[int], Callable[[], object]]):
+        CASES[name] = setup
+        return setup
+    return decorator
+
+
+def _build_history(turns: int):
+    """构造指定轮数的对话上下文与情绪状态历史"""
+    from app.models.dialogue import DialogueContext
+    from app.models.state import EmotionalState
+    
+    context = DialogueContext(scenario_id="first_meet")
+    states = [EmotionalState()]
+    for i in range(turns):
+        context.add_message("user", f"第 {i} 轮，你周末一般做什么？谢谢你的回答")
+        context.add_message("assistant", f"嗯，第 {i} 轮，一般在家看看书，偶尔出去走走。")
+        state = states[-1].model_copy(deep=True)
+        state.update_from_interaction(delta_valence=0.01, delta_trust=0.01)
+        states.append(state)
+    return context, states
+
+
+@case("DialogueContext.add_message")
+def _add_message(turns: int):
+    context, _ = _build_history(turns)
+    return lambda: context.add_message("user", "你好呀，最近怎么样")
+
+
+@case("DialogueContext.to_openai_format")
+def _to_openai_format(turns: int):
+    context, _ = _build_history(turns)
+    return lambda: context.to_openai_format(include_system=False)
+
+
+@case("DialogueContext.get_recent_messages")
+def _get_recent_messages(turns: int):
+    context, _ = _build_history(turns)
+    return lambda: context.get_recent_messages(10)
+
+
+@case("ContextWindow.append+messages")
+def _context_window(turns: int):
+    from app.models.context_window import ContextWindow
+    
+    window = ContextWindow()
+    context, _ = _build_history(turns)
+    for message in context.messages:
+        window.append(message.role, message.content)
+    
+    def run():
+        window.append("user", "你好呀，最近怎么样")
+        window.append("assistant", "还行吧，你呢")
+        return window.messages()
+    return run
+
+
+@case("EmotionalState.model_copy(deep)")
+def _model_copy(turns: int):
+    _, states = _build_history(turns)
+    state = states[-1]
+    return lambda: state.model_copy(deep=True)
+
+
+@case("EmotionalState.update_from_interaction")
+def _update_from_interaction(turns: int):
+    _, states = _build_history(turns)
+    state = states[-1]
+    return lambda: state.update_from_interaction(delta_valence=0.01, delta_trust=-0.01)
+
+
+@case("ModelAService._update_emotional_state")
+def _update_emotional_state(turns: int):
+    from app.services.model_a import model_a_service
+    
+    _, states = _build_history(turns)
+    state = states[-1]
+    return lambda: model_a_service._update_emotional_state(state, "谢谢你愿意聊这些", "嗯")
+
+
+@case("build_model_a_system_prompt")
+def _build_system_prompt(turns: int):
+    from app.models.state import Scenario
+    from app.prompts.model_a_prompts import SCENARIO_FIRST_MEET, build_model_a_system_prompt
+    
+    scenario = Scenario.model_validate(SCENARIO_FIRST_MEET)
+    _, states = _build_history(turns)
+    state = states[-1]
+    return lambda: build_model_a_system_prompt(scenario, state.to_prompt_context())
+
+
+@case("PromptCompiler.system_message")
+def _compiled_system_prompt(turns: int):
+    from app.models.state import Scenario
+    from app.prompts.model_a_prompts import SCENARIO_FIRST_MEET
+    from app.prompts.prompt_compiler import PromptCompiler
+    
+    scenario = Scenario.model_validate(SCENARIO_FIRST_MEET)
+    compiler = PromptCompiler()
+    _, states = _build_history(turns)
+    state = states[-1]
+    return lambda: compiler.system_message(scenario, state)
+
+
+@case("ModelBService._format_dialogue_history")
+def _format_dialogue_history(turns: int):
+    from app.services.model_b import model_b_service
+    
+    context, _ = _build_history(turns)
+    return lambda: model_b_service._format_dialogue_history(context.messages)
+
+
+@case("StateTrajectory.append")
+def _trajectory_append(turns: int):
+    from app.models.trajectory import StateTrajectory
+    
+    _, states = _build_history(turns)
+    trajectory = StateTrajectory(states)
+    state = states[-1]
+    return lambda: trajectory.append(state)
+
+
+@case("ModelBService._format_emotional_trajectory")
+def _format_emotional_trajectory(turns: int):
+    from app.models.trajectory import StateTrajectory
+    from app.services.model_b import model_b_service
+    
+    _, states = _build_history(turns)
+    trajectory = StateTrajectory(states)
+    return lambda: model_b_service._format_emotional_trajectory(trajectory)
+
+
+def measure(func: Callable[[], object], repeat: int = 5) -> float:
+    """返回单次调用的最优耗时（纳秒）"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number))
+    return best / number * 1e9
+
+
+def run_suite(selected: list[str] | None = None, lengths=HISTORY_LENGTHS) -> dict:
+    """运行全部（或选定的）用例"""
+    results = {}
+    for name, setup in CASES.items():
+        if selected and not any(s in name for s in selected):
+            continue
+        for turns in lengths:
+            key = f"{name}[{turns}]"
+            results[key] = measure(setup(turns))
+            print(f"{key:<55}{results[key]:>14.0f} ns")
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """与基线对比，返回回退超过阈值的用例"""
+    regressions = []
+    print("-" * 80)
+    print(f"{'用例':<55}{'基线(ns)':>12}{'变化':>10}")
+    for key, value in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        change = value / base - 1
+        flag = "  ⚠️" if change > threshold else ""
+        print(f"{key:<55}{base:>12.0f}{change:>+10.1%}{flag}")
+        if change > threshold:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="每轮热路径 CPU 微基准")
+    parser.add_argument("--output", default=None, help="结果输出路径（JSON）")
+    parser.add_argument("--baseline", default=None, help="对比的基线结果（JSON）")
+    parser.add_argument("--threshold", type=float, default=0.2, help="判定回退的变慢比例")
+    parser.add_argument("--only", nargs="*", default=None, help="只运行名称包含这些关键字的用例")
+    args = parser.parse_args()
+    
+    results = run_suite(args.only)
+    
+    output = Path(args.output) if args.output else (
+        DEFAULT_RESULTS_DIR / time.strftime("hot_path-%Y%m%d-%H%M%S.json")
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "meta": {
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "created": time.strftime("%Y-%m-%d %H:%M:%S")
+            },
+            "results": results
+        }, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存：{output}")
+    
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} 项回退超过 {args.threshold:.0%}")
+            sys.exit(1)
+        print("\n✅ 未发现性能回退")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+线索匹配基准：Aho-Corasick 自动机 vs 原先的逐词子串扫描
+
+原实现对每个关键词执行一次 `word in text`，耗时随词典规模线性增长；
+自动机对消息只扫描一次，耗时只与消息长度相关。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.bench_lexicon --sizes 10 100 1000 5000
+"""
+import argparse
+import random
+
+from benchmarks.bench_hot_path import measure
+
+
+_CHARS = "的一是不了人我在有他这为之大来以个中上们到说国和地也子时道出而要于就下得可你年生自会那后能对着事其里所去行过家十用发成方多经么"
+
+_MESSAGE = "我觉得你说的挺有意思的，不过为什么上次你没有回我消息呢？是不是太忙了，辛苦了哈"
+
+
+def random_cues(count: int, seed: int = 0) -> list[str]:
+    """生成随机中文线索词（2~4 字）"""
+    rng = random.Random(seed)
+    return ["".join(rng.choice(_CHARS) for _ in range(rng.randint(2, 4))) for _ in range(count)]
+
+
+def legacy_match(cues: list[str]):
+    """原实现：逐词子串扫描"""
+    def run():
+        text = _MESSAGE.lower()
+        return [cue for cue in cues if cue in text]
+    return run
+
+
+def automaton_match(cues: list[str]):
+    """Aho-Corasick 单次扫描"""
+    from app.services.lexicon_engine import AhoCorasickMatcher
+    
+    matcher = AhoCorasickMatcher(cues)
+    return lambda: matcher.find(_MESSAGE.lower())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="线索匹配基准")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    args = parser.parse_args()
+    
+    print(f"消息长度 {len(_MESSAGE)} 字")
+    print(f"{'词典规模':>10}{'逐词扫描(ns)':>16}{'自动机(ns)':>14}{'加速比':>10}")
+    for size in args.sizes:
+        cues = random_cues(size)
+        legacy = measure(legacy_match(cues))
+        automaton = measure(automaton_match(cues))
+        print(f"{size:>10}{legacy:>16.0f}{automaton:>14.0f}{legacy / automaton:>9.1f}x")
+    
+    from app.services.lexicon_engine import get_lexicon_engine
+    
+    engine = get_lexicon_engine("first_meet")
+    cost = measure(lambda: engine.evaluate(_MESSAGE))
+    print(f"\nfirst_meet 词典完整评估（匹配 + 求和增量）：{cost:.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
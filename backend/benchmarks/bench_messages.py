@@ -0,0 +1,79 @@
+"""
+消息表示基准：轻量 MessageRecord vs 原先的 pydantic Message / DialogueContext
+
+对比单条消息构造、追加到上下文，以及整段历史导出为 OpenAI 格式的耗时。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.bench_messages --turns 10 100 1000
+"""
+import argparse
+from datetime import datetime
+from typing import Literal
+
+from pydantic import BaseModel
+
+from benchmarks.bench_hot_path import measure
+
+
+class LegacyMessage(BaseModel):
+    """原实现：每条消息一个 pydantic 模型"""
+    role: Literal["user", "assistant", "system"]
+    content: str
+    timestamp: datetime = datetime.now()
+
+
+class LegacyDialogueContext(BaseModel):
+    """原实现：每次导出都重新构造 dict"""
+    scenario_id: str
+    messages: list[LegacyMessage] = []
+    
+    def add_message(self, role: str, content: str):
+        self.messages.append(LegacyMessage(role=role, content=content))
+    
+    def to_openai_format(self, include_system: bool = True) -> list[dict]:
+        result = []
+        for msg in self.messages:
+            if not include_system and msg.role == "system":
+                continue
+            result.append({"role": msg.role, "content": msg.content})
+        return result
+
+
+def _fill(context, turns: int):
+    for i in range(turns):
+        context.add_message("user", f"第 {i} 轮，你周末一般做什么？")
+        context.add_message("assistant", f"嗯，第 {i} 轮，一般在家看看书。")
+    return context
+
+
+def main():
+    parser = argparse.ArgumentParser(description="消息表示基准")
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+    
+    from app.models.dialogue import DialogueContext, MessageRecord
+    
+    legacy = measure(lambda: LegacyMessage(role="user", content="你好呀，最近怎么样"))
+    record = measure(lambda: MessageRecord("user", "你好呀，最近怎么样"))
+    print(f"{'用例':<32}{'pydantic(ns)':>14}{'MessageRecord(ns)':>20}{'加速比':>10}")
+    print(f"{'构造单条消息':<32}{legacy:>14.0f}{record:>20.0f}{legacy / record:>9.1f}x")
+    
+    for turns in args.turns:
+        legacy_context = _fill(LegacyDialogueContext(scenario_id="first_meet"), turns)
+        context = _fill(DialogueContext("first_meet"), turns)
+        
+        legacy = measure(lambda: legacy_context.add_message("user", "你好呀"))
+        record = measure(lambda: context.add_message("user", "你好呀"))
+        print(f"{f'add_message[{turns}]':<32}{legacy:>14.0f}{record:>20.0f}{legacy / record:>9.1f}x")
+        
+        # add_message 的计时会不断追加消息，导出前重新构造同样长度的历史
+        legacy_context = _fill(LegacyDialogueContext(scenario_id="first_meet"), turns)
+        context = _fill(DialogueContext("first_meet"), turns)
+        
+        legacy = measure(lambda: legacy_context.to_openai_format(include_system=False))
+        record = measure(lambda: context.to_openai_format(include_system=False))
+        print(f"{f'to_openai_format[{turns}]':<32}{legacy:>14.0f}{record:>20.0f}{legacy / record:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
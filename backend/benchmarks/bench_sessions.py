@@ -0,0 +1,72 @@
+"""
+多会话吞吐基准
+
+在桩 LLM（固定延迟）下，测量不同并发会话数时的轮次吞吐量，
+验证不同会话并行执行、同一会话串行执行。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.bench_sessions --latency 0.05 --turns 5
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks._stub import install_stub_llm
+
+
+async def run_concurrent_sessions(num_sessions: int, turns: int) -> tuple[float, int]:
+    """N 个会话各自顺序进行若干轮，返回 (耗时, 总轮数)"""
+    from app.services.session_registry import SessionRegistry
+
+    registry = SessionRegistry(max_sessions=num_sessions)
+    session_ids = [await registry.create() for _ in range(num_sessions)]
+
+    async def user_loop(session_id: str):
+        for i in range(turns):
+            await registry.process_user_input(session_id, f"第 {i} 句话，谢谢你")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user_loop(sid) for sid in session_ids))
+    elapsed = time.perf_counter() - start
+    return elapsed, num_sessions * turns
+
+
+async def run_same_session(turns: int) -> float:
+    """同一会话并发提交多轮，返回耗时（应约为 turns × 延迟）"""
+    from app.services.session_registry import SessionRegistry
+
+    registry = SessionRegistry(max_sessions=1)
+    session_id = await registry.create()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        registry.process_user_input(session_id, f"第 {i} 句话") for i in range(turns)
+    ))
+    return time.perf_counter() - start
+
+
+async def main(latency: float, turns: int, levels: list[int]):
+    install_stub_llm(latency=latency)
+
+    print(f"桩 LLM 延迟 {latency * 1000:.0f} ms，每个会话 {turns} 轮")
+    print("-" * 60)
+    print(f"{'并发会话':>10} {'总轮数':>10} {'耗时(s)':>10} {'吞吐(轮/s)':>14}")
+    for level in levels:
+        elapsed, total = await run_concurrent_sessions(level, turns)
+        print(f"{level:>10} {total:>10} {elapsed:>10.2f} {total / elapsed:>14.1f}")
+
+    print("-" * 60)
+    elapsed = await run_same_session(turns)
+    print(f"同一会话并发提交 {turns} 轮：{elapsed:.2f}s（串行预期 ≈ {turns * latency:.2f}s）")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="多会话吞吐基准")
+    parser.add_argument("--latency", type=float, default=0.05, help="桩 LLM 延迟（秒）")
+    parser.add_argument("--turns", type=int, default=5, help="每个会话的轮数")
+    parser.add_argument(
+        "--levels", type=int, nargs="+", default=[1, 10, 100, 1000, 5000],
+        help="并发会话数梯度"
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.latency, args.turns, args.levels))
@@ -0,0 +1,126 @@
+"""
+冷启动基准（基于 python -X importtime）
+
+在全新子进程中导入 CLI、API 工作进程等入口模块，记录导入耗时与进程总耗时，
+并列出自身耗时最多的模块。只做导入的入口不设置 AIHUBMIX_API_KEY，
+以确认导入阶段不需要凭据、不会构造配置与客户端；
+api_worker 还会创建应用（读取配置），因此使用占位密钥。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --output benchmarks/results/startup-baseline.json
+    python -m benchmarks.bench_startup --baseline benchmarks/results/startup-baseline.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from benchmarks._stub import backend_dir
+
+
+# 入口名称 -> (执行语句, 是否需要配置)
+ENTRYPOINTS = {
+    "terminal_cli": ("import cli.terminal_chat", False),
+    "api_worker": ("import app.main; app.main.create_app()", True),
+    "bulk_cli": ("import cli.bulk_analyze", False),
+    "services": ("import app.services", False),
+}
+
+
+def parse_importtime(stderr: str) -> dict[str, tuple[int, int, int]]:
+    """解析 -X importtime 输出：模块 -> (自身耗时 us, 累计耗时 us, 嵌套深度)"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        modules[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return modules
+
+
+def measure_entrypoint(statement: str, needs_settings: bool, repeat: int) -> dict:
+    """在新进程中执行导入语句，返回耗时中位数与最后一次的模块明细"""
+    env = {key: value for key, value in os.environ.items() if key != "AIHUBMIX_API_KEY"}
+    if needs_settings:
+        env["AIHUBMIX_API_KEY"] = "startup-benchmark"
+    walls, imports = [], []
+    modules: dict[str, tuple[int, int, int]] = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", statement],
+            cwd=str(backend_dir), env=env, capture_output=True, text=True
+        )
+        walls.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            raise RuntimeError(f"{statement} 执行失败：\n{result.stderr[-2000:]}")
+        modules = parse_importtime(result.stderr)
+        # 顶层模块的累计耗时之和即为全部导入耗时
+        imports.append(sum(
+            cumulative for _, cumulative, depth in modules.values() if depth == 0
+        ) / 1e6)
+    
+    top = sorted(modules.items(), key=lambda item: item[1][0], reverse=True)[:8]
+    return {
+        "wall": statistics.median(walls),
+        "imports": statistics.median(imports),
+        "modules": len(modules),
+        "top_self": [(name, self_us / 1000) for name, (self_us, _, _) in top],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="冷启动基准")
+    parser.add_argument("--repeat", type=int, default=5, help="每个入口的重复次数（取中位数）")
+    parser.add_argument("--only", nargs="*", default=None, help="只测这些入口")
+    parser.add_argument("--output", default=None, help="结果输出路径（JSON）")
+    parser.add_argument("--baseline", default=None, help="对比的基线结果（JSON）")
+    parser.add_argument("--threshold", type=float, default=0.2, help="判定回退的变慢比例")
+    args = parser.parse_args()
+    
+    results = {}
+    for name, (statement, needs_settings) in ENTRYPOINTS.items():
+        if args.only and name not in args.only:
+            continue
+        result = measure_entrypoint(statement, needs_settings, args.repeat)
+        results[name] = result
+        print(f"{name:<16}进程 {result['wall'] * 1000:8.1f} ms  导入 {result['imports'] * 1000:8.1f} ms  "
+              f"模块 {result['modules']:4d} 个")
+        for module, self_ms in result["top_self"][:5]:
+            print(f"{'':<18}{module:<44}{self_ms:8.1f} ms")
+    
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存：{output}")
+    
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = []
+        print("-" * 60)
+        for name, result in results.items():
+            if name not in baseline:
+                continue
+            change = result["wall"] / baseline[name]["wall"] - 1
+            flag = "  ⚠️" if change > args.threshold else ""
+            print(f"{name:<16}{baseline[name]['wall'] * 1000:8.1f} ms -> {result['wall'] * 1000:8.1f} ms"
+                  f"{change:>+9.1%}{flag}")
+            if change > args.threshold:
+                regressions.append(name)
+        if regressions:
+            print(f"\n❌ {len(regressions)} 个入口的冷启动回退超过 {args.threshold:.0%}")
+            sys.exit(1)
+        print("\n✅ 未发现冷启动回退")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+批量情绪状态基准：NumPy 状态存储 vs 逐个 pydantic EmotionalState
+
+模拟对 N 个会话各应用一轮增量并生成 Prompt 状态描述；
+另外对比归档词典重评（TranscriptArchive.rescore）与逐会话解码正文、逐轮应用词典。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.bench_state_store --sessions 100000 --archive-sessions 20000
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+import benchmarks._stub  # noqa: F401  设置导入路径
+
+
+def bench_pydantic(sessions: int, deltas: np.ndarray) -> tuple[float, float]:
+    from app.models.state import EmotionalState
+    
+    states = [EmotionalState(openness=0.4, distance=0.6) for _ in range(sessions)]
+    rows = deltas.tolist()
+    
+    start = time.perf_counter()
+    for state, (dv, da, dt, do, dd) in zip(states, rows):
+        state.update_from_interaction(
+            delta_valence=dv, delta_arousal=da, delta_trust=dt,
+            delta_openness=do, delta_distance=dd
+        )
+    update = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    [state.to_prompt_context() for state in states]
+    describe = time.perf_counter() - start
+    return update, describe
+
+
+def bench_store(sessions: int, deltas: np.ndarray) -> tuple[float, float]:
+    from app.models.state import EmotionalState
+    from app.models.state_store import EmotionalStateStore
+    
+    store = EmotionalStateStore(capacity=sessions)
+    store.allocate_many(sessions, EmotionalState(openness=0.4, distance=0.6))
+    
+    start = time.perf_counter()
+    store.apply_deltas(None, deltas)
+    update = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    store.describe()
+    describe = time.perf_counter() - start
+    return update, describe
+
+
+def bench_rescore(sessions: int, turns: int) -> tuple[float, float]:
+    from app.services.lexicon_engine import get_lexicon_engine
+    from app.services.scenario_catalog import scenario_catalog
+    from app.services.transcript_archive import TranscriptArchive, TranscriptArchiveWriter
+    from benchmarks.bench_archive import synthesize
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "archive"
+        with TranscriptArchiveWriter(path) as writer:
+            for session_id, messages, states in synthesize(sessions, turns):
+                writer.add_session(session_id, "first_meet", messages, states)
+        archive = TranscriptArchive(path)
+        
+        start = time.perf_counter()
+        for _, store in archive.rescore():
+            store.level_codes()
+        rescore = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        engine = get_lexicon_engine("first_meet")
+        initial = scenario_catalog.get("first_meet").initial_state
+        for session in archive.iter_sessions():
+            state = initial.model_copy()
+            for role, text in session.texts():
+                if role == "user":
+                    engine.apply(state, text)
+        replay = time.perf_counter() - start
+    return replay, rescore
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量情绪状态基准")
+    parser.add_argument("--sessions", type=int, default=100_000)
+    parser.add_argument("--archive-sessions", type=int, default=20_000)
+    parser.add_argument("--turns", type=int, default=10)
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(0)
+    deltas = rng.uniform(-0.1, 0.1, size=(args.sessions, 5))
+    
+    py_update, py_describe = bench_pydantic(args.sessions, deltas)
+    np_update, np_describe = bench_store(args.sessions, deltas)
+    
+    print(f"会话数：{args.sessions}")
+    print(f"{'':<20}{'pydantic 循环':>16}{'NumPy 存储':>14}{'加速比':>10}")
+    print(f"{'应用增量 + 截断':<20}{py_update * 1000:>13.1f} ms{np_update * 1000:>11.1f} ms"
+          f"{py_update / np_update:>9.0f}x")
+    print(f"{'离散化 + 描述':<20}{py_describe * 1000:>13.1f} ms{np_describe * 1000:>11.1f} ms"
+          f"{py_describe / np_describe:>9.0f}x")
+    
+    replay, rescore = bench_rescore(args.archive_sessions, args.turns)
+    print(f"\n归档词典重评：{args.archive_sessions} 个会话 × {args.turns} 轮")
+    print(f"{'逐会话应用词典':<20}{replay * 1000:>13.1f} ms")
+    print(f"{'rescore':<20}{rescore * 1000:>13.1f} ms{replay / rescore:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
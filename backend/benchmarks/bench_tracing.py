@@ -0,0 +1,86 @@
+"""
+追踪开销基准
+
+对比不插桩、追踪关闭（返回空 span）与追踪开启（创建 span 并批量写文件）三种情况下
+单个 span 的开销，以及使用桩 LLM（零延迟）时一整轮对话的 CPU 耗时。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.bench_tracing --turns 200
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks._stub import install_stub_llm
+from benchmarks.bench_hot_path import measure
+
+
+def _configure(path: str | None):
+    """切换全局追踪器（None 表示关闭）"""
+    from app.core import tracing
+    
+    tracing.flush_traces()
+    tracing._tracer = tracing.Tracer(path) if path else None
+    tracing._configured = True
+
+
+def span_costs(trace_file: str) -> tuple[float, float, float]:
+    from app.core.tracing import span
+    
+    def bare():
+        return None
+    
+    def traced():
+        with span("bench.span", {"session.id": "bench"}):
+            return None
+    
+    _configure(None)
+    baseline = measure(bare)
+    disabled = measure(traced)
+    _configure(trace_file)
+    enabled = measure(traced)
+    _configure(None)
+    return baseline, disabled, enabled
+
+
+async def turn_cost(turns: int) -> float:
+    """每轮平均耗时（微秒）"""
+    from app.services.dialogue_manager import DialogueManager
+    
+    manager = DialogueManager(prefetch_every=0)
+    manager.start_new_dialogue()
+    start = time.perf_counter()
+    for i in range(turns):
+        await manager.process_user_input(f"第 {i} 轮，你周末一般做什么？")
+    return (time.perf_counter() - start) / turns * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="追踪开销基准")
+    parser.add_argument("--turns", type=int, default=200, help="整轮对话基准的轮数")
+    args = parser.parse_args()
+    
+    install_stub_llm(latency=0)
+    with tempfile.TemporaryDirectory() as tmp:
+        trace_file = str(Path(tmp) / "traces.jsonl")
+        
+        baseline, disabled, enabled = span_costs(trace_file)
+        print(f"{'单个 span':<20}{'耗时(ns)':>12}{'额外开销(ns)':>16}")
+        print(f"{'不插桩':<20}{baseline:>12.0f}{'-':>16}")
+        print(f"{'追踪关闭':<20}{disabled:>12.0f}{disabled - baseline:>16.0f}")
+        print(f"{'追踪开启':<20}{enabled:>12.0f}{enabled - baseline:>16.0f}")
+        
+        _configure(None)
+        off = asyncio.run(turn_cost(args.turns))
+        _configure(trace_file)
+        on = asyncio.run(turn_cost(args.turns))
+        _configure(None)
+        print(f"\n整轮对话（桩 LLM，{args.turns} 轮）")
+        print(f"  追踪关闭：{off:.1f} µs/轮")
+        print(f"  追踪开启：{on:.1f} µs/轮（{on / off - 1:+.1%}）")
+
+
+if __name__ == "__main__":
+    main()
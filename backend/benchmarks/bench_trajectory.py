@@ -0,0 +1,81 @@
+"""
+情绪轨迹内存基准：列式 StateTrajectory vs 逐轮深拷贝的 EmotionalState 列表
+
+用 tracemalloc 统计保存 N 轮情绪历史所占用的内存，并对比追加与格式化的耗时。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.bench_trajectory --turns 200
+"""
+import argparse
+import time
+import tracemalloc
+
+import benchmarks._stub  # noqa: F401  设置导入路径
+
+
+def build_snapshots(turns: int) -> list:
+    """原实现：每轮深拷贝一份 pydantic 状态"""
+    from app.models.state import EmotionalState
+    
+    state = EmotionalState(trust=0.5, openness=0.4, distance=0.6)
+    states = [state]
+    for i in range(turns):
+        state = state.model_copy(deep=True)
+        state.update_from_interaction(delta_valence=0.01 * (i % 3 - 1), delta_trust=0.005)
+        states.append(state)
+    return states
+
+
+def build_trajectory(turns: int):
+    """现实现：浅拷贝当前状态，历史追加到列式轨迹"""
+    from app.models.state import EmotionalState
+    from app.models.trajectory import StateTrajectory
+    
+    state = EmotionalState(trust=0.5, openness=0.4, distance=0.6)
+    trajectory = StateTrajectory([state])
+    for i in range(turns):
+        state = state.model_copy()
+        state.update_from_interaction(delta_valence=0.01 * (i % 3 - 1), delta_trust=0.005)
+        trajectory.append(state)
+    return trajectory
+
+
+def traced(build, turns: int) -> tuple[object, int, float]:
+    """返回 (结果, 保留的内存字节数, 耗时秒)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build(turns)
+    elapsed = time.perf_counter() - start
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, retained, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="情绪轨迹内存基准")
+    parser.add_argument("--turns", type=int, default=200)
+    args = parser.parse_args()
+    
+    from app.services.model_b import model_b_service
+    
+    # 预热导入，避免模块加载计入内存
+    build_snapshots(1)
+    build_trajectory(1)
+    
+    snapshots, snapshot_bytes, snapshot_time = traced(build_snapshots, args.turns)
+    trajectory, trajectory_bytes, trajectory_time = traced(build_trajectory, args.turns)
+    
+    # 两种存储给 Model B 的轨迹文本必须一致
+    assert (model_b_service._format_emotional_trajectory(snapshots)
+            == model_b_service._format_emotional_trajectory(trajectory))
+    
+    print(f"轮数：{args.turns}")
+    print(f"{'':<16}{'深拷贝列表':>14}{'列式轨迹':>14}")
+    print(f"{'保留内存':<16}{snapshot_bytes / 1024:>11.1f} KB{trajectory_bytes / 1024:>11.1f} KB")
+    print(f"{'每轮内存':<16}{snapshot_bytes / args.turns:>12.0f} B{trajectory_bytes / args.turns:>12.0f} B")
+    print(f"{'构建耗时':<16}{snapshot_time * 1000:>11.2f} ms{trajectory_time * 1000:>11.2f} ms")
+    print(f"序列化大小：{len(trajectory.to_bytes())} 字节")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+端到端压测：N 个并发模拟用户通过 DialogueManager 对话并请求分析
+
+配合本地桩 LLM 服务（benchmarks.stub_llm_server）离线运行，报告：
+- 轮次吞吐量
+- 轮次延迟 p50/p95/p99
+- 首 token 延迟（TTFT）p50/p95/p99
+- Model B 分析延迟
+- 每个会话的内存占用
+
+用法（在 backend 目录下）：
+    # 自动启动桩服务
+    python -m benchmarks.load_test --users 200 --turns 10 --spawn-stub --stub-latency 0.3
+    
+    # 连接已在运行的桩服务
+    python -m benchmarks.load_test --base-url http://127.0.0.1:8900/v1 --users 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from benchmarks._stub import backend_dir
+
+
+_USER_LINES = [
+    "你好，听说你也喜欢爬山？",
+    "为什么你回复这么慢",
+    "谢谢你愿意跟我聊这些",
+    "你平时周末一般做什么",
+    "有意思，我也这么觉得",
+    "你怎么不说话了",
+]
+
+
+def percentile(values: list[float], p: float) -> float:
+    """计算百分位数（最近秩法）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+class LoadResult:
+    """压测结果汇总"""
+    
+    def __init__(self):
+        self.turn_latencies: list[float] = []
+        self.ttfts: list[float] = []
+        self.analysis_latencies: list[float] = []
+        self.errors = 0
+    
+    def summary(self, elapsed: float, users: int, memory_per_session: float) -> dict:
+        def dist(values: list[float]) -> dict:
+            return {
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "p99": percentile(values, 99)
+            }
+        
+        return {
+            "users": users,
+            "turns": len(self.turn_latencies),
+            "analyses": len(self.analysis_latencies),
+            "errors": self.errors,
+            "elapsed": elapsed,
+            "throughput": len(self.turn_latencies) / elapsed if elapsed else 0.0,
+            "turn_latency": dist(self.turn_latencies),
+            "ttft": dist(self.ttfts),
+            "analysis_latency": dist(self.analysis_latencies),
+            "memory_per_session_kb": memory_per_session / 1024
+        }
+
+
+async def simulate_user(
+    registry,
+    user_index: int,
+    session_id: str,
+    turns: int,
+    analyze_every: int,
+    think_time: float,
+    result: LoadResult
+):
+    """单个模拟用户：顺序对话，每隔若干轮请求一次分析"""
+    for i in range(turns):
+        # 每个用户的输入略有不同，避免被单飞去重和分析缓存合并
+        user_input = f"{_USER_LINES[(user_index + i) % len(_USER_LINES)]}（{user_index}）"
+        start = time.perf_counter()
+        first_token: list[float] = []
+        
+        async def on_chunk(chunk: str):
+            if not first_token:
+                first_token.append(time.perf_counter() - start)
+        
+        try:
+            await registry.process_user_input(session_id, user_input, on_chunk=on_chunk)
+            result.turn_latencies.append(time.perf_counter() - start)
+            if first_token:
+                result.ttfts.append(first_token[0])
+        except Exception:
+            result.errors += 1
+        
+        if analyze_every and (i + 1) % analyze_every == 0:
+            start = time.perf_counter()
+            try:
+                await registry.get_analysis(session_id)
+                result.analysis_latencies.append(time.perf_counter() - start)
+            except Exception:
+                result.errors += 1
+        
+        if think_time:
+            await asyncio.sleep(think_time)
+
+
+async def run_load(args) -> dict:
+    from app.core.llm_client import llm_client
+    from app.services.session_registry import SessionRegistry
+    
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    
+    registry = SessionRegistry(max_sessions=args.users)
+    session_ids = [await registry.create() for _ in range(args.users)]
+    result = LoadResult()
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        simulate_user(registry, i, sid, args.turns, args.analyze_every, args.think_time, result)
+        for i, sid in enumerate(session_ids)
+    ))
+    elapsed = time.perf_counter() - start
+    
+    memory_per_session = (tracemalloc.get_traced_memory()[0] - baseline) / args.users
+    tracemalloc.stop()
+    
+    summary = result.summary(elapsed, args.users, memory_per_session)
+    summary["llm_client"] = llm_client.stats()
+    await llm_client.close()
+    return summary
+
+
+def spawn_stub(args) -> subprocess.Popen:
+    """在子进程中启动桩服务并等待就绪"""
+    import httpx
+    
+    command = [
+        sys.executable, "-m", "benchmarks.stub_llm_server",
+        "--port", str(args.stub_port),
+        "--latency", str(args.stub_latency),
+        "--tokens-per-second", str(args.stub_tokens_per_second),
+        "--error-rate", str(args.stub_error_rate),
+        "--rate-limit-rate", str(args.stub_rate_limit_rate),
+    ]
+    process = subprocess.Popen(command, cwd=str(backend_dir))
+    
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{args.stub_port}/stats", timeout=0.5)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    
+    process.terminate()
+    raise RuntimeError("桩服务启动超时")
+
+
+def print_summary(summary: dict):
+    ms = lambda v: f"{v * 1000:8.1f} ms"
+    print("=" * 60)
+    print(f"并发用户：{summary['users']}，完成轮次：{summary['turns']}，"
+          f"分析：{summary['analyses']}，错误：{summary['errors']}")
+    print(f"耗时：{summary['elapsed']:.2f}s，吞吐：{summary['throughput']:.1f} 轮/s")
+    print("-" * 60)
+    print(f"{'指标':<12}{'p50':>12}{'p95':>12}{'p99':>12}")
+    for label, key in (("轮次延迟", "turn_latency"), ("TTFT", "ttft"), ("分析延迟", "analysis_latency")):
+        d = summary[key]
+        print(f"{label:<12}{ms(d['p50']):>12}{ms(d['p95']):>12}{ms(d['p99']):>12}")
+    print("-" * 60)
+    print(f"每会话内存：{summary['memory_per_session_kb']:.1f} KB")
+    print(f"LLM 客户端：{summary['llm_client']}")
+    print("=" * 60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端压测")
+    parser.add_argument("--users", type=int, default=100, help="并发模拟用户数")
+    parser.add_argument("--turns", type=int, default=10, help="每个用户的轮数")
+    parser.add_argument("--analyze-every", type=int, default=5, help="每隔几轮请求一次分析（0 关闭）")
+    parser.add_argument("--think-time", type=float, default=0.0, help="用户每轮之间的思考时间（秒）")
+    parser.add_argument("--base-url", default=None, help="桩服务地址，默认使用 --stub-port")
+    parser.add_argument("--json", dest="json_path", default=None, help="把结果写入 JSON 文件")
+    parser.add_argument("--spawn-stub", action="store_true", help="自动启动本地桩服务")
+    parser.add_argument("--stub-port", type=int, default=8900)
+    parser.add_argument("--stub-latency", type=float, default=0.3)
+    parser.add_argument("--stub-tokens-per-second", type=float, default=60.0)
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    parser.add_argument("--stub-rate-limit-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    
+    # 必须在导入 app 之前设置，settings 在导入时读取环境变量
+    os.environ["AIHUBMIX_BASE_URL"] = args.base_url or f"http://127.0.0.1:{args.stub_port}/v1"
+    
+    stub = spawn_stub(args) if args.spawn_stub else None
+    try:
+        summary = asyncio.run(run_load(args))
+    finally:
+        if stub is not None:
+            stub.terminate()
+            stub.wait()
+    
+    print_summary(summary)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+本地 OpenAI 兼容桩 LLM 服务
+
+模拟 /chat/completions 接口，用于离线压测和容量评估：
+- 可配置的首 token 延迟分布（fixed / uniform / lognormal）
+- 可配置的 token 生成速率
+- 支持 SSE 流式输出
+- 按比例注入 429 和 5xx 错误
+
+用法（在 backend 目录下）：
+    python -m benchmarks.stub_llm_server --port 8900 --latency 0.3 --tokens-per-second 60
+    AIHUBMIX_BASE_URL=http://127.0.0.1:8900/v1 python cli/terminal_chat.py
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+# 用于拼接回复的字符（每个字符约 1 token）
+_REPLY_TEXT = "嗯我觉得还行吧其实也没有特别的想法你呢最近怎么样哈哈挺好的"
+
+
+class StubConfig:
+    """桩服务配置"""
+    
+    def __init__(
+        self,
+        latency: float = 0.3,
+        latency_dist: str = "lognormal",
+        latency_sigma: float = 0.5,
+        tokens_per_second: float = 60.0,
+        reply_tokens: int = 40,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        seed: int | None = None
+    ):
+        self.latency = latency
+        self.latency_dist = latency_dist
+        self.latency_sigma = latency_sigma
+        self.tokens_per_second = tokens_per_second
+        self.reply_tokens = reply_tokens
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.random = random.Random(seed)
+    
+    def sample_latency(self) -> float:
+        """按配置的分布采样首 token 延迟（秒）"""
+        if self.latency_dist == "fixed":
+            return self.latency
+        if self.latency_dist == "uniform":
+            return self.random.uniform(0, 2 * self.latency)
+        # lognormal：中位数为 latency，长尾由 sigma 控制
+        return self.latency * self.random.lognormvariate(0, self.latency_sigma)
+    
+    def sample_error(self) -> int | None:
+        """按比例注入错误，返回要返回的状态码"""
+        roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            return 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 503
+        return None
+
+
+def create_stub_app(config: StubConfig) -> FastAPI:
+    """创建桩服务应用"""
+    app = FastAPI(title="Stub LLM")
+    stats = {"requests": 0, "streams": 0, "errors": 0, "rate_limited": 0}
+    
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        
+        status = config.sample_error()
+        if status is not None:
+            stats["rate_limited" if status == 429 else "errors"] += 1
+            headers = {"Retry-After": "0.1"} if status == 429 else {}
+            return JSONResponse(
+                {"error": {"message": "injected error", "type": "stub"}},
+                status_code=status,
+                headers=headers
+            )
+        
+        n_tokens = max(1, min(body.get("max_tokens") or config.reply_tokens, config.reply_tokens))
+        reply = (_REPLY_TEXT * (n_tokens // len(_REPLY_TEXT) + 1))[:n_tokens]
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in body.get("messages", []))
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": n_tokens,
+            "total_tokens": prompt_tokens + n_tokens
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        model = body.get("model", "stub")
+        token_interval = 1.0 / config.tokens_per_second if config.tokens_per_second > 0 else 0
+        
+        await asyncio.sleep(config.sample_latency())
+        
+        if not body.get("stream"):
+            await asyncio.sleep(token_interval * n_tokens)
+            return JSONResponse({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": reply},
+                    "finish_reason": "stop"
+                }],
+                "usage": usage
+            })
+        
+        stats["streams"] += 1
+        
+        async def event_stream():
+            for i, char in enumerate(reply):
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": char}, "finish_reason": None}]
+                }
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                if i < n_tokens - 1 and token_interval:
+                    await asyncio.sleep(token_interval)
+            final = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                "usage": usage
+            }
+            yield f"data: {json.dumps(final, ensure_ascii=False)}\n\n"
+            yield "data: [DONE]\n\n"
+        
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+    
+    async def get_stats():
+        return stats
+    
+    # 同时支持带 /v1 前缀与不带前缀的 base_url
+    for prefix in ("", "/v1"):
+        app.add_api_route(f"{prefix}/chat/completions", chat_completions, methods=["POST"])
+    app.add_api_route("/stats", get_stats, methods=["GET"])
+    
+    return app
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容桩 LLM 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.3, help="首 token 延迟中位数（秒）")
+    parser.add_argument(
+        "--latency-dist", choices=["fixed", "uniform", "lognormal"], default="lognormal"
+    )
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="lognormal 分布的 sigma")
+    parser.add_argument("--tokens-per-second", type=float, default=60.0, help="token 生成速率")
+    parser.add_argument("--reply-tokens", type=int, default=40, help="每次回复的 token 数")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="5xx 错误比例")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="429 错误比例")
+    parser.add_argument("--seed", type=int, default=None)
+    return parser
+
+
+def main():
+    args = build_arg_parser().parse_args()
+    config = StubConfig(
+        latency=args.latency,
+        latency_dist=args.latency_dist,
+        latency_sigma=args.latency_sigma,
+        tokens_per_second=args.tokens_per_second,
+        reply_tokens=args.reply_tokens,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed
+    )
+    uvicorn.run(create_stub_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
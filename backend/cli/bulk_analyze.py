@@ -0,0 +1,75 @@
+"""
+批量 Model B 分析
+
+从归档或会话数据库读取会话并批量分析，结果追加写入 JSONL；
+中断后用相同参数重新运行即可从断点继续。
+
+用法（在 backend 目录下）：
+    python cli/bulk_analyze.py --archive data/archive --output data/analysis.jsonl --concurrency 16
+    python cli/bulk_analyze.py --db data/sessions.db --output data/analysis.jsonl
+"""
+import sys
+from pathlib import Path
+
+# 动态添加 backend 目录到 Python 路径
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import argparse
+import asyncio
+
+from app.core.llm_client import llm_client
+from app.services.bulk_analysis import (
+    BulkAnalysisRunner,
+    iter_archive_sessions,
+    iter_store_sessions
+)
+from app.services.service_metrics import start_metrics_file
+from app.services.session_store import SessionStore
+from app.services.transcript_archive import TranscriptArchive
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="批量 Model B 分析")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--archive", help="归档目录")
+    source.add_argument("--db", help="会话数据库路径")
+    parser.add_argument("--output", required=True, help="结果 JSONL 路径（同时作为断点）")
+    parser.add_argument("--concurrency", type=int, default=8, help="同时进行的分析数上限")
+    parser.add_argument("--recent-turns", type=int, default=5, help="每个会话分析最近几轮")
+    args = parser.parse_args()
+    
+    runner = BulkAnalysisRunner(
+        args.output,
+        concurrency=args.concurrency,
+        recent_turns=args.recent_turns
+    )
+    
+    store = SessionStore(args.db) if args.db else None
+    metrics_file = start_metrics_file()
+    try:
+        if store is not None:
+            sessions = iter_store_sessions(store)
+        else:
+            sessions = iter_archive_sessions(TranscriptArchive(args.archive))
+        stats = await runner.run(sessions)
+    finally:
+        if metrics_file is not None:
+            await metrics_file.stop()
+        if store is not None:
+            await store.close()
+        await llm_client.close()
+    
+    print(
+        f"完成 {stats['completed']} 个，跳过 {stats['skipped']} 个（已有结果），"
+        f"失败 {stats['failed']} 个，耗时 {stats['elapsed']:.1f} 秒"
+    )
+    print(f"LLM 调度统计：{llm_client.stats()}")
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\n已中断，重新运行相同命令即可继续")
+        sys.exit(130)
@@ -0,0 +1,46 @@
+"""
+把持久化的会话导出为列式归档
+
+用法（在 backend 目录下）：
+    python cli/export_archive.py --db data/sessions.db --output data/archive
+"""
+import sys
+from pathlib import Path
+
+# 动态添加 backend 目录到 Python 路径
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import argparse
+import asyncio
+import time
+
+from app.core.config import settings
+from app.services.session_store import SessionStore
+from app.services.transcript_archive import TranscriptArchive, export_store
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="导出会话归档")
+    parser.add_argument("--db", default=settings.SESSION_DB_PATH, help="会话数据库路径")
+    parser.add_argument("--output", required=True, help="归档目录")
+    parser.add_argument("--no-cues", action="store_true", help="不评估线索（更快）")
+    args = parser.parse_args()
+    
+    if not args.db:
+        parser.error("请通过 --db 或 SESSION_DB_PATH 指定会话数据库")
+    
+    store = SessionStore(args.db)
+    start = time.perf_counter()
+    try:
+        count = await export_store(store, args.output, evaluate_cues=not args.no_cues)
+    finally:
+        await store.close()
+    
+    archive = TranscriptArchive(args.output)
+    print(f"已导出 {count} 个会话，耗时 {time.perf_counter() - start:.1f} 秒")
+    print(f"消息 {len(archive.messages)} 条，状态 {len(archive.states)} 行，线索命中 {len(archive.cues)} 次")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
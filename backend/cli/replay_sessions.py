@@ -0,0 +1,128 @@
+"""
+离线回放已持久化的会话
+
+按会话数据库中的用户消息重新驱动完整的对话流程，LLM 调用全部从录制文件回放（不访问上游），
+并逐轮核对回复与情绪状态轨迹是否与数据库中的记录完全一致，可用于回归测试与性能分析。
+
+录制：运行服务或终端对话时设置 LLM_CASSETTE_MODE=record、LLM_CASSETTE_PATH 与 SESSION_DB_PATH。
+
+用法（在 backend 目录下）：
+    python cli/replay_sessions.py --db data/sessions.db --cassette data/llm_cassette.jsonl
+    # 按录制时一半的延迟回放
+    python cli/replay_sessions.py --db data/sessions.db --cassette data/llm_cassette.jsonl --latency 0.5
+"""
+import sys
+from pathlib import Path
+
+# 动态添加 backend 目录到 Python 路径
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import argparse
+import asyncio
+import time
+
+from app.core.config import settings
+
+
+async def replay_session(store, session_id: str) -> tuple[int, list[str]]:
+    """
+    回放单个会话
+    
+    Returns:
+        (回放的轮数, 不一致之处的描述)
+    """
+    from app.models.trajectory import StateTrajectory
+    from app.services.dialogue_manager import DialogueManager
+    
+    snapshot = await store.load_session(session_id, max_messages=0)
+    if snapshot is None:
+        return 0, [f"{session_id}: 会话不存在"]
+    
+    manager = DialogueManager(session_id=session_id, prefetch_every=0)
+    manager.start_new_dialogue(snapshot.scenario_id)
+    
+    turns = 0
+    mismatches: list[str] = []
+    pending_user: str | None = None
+    try:
+        async for seq, message in store.iter_messages(session_id):
+            if message.role == "user":
+                pending_user = message.content
+                continue
+            if pending_user is None:
+                continue
+            reply = await manager.process_user_input(pending_user)
+            pending_user = None
+            turns += 1
+            if reply != message.content:
+                mismatches.append(f"{session_id} #{seq}: 回复不一致")
+    finally:
+        manager.close()
+    
+    expected = StateTrajectory()
+    async for _, state in store.iter_states(session_id):
+        expected.append(state)
+    if manager.emotional_states.to_bytes() != expected.to_bytes():
+        mismatches.append(
+            f"{session_id}: 情绪状态轨迹不一致（回放 {len(manager.emotional_states)} 个，"
+            f"记录 {len(expected)} 个）"
+        )
+    return turns, mismatches
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="离线回放已持久化的会话")
+    parser.add_argument("--db", required=True, help="会话数据库路径")
+    parser.add_argument("--cassette", required=True, help="LLM 录制文件路径（JSONL）")
+    parser.add_argument("--latency", type=float, default=0.0, help="按录制延迟的多少倍等待（默认 0，不等待）")
+    parser.add_argument("--session", nargs="*", default=None, help="只回放这些会话")
+    args = parser.parse_args()
+    
+    # 必须在 LLM 客户端首次使用前设置
+    settings.LLM_CASSETTE_MODE = "replay"
+    settings.LLM_CASSETTE_PATH = args.cassette
+    settings.LLM_CASSETTE_LATENCY = args.latency
+    
+    from app.core.llm_client import llm_client
+    from app.services.session_store import SessionStore
+    
+    store = SessionStore(args.db)
+    sessions = total_turns = 0
+    mismatches: list[str] = []
+    start = time.perf_counter()
+    try:
+        session_ids = args.session
+        if session_ids is None:
+            session_ids = []
+            after = ""
+            while True:
+                page = await store.list_sessions(after=after, limit=500)
+                session_ids.extend(page)
+                if len(page) < 500:
+                    break
+                after = page[-1]
+        
+        for session_id in session_ids:
+            turns, problems = await replay_session(store, session_id)
+            sessions += 1
+            total_turns += turns
+            mismatches.extend(problems)
+    finally:
+        await store.close()
+        await llm_client.close()
+    elapsed = time.perf_counter() - start
+    
+    print(f"回放 {sessions} 个会话、{total_turns} 轮，耗时 {elapsed:.2f} 秒"
+          f"（{total_turns / elapsed if elapsed else 0:.1f} 轮/秒）")
+    print(f"录制文件统计：{llm_client.stats().get('cassette')}")
+    if mismatches:
+        for problem in mismatches[:20]:
+            print(f"  ❌ {problem}")
+        print(f"\n❌ {len(mismatches)} 处与记录不一致")
+        sys.exit(1)
+    print("\n✅ 回放结果与记录完全一致")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,62 @@
+"""
+按当前词典重新推演归档会话的最终情绪状态
+
+修改 app/data/lexicons 下的词典后，对照归档时的最终档位，统计有多少会话的
+最终状态描述发生变化，以及最常见的变化。只重评已归档的线索命中，不解析消息正文。
+
+用法（在 backend 目录下）：
+    python cli/rescore_archive.py --archive data/archive
+"""
+import sys
+from pathlib import Path
+
+# 动态添加 backend 目录到 Python 路径
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import argparse
+import time
+from collections import Counter
+
+import numpy as np
+
+from app.models.state import EmotionalState
+from app.models.trajectory import decode_levels
+from app.services.transcript_archive import TranscriptArchive
+
+
+def _describe(code: int) -> str:
+    return EmotionalState.describe_levels(decode_levels(code)).replace("\n", "；")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按当前词典重评归档会话")
+    parser.add_argument("--archive", required=True, help="归档目录")
+    parser.add_argument("--top", type=int, default=10, help="列出最常见的几种档位变化")
+    args = parser.parse_args()
+    
+    archive = TranscriptArchive(args.archive)
+    start = time.perf_counter()
+    
+    compared = 0
+    transitions: Counter = Counter()
+    for first, store in archive.rescore():
+        block = archive.sessions[first:first + len(store)]
+        has_states = block["state_count"] > 0
+        last = block["state_start"][has_states] + block["state_count"][has_states] - 1
+        before = archive.levels[last]
+        after = store.level_codes(np.flatnonzero(has_states))
+        compared += len(before)
+        changed = before != after
+        transitions.update(zip(before[changed].tolist(), after[changed].tolist()))
+    
+    changed_total = sum(transitions.values())
+    print(f"重评 {len(archive)} 个会话，耗时 {time.perf_counter() - start:.2f} 秒")
+    print(f"有归档状态的会话 {compared} 个，最终档位变化 {changed_total} 个")
+    for (before, after), count in transitions.most_common(args.top):
+        print(f"{count:>8}  {_describe(before)}")
+        print(f"{'':>8}→ {_describe(after)}")
+
+
+if __name__ == "__main__":
+    main()
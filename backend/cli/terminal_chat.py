@@ -1,5 +1,10 @@
 """
 终端对话界面 - MVP 实现
+
+配置了 SESSION_DB_PATH 时，每次启动使用新的会话 ID 并持久化，可用 --resume 继续之前的会话：
+    python cli/terminal_chat.py
+    python cli/terminal_chat.py --scenario low_mood
+    python cli/terminal_chat.py --resume terminal-20240101-120000
 """
 import sys
 from pathlib import Path
@@ -8,26 +13,43 @@ from pathlib import Path
 backend_dir = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(backend_dir))
 
+import argparse
 import asyncio
-import sys
-from app.services.dialogue_manager import dialogue_manager
+import time
+import uuid
+
+from app.services.dialogue_manager import DialogueManager
+from app.services.service_metrics import start_metrics_file
+from app.services.session_store import get_session_store
 
 
 class TerminalChat:
     """终端对话界面"""
     
-    def __init__(self):
+    def __init__(self, scenario_id: str = "first_meet", resume_id: str | None = None):
+        """
+        Args:
+            scenario_id: 新对话的情境 ID
+            resume_id: 要恢复的会话 ID（需要配置 SESSION_DB_PATH）
+        """
         self.running = False
+        self.scenario_id = scenario_id
+        self.resume_id = resume_id
+        # 时间便于辨认，随机后缀避免同一秒内启动的两次运行共用（并清空）同一会话
+        session_id = resume_id or f"{time.strftime('terminal-%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.dialogue_manager = DialogueManager(session_id=session_id, store=get_session_store())
+        self._streamed = False  # 本轮回复是否已流式打印
     
     async def start(self):
         """启动对话"""
+        # 初始化对话（恢复已有会话或开始新对话）
+        if not await self._init_dialogue():
+            return
         self.running = True
         
         # 显示欢迎信息
         self._print_welcome()
-        
-        # 初始化对话
-        dialogue_manager.start_new_dialogue()
+        self._print_session_info()
         
         # 主循环
         while self.running:
@@ -44,7 +66,11 @@ class TerminalChat:
                 
                 # 发送给 Model A
                 print("\n[对方正在输入...]\n")
-                response = await dialogue_manager.process_user_input(user_input)
+                self._streamed = False
+                response = await self.dialogue_manager.process_user_input(
+                    user_input,
+                    on_chunk=self._print_chunk
+                )
                 
                 # 显示回复
                 self._print_response(response)
@@ -57,6 +83,43 @@ class TerminalChat:
                 import traceback
                 traceback.print_exc()
     
+    async def _init_dialogue(self) -> bool:
+        """
+        恢复会话或开始新对话
+        
+        Returns:
+            是否可以开始对话
+        """
+        if not self.resume_id:
+            self.dialogue_manager.start_new_dialogue(self.scenario_id)
+            return True
+        
+        store = self.dialogue_manager.store
+        if store is None:
+            print("❌ 未配置 SESSION_DB_PATH，无法恢复会话")
+            return False
+        snapshot = await store.load_session(self.resume_id)
+        if snapshot is None:
+            print(f"❌ 会话不存在：{self.resume_id}")
+            return False
+        self.dialogue_manager.restore(snapshot)
+        return True
+    
+    def _print_session_info(self):
+        """打印会话 ID 与恢复的最近对话"""
+        manager = self.dialogue_manager
+        if manager.store is None:
+            return
+        if self.resume_id:
+            turns = manager.get_dialogue_summary()["total_turns"]
+            print(f"\n📂 已恢复会话 {manager.session_id}（共 {turns} 轮），最近的对话：")
+            for message in manager.context.get_recent_messages(4):
+                speaker = "你" if message.role == "user" else "对方"
+                print(f"{speaker}：{message.content}")
+            print("-" * 60)
+        else:
+            print(f"\n💾 会话 ID：{manager.session_id}（之后可用 --resume {manager.session_id} 继续）")
+    
     def _print_welcome(self):
         """打印欢迎信息"""
         print("=" * 60)
@@ -71,8 +134,9 @@ class TerminalChat:
         print("  这是一个训练系统，对方不会永远理解你、迎合你")
         print("  观察对方的反应，尝试不同的表达方式")
         print("\n" + "=" * 60)
-        print("\n🎬 情境：初次见面")
-        print("你们刚通过朋友介绍认识，这是第一次线上聊天\n")
+        scenario = self.dialogue_manager.current_scenario
+        print(f"\n🎬 情境：{scenario.name}")
+        print(f"{scenario.description}\n")
         print("-" * 60)
     
     async def _get_user_input(self) -> str:
@@ -102,24 +166,27 @@ class TerminalChat:
                 print("\n👋 感谢使用，再见！")
                 self.running = False
                 return True
-            
+                
             elif command == "/analyze":
                 print("\n[正在分析对话...]\n")
                 asyncio.create_task(self._show_analysis())
                 return True
-            
+                
             elif command == "/summary":
-                summary = dialogue_manager.get_dialogue_summary()
+                summary = self.dialogue_manager.get_dialogue_summary()
                 print(f"\n📊 对话摘要：")
                 print(f"  对话轮数：{summary.get('total_turns', 0)}")
                 print(f"  情绪状态：{summary.get('current_emotion', '未知')}")
                 print(f"  关系状态：{summary.get('current_relation', '未知')}")
+                usage = self.dialogue_manager.usage.total
+                print(f"  LLM 用量：{usage.calls} 次调用，{usage.total_tokens} tokens，"
+                      f"费用 {usage.cost:.4f}")
                 return True
-            
+                
             elif command.startswith("/help"):
                 self._print_welcome()
                 return True
-            
+                
             else:
                 print(f"❌ 未知命令：{command}")
                 return True
@@ -129,7 +196,7 @@ class TerminalChat:
     async def _show_analysis(self):
         """显示对话分析"""
         try:
-            analysis = await dialogue_manager.get_analysis(recent_turns=5)
+            analysis = await self.dialogue_manager.get_analysis(recent_turns=5)
             print("\n" + "=" * 60)
             print("📈 对话分析报告")
             print("=" * 60 + "\n")
@@ -138,16 +205,39 @@ class TerminalChat:
         except Exception as e:
             print(f"❌ 分析失败: {e}")
     
+    async def _print_chunk(self, chunk: str):
+        """流式打印 AI 回复片段"""
+        if not self._streamed:
+            print("\n对方：", end="")
+            self._streamed = True
+        print(chunk, end="", flush=True)
+    
     def _print_response(self, response: str):
-        """打印 AI 回复"""
-        print(f"\n对方：{response}")
+        """打印 AI 回复（正文已流式打印时只收尾）"""
+        if self._streamed:
+            print()
+        else:
+            print(f"\n对方：{response}")
         print("-" * 60)
 
 
 async def main():
     """主函数"""
-    chat = TerminalChat()
-    await chat.start()
+    parser = argparse.ArgumentParser(description="终端对话")
+    parser.add_argument("--scenario", default="first_meet", help="新对话的情境 ID")
+    parser.add_argument("--resume", default=None, metavar="SESSION_ID", help="继续之前持久化的会话")
+    args = parser.parse_args()
+    
+    chat = TerminalChat(scenario_id=args.scenario, resume_id=args.resume)
+    metrics_file = start_metrics_file()
+    try:
+        await chat.start()
+    finally:
+        if metrics_file is not None:
+            await metrics_file.stop()
+        store = get_session_store()
+        if store is not None:
+            await store.close()
 
 
 if __name__ == "__main__":
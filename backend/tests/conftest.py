@@ -0,0 +1,92 @@
+"""
+测试公共配置
+"""
+import asyncio
+import json
+import os
+
+import httpx
+import pytest
+
+# 测试不访问真实 API，也不读取本地的持久化 / 录制配置
+os.environ.setdefault("AIHUBMIX_API_KEY", "test")
+for name in ("SESSION_DB_PATH", "LLM_CASSETTE_PATH", "TRACE_FILE", "METRICS_FILE"):
+    os.environ[name] = ""
+os.environ["LLM_CASSETTE_MODE"] = "off"
+
+
+def _response(content: str = "嗯") -> dict:
+    return {
+        "choices": [{"message": {"content": content}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 2}
+    }
+
+
+class FakeUpstream:
+    """可控的上游：请求在 release 被设置前一直挂起"""
+    
+    def __init__(self):
+        self.calls = 0
+        self.cancelled = 0
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+    
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        self.started.set()
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return httpx.Response(200, json=_response())
+
+
+def echo_handler(request: httpx.Request) -> httpx.Response:
+    """立即回复“回复：<最后一条消息>”的上游，支持 SSE 流式"""
+    payload = json.loads(request.content)
+    content = "回复：" + payload["messages"][-1]["content"]
+    if not payload.get("stream"):
+        return httpx.Response(200, json=_response(content))
+    events = [
+        "data: " + json.dumps({"choices": [{"delta": {"content": part}}]}, ensure_ascii=False)
+        for part in (content[:3], content[3:])
+    ]
+    events.append("data: [DONE]")
+    return httpx.Response(
+        200,
+        text="\n\n".join(events) + "\n\n",
+        headers={"Content-Type": "text/event-stream"}
+    )
+
+
+async def make_client(handler) -> "LLMClient":
+    """以 handler 作为上游的独立 LLMClient（替换并关闭默认创建的连接池）"""
+    from app.core.llm_client import LLMClient
+    
+    client = LLMClient()
+    await client.client.aclose()
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    client.base_url = "http://upstream"
+    return client
+
+
+@pytest.fixture
+async def echo_llm(monkeypatch):
+    """Model A / Model B 都走 echo_handler 上游"""
+    from app.services import model_a, model_b
+    
+    client = await make_client(echo_handler)
+    monkeypatch.setattr(model_a, "llm_client", client)
+    monkeypatch.setattr(model_b, "llm_client", client)
+    yield client
+    await client.close()
+
+
+@pytest.fixture
+async def upstream_client():
+    """使用 FakeUpstream 作为上游的独立 LLMClient"""
+    upstream = FakeUpstream()
+    client = await make_client(upstream.handler)
+    yield upstream, client
+    await client.close()
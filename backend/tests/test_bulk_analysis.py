@@ -0,0 +1,69 @@
+"""
+批量分析流水线测试
+"""
+import asyncio
+import json
+
+import pytest
+
+from app.models.dialogue import DialogueContext
+from app.models.trajectory import StateTrajectory
+from app.services import bulk_analysis
+from app.services.bulk_analysis import BulkAnalysisRunner
+
+
+class FakeModelB:
+    def __init__(self, result=None):
+        self.result = result
+        self.calls = 0
+    
+    def fingerprint(self) -> str:
+        return "fp"
+    
+    async def analyze(self, **kwargs):
+        self.calls += 1
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+class Record:
+    content = "分析"
+    message_count = 0
+    state_count = 0
+
+
+async def _sessions(count: int):
+    for i in range(count):
+        yield f"s{i}", DialogueContext("first_meet"), StateTrajectory()
+
+
+async def test_results_are_written_and_resumed(monkeypatch, tmp_path):
+    fake = FakeModelB(Record())
+    monkeypatch.setattr(bulk_analysis, "model_b_service", fake)
+    output = tmp_path / "analysis.jsonl"
+    
+    stats = await BulkAnalysisRunner(output, concurrency=2).run(_sessions(5))
+    assert stats["completed"] == 5
+    assert len(output.read_text(encoding="utf-8").splitlines()) == 5
+    assert json.loads(output.read_text(encoding="utf-8").splitlines()[0])["fingerprint"] == "fp"
+    
+    stats = await BulkAnalysisRunner(output, concurrency=2).run(_sessions(6))
+    assert (stats["completed"], stats["skipped"]) == (1, 5)
+
+
+async def test_analysis_failures_are_counted(monkeypatch, tmp_path):
+    monkeypatch.setattr(bulk_analysis, "model_b_service", FakeModelB(RuntimeError("429")))
+    
+    stats = await BulkAnalysisRunner(tmp_path / "out.jsonl", concurrency=2).run(_sessions(5))
+    assert (stats["completed"], stats["failed"]) == (0, 5)
+
+
+async def test_crashed_workers_do_not_hang_producer(monkeypatch, tmp_path):
+    # 结果缺少字段：worker 在写入时意外退出，而不是按单个会话失败计数
+    monkeypatch.setattr(bulk_analysis, "model_b_service", FakeModelB(object()))
+    runner = BulkAnalysisRunner(tmp_path / "out.jsonl", concurrency=2)
+    
+    with pytest.raises(ExceptionGroup) as excinfo:
+        await asyncio.wait_for(runner.run(_sessions(50)), timeout=2)
+    assert excinfo.group_contains(AttributeError)
@@ -0,0 +1,79 @@
+"""
+LLM 录制 / 回放测试
+"""
+import httpx
+import pytest
+
+from app.core.cassette import Cassette, CassetteEntry, CassetteMissError, cassette_scope
+from tests.conftest import echo_handler, make_client
+
+
+def _offline(request: httpx.Request) -> httpx.Response:
+    raise AssertionError("回放模式不应访问上游")
+
+
+async def _collect(client, messages) -> list[str]:
+    return [chunk async for chunk in client.stream_chat_completion(messages, "m")]
+
+
+@pytest.fixture
+async def recorded(tmp_path):
+    """录制两个会话的调用，返回录制文件路径"""
+    path = tmp_path / "cassette.jsonl"
+    client = await make_client(echo_handler)
+    client.cassette = Cassette(path, "record")
+    try:
+        for session_id in ("a", "b"):
+            with cassette_scope(session_id):
+                await client.chat_completion([{"role": "user", "content": f"{session_id} 你好"}], "m")
+                await _collect(client, [{"role": "user", "content": f"{session_id} 流式"}])
+    finally:
+        await client.close()
+    return path
+
+
+async def test_replay_returns_recorded_replies_offline(recorded):
+    client = await make_client(_offline)
+    client.cassette = Cassette(recorded, "replay")
+    try:
+        with cassette_scope("b"):
+            assert await client.chat_completion([{"role": "user", "content": "b 你好"}], "m") == "回复：b 你好"
+            assert await _collect(client, [{"role": "user", "content": "b 流式"}]) == ["回复：", "b 流式"]
+    finally:
+        await client.close()
+    
+    assert client.cassette.stats()["replayed"] == 2
+    # 回放同样记账：非流式使用录制时上游返回的 usage，流式（上游未返回）按文本估算
+    assert client.usage.total.calls == 2
+    assert client.usage.total.estimated == 1
+
+
+async def test_replay_miss_raises(recorded):
+    client = await make_client(_offline)
+    client.cassette = Cassette(recorded, "replay")
+    try:
+        with pytest.raises(CassetteMissError):
+            await client.chat_completion([{"role": "user", "content": "没录过"}], "m")
+    finally:
+        await client.close()
+
+
+def test_lookup_is_ordered_per_scope_and_falls_back(tmp_path):
+    path = tmp_path / "cassette.jsonl"
+    recorder = Cassette(path, "record")
+    for scope, content in (("a", "一"), ("a", "二"), ("b", "三")):
+        with cassette_scope(scope):
+            recorder.record("key", CassetteEntry(content))
+    recorder.close()
+    
+    cassette = Cassette(path, "replay")
+    with cassette_scope("a"):
+        assert [cassette.lookup("key").content for _ in range(3)] == ["一", "二", "二"]
+    with cassette_scope("b"):
+        assert cassette.lookup("key").content == "三"
+    with cassette_scope("unknown"):
+        assert cassette.lookup("key").content == "一"
+    
+    cassette.rewind()
+    with cassette_scope("a"):
+        assert cassette.lookup("key").content == "一"
@@ -0,0 +1,108 @@
+"""
+DialogueManager 测试
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.core.usage import BudgetExceededError, SessionUsage
+from app.services import dialogue_manager as dialogue_module
+from app.services import model_a as model_a_module
+from app.services import model_b as model_b_module
+from app.services.dialogue_manager import DialogueManager
+from tests.conftest import make_client
+
+
+@pytest.fixture
+def manager(upstream_client, monkeypatch):
+    """Model B 走 FakeUpstream、每轮都预分析的会话"""
+    upstream, client = upstream_client
+    monkeypatch.setattr(model_b_module, "llm_client", client)
+    monkeypatch.setattr(dialogue_module, "_prefetch_semaphore", None)
+    monkeypatch.setattr(settings, "ANALYSIS_PREFETCH_CONCURRENCY", 1)
+    
+    manager = DialogueManager(session_id="prefetch-test", prefetch_every=1)
+    manager.start_new_dialogue("first_meet")
+    manager.context.add_message("user", f"{id(manager)} 你周末一般做什么")
+    manager.context.add_message("assistant", "在家看看书")
+    yield manager
+    manager.close()
+
+
+async def _start_prefetch(manager: DialogueManager, upstream) -> asyncio.Task:
+    manager._schedule_prefetch()
+    task = manager._prefetch_task
+    await upstream.started.wait()
+    return task
+
+
+async def test_cancel_prefetch_cancels_upstream(manager, upstream_client):
+    upstream, client = upstream_client
+    task = await _start_prefetch(manager, upstream)
+    
+    manager._cancel_prefetch()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    await asyncio.sleep(0)
+    
+    assert upstream.cancelled == 1
+    assert client.scheduler.in_flight == 0
+    # 信号量在上游请求结束后才释放
+    assert not dialogue_module._get_prefetch_semaphore().locked()
+
+
+async def test_cancelled_analysis_caller_keeps_prefetch_reachable(manager, upstream_client):
+    upstream, _ = upstream_client
+    task = await _start_prefetch(manager, upstream)
+    
+    caller = asyncio.create_task(manager.get_analysis())
+    await asyncio.sleep(0)
+    caller.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await caller
+    
+    assert manager._prefetch_task is task
+    manager.close()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    await asyncio.sleep(0)
+    assert upstream.cancelled == 1
+
+
+async def test_analysis_takes_prefetched_result(manager, upstream_client):
+    upstream, _ = upstream_client
+    await _start_prefetch(manager, upstream)
+    
+    upstream.release.set()
+    assert await manager.get_analysis() == "嗯"
+    assert manager.prefetch_hits == 1
+    assert manager._prefetch_task is None
+    assert upstream.calls == 1
+
+
+async def test_failed_turn_leaves_no_user_message(echo_llm, monkeypatch):
+    manager = DialogueManager(session_id="failed-turn", prefetch_every=0)
+    manager.start_new_dialogue("first_meet")
+    assert await manager.process_user_input("你好") == "回复：你好"
+    window = manager.window
+    
+    # 预算不足：请求未发送
+    manager.usage = SessionUsage(token_budget=1)
+    with pytest.raises(BudgetExceededError):
+        await manager.process_user_input("还在吗")
+    
+    # 上游出错
+    manager.usage = SessionUsage()
+    failing = await make_client(lambda request: httpx.Response(400, json={}))
+    monkeypatch.setattr(model_a_module, "llm_client", failing)
+    with pytest.raises(httpx.HTTPStatusError):
+        await manager.process_user_input("还在吗")
+    await failing.close()
+    
+    assert [message.content for message in manager.context.messages] == ["你好", "回复：你好"]
+    assert manager.window is window
+    assert [message["content"] for message in window.messages()] == ["你好", "回复：你好"]
+    assert manager.get_dialogue_summary()["total_turns"] == 1
+    manager.close()
@@ -0,0 +1,45 @@
+"""
+导入冒烟测试：防止循环导入等问题
+
+循环导入只在某个包被“第一个”导入时暴露，因此每个包都在独立的解释器中单独导入一次；
+其余模块在当前进程中逐个导入。
+"""
+import importlib
+import os
+import pkgutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import app
+import benchmarks
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def _walk(package, packages_only: bool = False) -> list[str]:
+    return [package.__name__] + [
+        info.name
+        for info in pkgutil.walk_packages(package.__path__, package.__name__ + ".")
+        if info.ispkg or not packages_only
+    ]
+
+
+@pytest.mark.parametrize("name", _walk(app, packages_only=True) + ["benchmarks", "cli"])
+def test_import_package_first(name):
+    result = subprocess.run(
+        [sys.executable, "-c", f"import {name}"],
+        cwd=BACKEND_DIR,
+        env={**os.environ, "PYTHONPATH": str(BACKEND_DIR)},
+        capture_output=True,
+        text=True
+    )
+    assert result.returncode == 0, result.stderr
+
+
+@pytest.mark.parametrize("name", _walk(app) + _walk(benchmarks))
+def test_import_module(name):
+    importlib.import_module(name)
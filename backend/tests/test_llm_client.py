@@ -0,0 +1,134 @@
+"""
+LLMClient 单飞去重、预算预留与用量测试
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.usage import BudgetExceededError, SessionUsage
+from tests.conftest import make_client
+
+
+MESSAGES = [{"role": "user", "content": "你好"}]
+
+
+async def test_identical_requests_share_one_upstream_call(upstream_client):
+    upstream, client = upstream_client
+    calls = [asyncio.create_task(client.chat_completion(MESSAGES, "m")) for _ in range(3)]
+    await upstream.started.wait()
+    upstream.release.set()
+    
+    assert await asyncio.gather(*calls) == ["嗯"] * 3
+    assert upstream.calls == 1
+    assert client.coalesced == 2
+    # token 只记在发起请求的一方
+    assert client.usage.total.prompt_tokens == 10
+
+
+async def test_cancelling_only_waiter_cancels_upstream(upstream_client):
+    upstream, client = upstream_client
+    call = asyncio.create_task(client.chat_completion(MESSAGES, "m"))
+    await upstream.started.wait()
+    
+    call.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await call
+    await asyncio.sleep(0)
+    
+    assert upstream.cancelled == 1
+    assert client.scheduler.in_flight == 0
+    assert client.stats()["inflight_unique"] == 0
+
+
+async def test_cancelling_one_of_several_waiters_keeps_request(upstream_client):
+    upstream, client = upstream_client
+    first = asyncio.create_task(client.chat_completion(MESSAGES, "m"))
+    second = asyncio.create_task(client.chat_completion(MESSAGES, "m"))
+    await upstream.started.wait()
+    
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    upstream.release.set()
+    
+    assert await second == "嗯"
+    assert upstream.calls == 1
+    assert upstream.cancelled == 0
+
+
+async def test_request_after_cancellation_starts_fresh(upstream_client):
+    upstream, client = upstream_client
+    call = asyncio.create_task(client.chat_completion(MESSAGES, "m"))
+    await upstream.started.wait()
+    call.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await call
+    
+    upstream.release.set()
+    assert await client.chat_completion(MESSAGES, "m") == "嗯"
+    assert upstream.calls == 2
+
+
+async def test_concurrent_calls_reserve_session_budget(upstream_client):
+    upstream, client = upstream_client
+    usage = SessionUsage(token_budget=150)
+    call = asyncio.create_task(client.chat_completion(MESSAGES, "m", max_tokens=100, usage=usage))
+    await upstream.started.wait()
+    assert usage.reserved_tokens > 100
+    
+    # 第一次调用尚未记账，但其最坏情况用量已预留
+    with pytest.raises(BudgetExceededError):
+        await client.chat_completion([{"role": "user", "content": "在吗"}], "m", max_tokens=100, usage=usage)
+    
+    upstream.release.set()
+    assert await call == "嗯"
+    assert usage.reserved_tokens == 0
+    assert usage.total.total_tokens == 12
+
+
+async def test_prefetch_child_ledger_has_own_limit(upstream_client):
+    upstream, client = upstream_client
+    usage = SessionUsage()
+    prefetch = usage.child(token_budget=50)
+    
+    with pytest.raises(BudgetExceededError):
+        await client.chat_completion(MESSAGES, "m", max_tokens=100, usage=prefetch)
+    
+    upstream.release.set()
+    await client.chat_completion(MESSAGES, "m", max_tokens=10, usage=prefetch)
+    # 子账本的用量同时记入会话账本
+    assert prefetch.total.total_tokens == usage.total.total_tokens == 12
+    assert (prefetch.reserved_tokens, usage.reserved_tokens) == (0, 0)
+
+
+async def test_failed_call_releases_reservation(upstream_client):
+    upstream, client = upstream_client
+    usage = SessionUsage(token_budget=150)
+    call = asyncio.create_task(client.chat_completion(MESSAGES, "m", max_tokens=100, usage=usage))
+    await upstream.started.wait()
+    
+    call.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await call
+    assert usage.reserved_tokens == 0
+
+
+async def test_provider_cached_tokens_are_recorded():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={
+            "choices": [{"message": {"content": "嗯"}}],
+            "usage": {
+                "prompt_tokens": 1200,
+                "completion_tokens": 2,
+                "prompt_tokens_details": {"cached_tokens": 1024}
+            }
+        })
+    
+    client = await make_client(handler)
+    usage = SessionUsage()
+    await client.chat_completion(MESSAGES, "m", usage=usage)
+    await client.close()
+    
+    assert usage.total.cached_tokens == client.usage.total.cached_tokens == 1024
+    assert client.usage.to_dict()["models"]["m"]["cached_tokens"] == 1024
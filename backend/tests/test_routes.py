@@ -0,0 +1,64 @@
+"""
+HTTP 路由测试
+"""
+import asyncio
+import contextlib
+import gc
+
+import pytest
+
+from app.api import routes
+from app.api.schemas import TurnRequest
+
+
+class FailingManager:
+    async def process_user_input(self, content: str, on_chunk=None) -> str:
+        await on_chunk("你")
+        await asyncio.sleep(0)
+        raise RuntimeError("上游出错")
+
+
+class FakeRegistry:
+    async def resume(self, session_id: str) -> bool:
+        return True
+    
+    @contextlib.asynccontextmanager
+    async def session(self, session_id: str):
+        yield FailingManager()
+
+
+@pytest.fixture
+async def loop_errors(monkeypatch):
+    monkeypatch.setattr(routes, "session_registry", FakeRegistry())
+    errors: list[dict] = []
+    loop = asyncio.get_running_loop()
+    loop.set_exception_handler(lambda _, context: errors.append(context))
+    yield errors
+    loop.set_exception_handler(None)
+
+
+async def test_stream_turn_reports_failure(loop_errors):
+    response = await routes.stream_turn("s", TurnRequest(content="你好"))
+    events = [chunk async for chunk in response.body_iterator]
+    
+    assert events[0].startswith(b"event: token")
+    assert events[-1].startswith(b"event: error")
+    assert "上游出错".encode() in events[-1]
+    assert loop_errors == []
+
+
+async def test_abandoned_stream_turn_failure_is_retrieved(loop_errors, capsys):
+    # 客户端在读取任何事件前断开：生成器从未运行
+    response = await routes.stream_turn("s", TurnRequest(content="你好"))
+    for _ in range(10):
+        await asyncio.sleep(0)
+    del response
+    gc.collect()
+    
+    assert loop_errors == []
+    assert "流式轮次失败" in capsys.readouterr().out
+
+
+async def test_stats_include_prompt_cache():
+    stats = await routes.stats()
+    assert {"entries", "hits", "misses", "compiled", "provider_cached_tokens"} <= stats["prompt_cache"].keys()
@@ -0,0 +1,139 @@
+"""
+RequestScheduler 与重试退避测试
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.core.llm_client import LLMClient, Priority, RequestScheduler
+from tests.conftest import make_client
+
+
+def _scheduler(limit: int = 2, reserved: int = 0, **kwargs) -> RequestScheduler:
+    return RequestScheduler(
+        initial_limit=limit, min_limit=1, max_limit=16, latency_target=1.0,
+        reserved_interactive=reserved, **kwargs
+    )
+
+
+async def test_waiters_are_served_by_priority_then_arrival():
+    scheduler = _scheduler(limit=1)
+    await scheduler.acquire(Priority.INTERACTIVE)
+    
+    order = []
+    
+    async def wait(name: str, priority: Priority):
+        await scheduler.acquire(priority)
+        order.append(name)
+        scheduler.release()
+    
+    tasks = [
+        asyncio.create_task(wait("background", Priority.BACKGROUND)),
+        asyncio.create_task(wait("analysis-1", Priority.ANALYSIS)),
+        asyncio.create_task(wait("interactive", Priority.INTERACTIVE)),
+        asyncio.create_task(wait("analysis-2", Priority.ANALYSIS)),
+    ]
+    await asyncio.sleep(0)
+    scheduler.release()
+    await asyncio.gather(*tasks)
+    
+    assert order == ["interactive", "analysis-1", "analysis-2", "background"]
+    assert scheduler.in_flight == 0
+
+
+async def test_cancelled_waiter_does_not_leak_slot():
+    scheduler = _scheduler(limit=1)
+    await scheduler.acquire()
+    waiter = asyncio.create_task(scheduler.acquire())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    
+    scheduler.release()
+    assert scheduler.in_flight == 0
+    await asyncio.wait_for(scheduler.acquire(), timeout=0.1)
+
+
+async def test_interactive_slot_is_reserved():
+    scheduler = _scheduler(limit=3, reserved=1)
+    await scheduler.acquire(Priority.BACKGROUND)
+    await scheduler.acquire(Priority.ANALYSIS)
+    
+    # 非实时请求已占满 上限 - 预留 个槽位
+    blocked = asyncio.create_task(scheduler.acquire(Priority.BACKGROUND))
+    await asyncio.sleep(0)
+    assert not blocked.done()
+    
+    # 实时对话仍能立即拿到预留槽位，即使队列里有更早的后台请求
+    await asyncio.wait_for(scheduler.acquire(Priority.INTERACTIVE), timeout=0.1)
+    assert scheduler.in_flight == 3
+    
+    scheduler.release()
+    scheduler.release()
+    await asyncio.wait_for(blocked, timeout=0.1)
+
+
+async def test_non_interactive_always_gets_one_slot():
+    scheduler = _scheduler(limit=1, reserved=1)
+    await asyncio.wait_for(scheduler.acquire(Priority.BACKGROUND), timeout=0.1)
+
+
+def test_aimd_grows_additively_and_shrinks_on_slow_first_token():
+    scheduler = _scheduler(limit=4)
+    scheduler.record_success(0.5)
+    assert scheduler.limit == pytest.approx(4.25)
+    
+    scheduler.record_success(2.0)
+    assert scheduler.limit == pytest.approx(4.25 * 0.9)
+
+
+def test_calls_without_latency_signal_never_shrink_limit():
+    scheduler = _scheduler(limit=4)
+    for _ in range(4):
+        scheduler.record_success()
+    assert scheduler.limit > 4
+
+
+def test_overload_halves_limit_down_to_minimum():
+    scheduler = _scheduler(limit=4)
+    scheduler.record_overload()
+    assert scheduler.limit == 2
+    for _ in range(5):
+        scheduler.record_overload()
+    assert scheduler.limit == scheduler.min_limit
+
+
+def test_retry_delay_honours_retry_after():
+    client = LLMClient()
+    client.retry_base_delay = 0.001
+    request = httpx.Request("POST", "http://upstream/chat/completions")
+    response = httpx.Response(429, headers={"Retry-After": "3"}, request=request)
+    error = httpx.HTTPStatusError("429", request=request, response=response)
+    assert client._retry_delay(0, error) >= 3.0
+
+
+async def test_429_is_retried_after_retry_after():
+    attempts = []
+    
+    def handler(request: httpx.Request) -> httpx.Response:
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0.2"})
+        return httpx.Response(200, json={"choices": [{"message": {"content": "嗯"}}]})
+    
+    client = await make_client(handler)
+    client.retry_base_delay = 0.001
+    limit = client.scheduler.limit
+    try:
+        assert await client.chat_completion([{"role": "user", "content": "重试"}], "m") == "嗯"
+    finally:
+        await client.close()
+    
+    assert len(attempts) == 2
+    assert attempts[1] - attempts[0] >= 0.2
+    assert client.scheduler.overloaded == 1
+    assert client.scheduler.retries == 1
+    assert client.scheduler.limit < limit
@@ -0,0 +1,153 @@
+"""
+SessionRegistry 测试
+"""
+import asyncio
+
+import pytest
+
+from app.services import model_b as model_b_module
+from app.services.dialogue_manager import DialogueManager
+from app.services.session_registry import SessionBusyError, SessionLimitError, SessionRegistry
+
+
+def _registry(max_sessions: int = 8) -> SessionRegistry:
+    return SessionRegistry(
+        max_sessions=max_sessions,
+        manager_factory=lambda session_id: DialogueManager(session_id=session_id, prefetch_every=0)
+    )
+
+
+async def test_analysis_does_not_hold_session_lock(upstream_client, monkeypatch):
+    upstream, client = upstream_client
+    monkeypatch.setattr(model_b_module, "llm_client", client)
+    registry = _registry()
+    session_id = await registry.create()
+    registry.get(session_id).context.add_message("user", f"{session_id} 最近怎么样")
+    
+    analysis = asyncio.create_task(registry.get_analysis(session_id))
+    await upstream.started.wait()
+    
+    # Model B 调用进行中，新的轮次仍能立即拿到会话
+    async with asyncio.timeout(0.5):
+        async with registry.session(session_id) as manager:
+            manager.context.add_message("user", "还在吗")
+    
+    upstream.release.set()
+    assert await analysis == "嗯"
+    # 分析基于发起时的快照
+    assert registry.get(session_id).last_analysis.message_count == 1
+
+
+async def test_turns_in_one_session_are_serialized():
+    registry = _registry()
+    session_id = await registry.create()
+    active = 0
+    overlaps = []
+    
+    async def use():
+        nonlocal active
+        async with registry.session(session_id):
+            active += 1
+            overlaps.append(active)
+            await asyncio.sleep(0.01)
+            active -= 1
+    
+    await asyncio.gather(*(use() for _ in range(5)))
+    assert overlaps == [1] * 5
+
+
+async def test_different_sessions_run_in_parallel():
+    registry = _registry()
+    first, second = await registry.create(), await registry.create()
+    entered = asyncio.Event()
+    
+    async def hold():
+        async with registry.session(first):
+            entered.set()
+            await asyncio.sleep(0.2)
+    
+    holder = asyncio.create_task(hold())
+    await entered.wait()
+    async with asyncio.timeout(0.1):
+        async with registry.session(second):
+            pass
+    await holder
+
+
+async def test_lru_eviction_skips_busy_sessions():
+    registry = _registry(max_sessions=2)
+    oldest = await registry.create("oldest")
+    await registry.create("newer")
+    
+    async with registry.session(oldest):
+        # 最久未使用的会话正忙，淘汰下一个空闲会话
+        await registry.create("third")
+        assert "oldest" in registry
+        assert "newer" not in registry
+    assert registry.evicted_count == 1
+
+
+async def test_lru_order_follows_use():
+    registry = _registry(max_sessions=2)
+    await registry.create("a")
+    await registry.create("b")
+    async with registry.session("a"):
+        pass
+    
+    await registry.create("c")
+    assert "a" in registry
+    assert "b" not in registry
+
+
+async def test_session_limit_error_when_all_sessions_busy():
+    registry = _registry(max_sessions=1)
+    only = await registry.create()
+    async with registry.session(only):
+        with pytest.raises(SessionLimitError):
+            await registry.create()
+    assert len(registry) == 1
+
+
+async def test_remove_refuses_busy_session():
+    registry = _registry()
+    session_id = await registry.create()
+    entered = asyncio.Event()
+    release = asyncio.Event()
+    
+    async def hold():
+        async with registry.session(session_id):
+            entered.set()
+            await release.wait()
+    
+    async def wait_turn():
+        async with registry.session(session_id) as manager:
+            return manager.session_id
+    
+    holder = asyncio.create_task(hold())
+    await entered.wait()
+    waiter = asyncio.create_task(wait_turn())
+    await asyncio.sleep(0)
+    
+    # 有轮次在处理、还有调用在排队时不能移除
+    with pytest.raises(SessionBusyError):
+        registry.remove(session_id)
+    release.set()
+    await holder
+    assert await waiter == session_id
+    
+    assert registry.remove(session_id) is True
+    assert registry.remove(session_id) is False
+
+
+async def test_unknown_session_raises_key_error():
+    registry = _registry()
+    with pytest.raises(KeyError):
+        async with registry.session("missing"):
+            pass
+
+
+async def test_process_user_input(echo_llm):
+    registry = _registry()
+    session_id = await registry.create()
+    assert await registry.process_user_input(session_id, "你好") == "回复：你好"
+    assert registry.get(session_id).get_dialogue_summary()["total_turns"] == 1
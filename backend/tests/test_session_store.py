@@ -0,0 +1,174 @@
+"""
+SessionStore 持久化测试
+"""
+import pytest
+
+from app.core.usage import BudgetExceededError, CallUsage
+from app.models.dialogue import MessageRecord
+from app.models.state import EmotionalState
+from app.models.trajectory import StateTrajectory
+from app.services.dialogue_manager import DialogueManager
+from app.services.session_registry import SessionRegistry
+from app.services.session_store import SessionStore
+
+
+@pytest.fixture
+async def store(tmp_path):
+    store = SessionStore(tmp_path / "sessions.db")
+    yield store
+    await store.close()
+
+
+def _registry(store: SessionStore, max_sessions: int = 8) -> SessionRegistry:
+    return SessionRegistry(
+        max_sessions=max_sessions,
+        store=store,
+        manager_factory=lambda session_id: DialogueManager(
+            session_id=session_id, prefetch_every=0, store=store
+        )
+    )
+
+
+async def test_budget_and_spend_survive_eviction_and_restart(store, tmp_path):
+    registry = _registry(store)
+    session_id = await registry.create(token_budget=1000, cost_budget=0.5)
+    usage = registry.get(session_id).usage
+    usage.record(CallUsage("m", prompt_tokens=600, completion_tokens=100))
+    
+    # 淘汰后恢复
+    registry.remove(session_id)
+    assert await registry.resume(session_id)
+    restored = registry.get(session_id).usage
+    assert (restored.token_budget, restored.cost_budget) == (1000, 0.5)
+    assert restored.total.total_tokens == 700
+    assert restored.total.calls == 1
+    with pytest.raises(BudgetExceededError):
+        restored.check("m", [{"role": "user", "content": "你好"}], max_tokens=400)
+    
+    # 进程重启：新的存储实例读取同一个数据库
+    registry.remove(session_id)
+    await store.close()
+    reopened = SessionStore(tmp_path / "sessions.db")
+    try:
+        snapshot = await reopened.load_session(session_id)
+        assert snapshot.usage.token_budget == 1000
+        assert snapshot.usage.total.total_tokens == 700
+    finally:
+        await reopened.close()
+
+
+async def test_messages_and_states_round_trip(store):
+    store.record_session("s", "low_mood", reset=True)
+    for seq in range(6):
+        store.record_message("s", seq, MessageRecord("user" if seq % 2 == 0 else "assistant", f"第 {seq} 条"))
+    states = [EmotionalState(valence=0.1 * turn) for turn in range(4)]
+    for turn, state in enumerate(states):
+        store.record_state("s", turn, state)
+    assert store.pending > 0
+    
+    snapshot = await store.load_session("s", max_messages=2)
+    assert store.pending == 0
+    assert snapshot.scenario_id == "low_mood"
+    assert snapshot.message_count == 6
+    assert [message.content for message in snapshot.messages] == ["第 4 条", "第 5 条"]
+    # 两条消息对应最近一轮：初始状态 + 最后一个状态
+    assert snapshot.state_count == 4
+    assert [state.valence for state in snapshot.states] == [states[0].valence, states[-1].valence]
+    full = [state async for _, state in store.iter_states("s")]
+    assert [state.valence for state in full] == [state.valence for state in states]
+    
+    history = [(seq, message.content) async for seq, message in store.iter_messages("s", page_size=4)]
+    assert history == [(seq, f"第 {seq} 条") for seq in range(6)]
+    assert await store.list_sessions() == ["s"]
+    assert await store.load_session("missing") is None
+
+
+async def test_reset_clears_previous_dialogue(store):
+    store.record_session("s", "first_meet")
+    store.record_message("s", 0, MessageRecord("user", "旧消息"))
+    store.record_session("s", "conflict", reset=True)
+    
+    snapshot = await store.load_session("s")
+    assert snapshot.scenario_id == "conflict"
+    assert snapshot.message_count == 0
+
+
+async def test_resumed_session_continues_dialogue(store, echo_llm):
+    registry = _registry(store)
+    session_id = await registry.create(scenario_id="low_mood")
+    for text in ("你好", "最近怎么样"):
+        await registry.process_user_input(session_id, text)
+    before = registry.get(session_id)
+    states = before.emotional_states.to_bytes()
+    
+    registry.remove(session_id)
+    assert session_id not in registry
+    assert await registry.process_user_input(session_id, "还在吗") == "回复：还在吗"
+    
+    manager = registry.get(session_id)
+    assert registry.resumed_count == 1
+    assert manager.context.scenario_id == "low_mood"
+    assert manager.emotional_states[:3].to_bytes() == states
+    
+    snapshot = await store.load_session(session_id)
+    assert snapshot.message_count == 6
+    assert len(snapshot.states) == 4
+
+
+async def test_create_does_not_reset_persisted_session(store, echo_llm, tmp_path):
+    registry = _registry(store)
+    await registry.create("abc")
+    await registry.process_user_input("abc", "你好")
+    
+    # 被淘汰后用同一 ID 创建
+    registry.remove("abc")
+    with pytest.raises(ValueError):
+        await registry.create("abc")
+    assert (await store.load_session("abc")).message_count == 2
+    
+    # 进程重启后用同一 ID 创建
+    await store.close()
+    reopened = SessionStore(tmp_path / "sessions.db")
+    try:
+        with pytest.raises(ValueError):
+            await _registry(reopened).create("abc")
+        assert (await reopened.load_session("abc")).message_count == 2
+    finally:
+        await reopened.close()
+
+
+async def test_turn_count_after_truncated_restore(store, echo_llm):
+    manager = DialogueManager(session_id="truncated", prefetch_every=0, store=store)
+    manager.start_new_dialogue()
+    for text in ("一", "二", "三"):
+        await manager.process_user_input(text)
+    
+    restored = DialogueManager(session_id="truncated", prefetch_every=0, store=store)
+    restored.restore(await store.load_session("truncated", max_messages=2))
+    assert len(restored.context.messages) == 2
+    assert restored.get_dialogue_summary()["total_turns"] == 3
+
+
+async def test_resume_loads_bounded_states(store, echo_llm):
+    manager = DialogueManager(session_id="long", prefetch_every=0, store=store)
+    manager.start_new_dialogue()
+    for turn in range(6):
+        await manager.process_user_input(f"第 {turn} 轮")
+    full = manager.emotional_states.to_bytes()
+    
+    snapshot = await store.load_session("long", max_messages=4)
+    assert snapshot.state_count == 7
+    # 初始状态 + 最近 2 轮
+    assert len(snapshot.states) == 3
+    assert snapshot.states[-1] == manager.current_state
+    
+    restored = DialogueManager(session_id="long", prefetch_every=0, store=store)
+    restored.restore(snapshot)
+    await restored.process_user_input("继续")
+    
+    # 恢复后的新状态按真实轮次写入，不覆盖已有的行
+    states = [(turn, state) async for turn, state in store.iter_states("long", page_size=3)]
+    assert [turn for turn, _ in states] == list(range(8))
+    expected = StateTrajectory([state for _, state in states[:7]])
+    assert expected.to_bytes() == full
+
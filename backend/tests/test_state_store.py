@@ -0,0 +1,39 @@
+"""
+批量情绪状态存储测试
+"""
+import numpy as np
+import pytest
+
+from app.models.state import DIMENSIONS, EmotionalState
+from app.models.state_store import EmotionalStateStore
+from app.models.trajectory import encode_levels
+
+
+def test_store_matches_emotional_state():
+    rng = np.random.default_rng(0)
+    deltas = rng.uniform(-0.4, 0.4, size=(64, len(DIMENSIONS)))
+    store = EmotionalStateStore(capacity=4)
+    slots = store.allocate_many(64, EmotionalState(openness=0.4, distance=0.6))
+    store.apply_deltas(slots, deltas)
+    
+    states = []
+    for row in deltas.tolist():
+        state = EmotionalState(openness=0.4, distance=0.6)
+        state.update_from_interaction(**{f"delta_{dim}": value for dim, value in zip(DIMENSIONS, row)})
+        states.append(state)
+    
+    assert store.capacity == 64
+    assert [store.to_state(slot) for slot in slots.tolist()] == states
+    assert store.level_codes().tolist() == [encode_levels(state.discretize()) for state in states]
+    assert store.describe() == [state.to_prompt_context() for state in states]
+
+
+def test_view_writes_through_and_validates():
+    store = EmotionalStateStore()
+    view = store.view(store.allocate(EmotionalState(trust=0.55)))
+    view.update_from_interaction(delta_trust=0.1, delta_valence=-2)
+    
+    assert (view.trust, view.valence) == (pytest.approx(0.65), -1.0)
+    assert view.to_prompt_context() == store.to_state(view.slot).to_prompt_context()
+    with pytest.raises(ValueError):
+        view.distance = 1.5
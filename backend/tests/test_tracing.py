@@ -0,0 +1,65 @@
+"""
+追踪测试
+"""
+import asyncio
+
+import pytest
+
+from app.core import tracing
+from app.core.tracing import Tracer, current_span, span
+from tests.conftest import echo_handler, make_client
+
+
+MESSAGES = [{"role": "user", "content": "你好"}]
+
+
+@pytest.fixture
+def tracer(monkeypatch, tmp_path):
+    tracer = Tracer(tmp_path / "traces.jsonl", batch_size=1000)
+    monkeypatch.setattr(tracing, "_tracer", tracer)
+    monkeypatch.setattr(tracing, "_configured", True)
+    return tracer
+
+
+@pytest.fixture
+async def client():
+    client = await make_client(echo_handler)
+    yield client
+    await client.close()
+
+
+def _spans(tracer: Tracer) -> dict:
+    return {s.name: s for s in tracer._buffer}
+
+
+async def test_stream_span_does_not_leak_into_consumer(tracer, client):
+    with span("outer") as outer:
+        chunks = []
+        async for delta in client.stream_chat_completion(MESSAGES, "m"):
+            assert current_span() is outer
+            chunks.append(delta)
+        assert current_span() is outer
+    assert "".join(chunks) == "回复：你好"
+    
+    spans = _spans(tracer)
+    stream = spans["llm.stream"]
+    assert stream.parent_id == outer.span_id
+    assert spans["llm.http"].parent_id == stream.span_id
+    assert spans["llm.queue"].parent_id == stream.span_id
+    assert stream.attributes["llm.completion_tokens"] > 0
+    assert all(s.end_ns >= s.start_ns > 0 for s in spans.values())
+
+
+async def test_stream_closed_from_another_task(tracer, client):
+    stream = client.stream_chat_completion(MESSAGES, "m")
+    with span("outer"):
+        await anext(stream)
+    
+    # 在另一个任务（另一个上下文）中关闭生成器
+    await asyncio.create_task(stream.aclose())
+    
+    assert current_span() is tracing.NOOP_SPAN
+    spans = _spans(tracer)
+    assert spans["llm.stream"].attributes["cancelled"] is True
+    assert spans["llm.http"].attributes["cancelled"] is True
+    assert client.scheduler.in_flight == 0
@@ -0,0 +1,176 @@
+"""
+列式对话归档测试
+"""
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.models.dialogue import MessageRecord
+from app.models.state import DIMENSIONS, EmotionalState
+from app.models.trajectory import StateTrajectory, encode_levels
+from app.services.lexicon_engine import LexiconStateEngine, _load_lexicon, get_lexicon_engine
+from app.services.scenario_catalog import scenario_catalog
+from app.services.transcript_archive import (
+    MAX_SESSION_ID_BYTES,
+    TranscriptArchive,
+    TranscriptArchiveWriter,
+    level_codes
+)
+
+
+def _states() -> list[EmotionalState]:
+    # 包含恰好落在阈值上的取值
+    values = [
+        (0.0, 0.0, 0.5, 0.5, 0.5),
+        (0.3, -0.3, 0.4, 0.6, 0.6),
+        (0.31, -0.31, 0.39, 0.61, 0.1),
+        (-1.0, 1.0, 0.0, 1.0, 1.0),
+    ]
+    rng = np.random.default_rng(0)
+    values += [
+        (*rng.uniform(-1, 1, 2), *rng.uniform(0, 1, 3))
+        for _ in range(200)
+    ]
+    return [
+        EmotionalState(valence=v, arousal=a, trust=t, openness=o, distance=d)
+        for v, a, t, o, d in values
+    ]
+
+
+def test_level_codes_match_discretize():
+    states = _states()
+    values = np.array([
+        (s.valence, s.arousal, s.trust, s.openness, s.distance) for s in states
+    ])
+    expected = [encode_levels(state.discretize()) for state in states]
+    assert level_codes(values).tolist() == expected
+
+
+def test_add_states_keeps_levels(tmp_path):
+    states = _states()
+    trajectory = StateTrajectory(states)
+    messages = [MessageRecord("user", "你好"), MessageRecord("assistant", "嗯")]
+    
+    with TranscriptArchiveWriter(tmp_path / "archive", evaluate_cues=False) as writer:
+        writer.add_session("a", "first_meet", messages, states)
+        writer.add_session("b", "first_meet", messages, trajectory)
+    
+    archive = TranscriptArchive(tmp_path / "archive")
+    expected = [encode_levels(state.discretize()) for state in states]
+    assert archive[0].levels.tolist() == expected
+    assert archive[1].levels.tolist() == expected
+    assert archive[1].trajectory().level_codes.tolist() == expected
+
+
+def test_long_session_id_and_unknown_role_are_rejected(tmp_path):
+    with TranscriptArchiveWriter(tmp_path / "archive", evaluate_cues=False) as writer:
+        # 22 个汉字即 66 字节，定长字段会截断
+        with pytest.raises(ValueError):
+            writer.begin_session("会" * 22, "first_meet")
+        writer.add_session("会" * (MAX_SESSION_ID_BYTES // 3), "first_meet", [], [])
+        
+        writer.begin_session("s", "first_meet")
+        with pytest.raises(ValueError):
+            writer.add_message(MessageRecord("tool", "结果"))
+        writer.end_session()
+    
+    archive = TranscriptArchive(tmp_path / "archive")
+    assert [session.session_id for session in archive.iter_sessions()] == [
+        "会" * (MAX_SESSION_ID_BYTES // 3), "s"
+    ]
+
+
+def test_sessions_without_states(tmp_path):
+    messages = [MessageRecord("user", "你好")]
+    with TranscriptArchiveWriter(tmp_path / "archive", evaluate_cues=False) as writer:
+        writer.add_session("empty-first", "first_meet", messages, [])
+        writer.add_session("low-trust", "first_meet", messages, [EmotionalState(trust=0.1)])
+        writer.add_session("empty-last", "first_meet", messages, [])
+    
+    archive = TranscriptArchive(tmp_path / "archive")
+    (_, final), = archive.final_states()
+    assert np.isnan(final[[0, 2]]).all()
+    assert final[1, 2] == np.float32(0.1)
+    
+    # 取反的条件也不会选中没有状态的会话
+    assert archive.select(lambda states: ~(states[:, 2] >= 0.4)).tolist() == [1]
+    
+    empty = archive[0]
+    assert empty.states.shape == (0, 5)
+    assert len(empty.trajectory()) == 0
+    assert [message.content for message in empty.context().messages] == ["你好"]
+
+
+def test_archive_of_only_empty_sessions(tmp_path):
+    with TranscriptArchiveWriter(tmp_path / "archive", evaluate_cues=False) as writer:
+        writer.add_session("a", "first_meet", [], [])
+    
+    archive = TranscriptArchive(tmp_path / "archive")
+    assert archive.select(lambda states: states[:, 0] < 1).tolist() == []
+    assert len(archive[0].trajectory()) == 0
+
+
+_USER_TURNS = [
+    ["谢谢你，听起来很有意思", "你多大了？工资多少", "辛苦了，不着急"],
+    ["为什么不说话", "你到底住哪，快说", "凭什么", "难道你不理解吗"],
+    ["你好"],
+]
+
+
+def _play(engine: LexiconStateEngine, turns: list[str]) -> list[EmotionalState]:
+    """按对话流程逐轮应用词典（与 ModelAService.update_emotional_state 一致）"""
+    state = scenario_catalog.get("first_meet").initial_state.model_copy()
+    states = [state]
+    for text in turns:
+        state = state.model_copy()
+        engine.apply(state, text)
+        states.append(state)
+    return states
+
+
+def _write_played(path, engine: LexiconStateEngine):
+    with TranscriptArchiveWriter(path) as writer:
+        for i, turns in enumerate(_USER_TURNS):
+            messages = []
+            for text in turns:
+                messages += [MessageRecord("user", text), MessageRecord("assistant", "嗯")]
+            writer.add_session(f"s{i}", "first_meet", messages, _play(engine, turns))
+        # 没有状态行的会话从情境初始状态出发
+        writer.add_session("no-states", "first_meet", [MessageRecord("user", _USER_TURNS[0][0])], [])
+
+
+def test_rescore_with_same_lexicon_reproduces_final_states(tmp_path):
+    engine = get_lexicon_engine("first_meet")
+    _write_played(tmp_path / "archive", engine)
+    archive = TranscriptArchive(tmp_path / "archive")
+    
+    (start, store), = archive.rescore(block_size=8)
+    assert start == 0
+    expected = [_play(engine, turns)[-1] for turns in _USER_TURNS]
+    expected.append(_play(engine, _USER_TURNS[0][:1])[-1])
+    values = np.array([[getattr(state, dim) for dim in DIMENSIONS] for state in expected])
+    np.testing.assert_allclose(store.values(), values, atol=1e-6)
+    assert store.describe() == [state.to_prompt_context() for state in expected]
+
+
+def test_rescore_with_edited_lexicon(tmp_path):
+    _write_played(tmp_path / "archive", get_lexicon_engine("first_meet"))
+    archive = TranscriptArchive(tmp_path / "archive")
+    
+    lexicon = _load_lexicon(Path("app/data/lexicons/first_meet.json"))
+    lexicon["categories"]["boundary_violating"]["delta"] = {"trust": -0.3, "distance": 0.3}
+    lexicon["categories"].pop("positive")
+    edited = LexiconStateEngine(lexicon)
+    
+    blocks = list(archive.rescore({"first_meet": edited}, block_size=2))
+    assert [start for start, _ in blocks] == [0, 2]
+    values = np.concatenate([store.values() for _, store in blocks])
+    # 被删除的类别不再贡献增量；新增的线索不会命中（只重评已归档的命中）
+    expected = [_play(edited, turns)[-1] for turns in _USER_TURNS]
+    expected.append(_play(edited, _USER_TURNS[0][:1])[-1])
+    np.testing.assert_allclose(
+        values,
+        [[getattr(state, dim) for dim in DIMENSIONS] for state in expected],
+        atol=1e-6
+    )
@@ -0,0 +1,131 @@
+"""
+WebSocket 对话通道测试（使用内存中的假连接）
+"""
+import asyncio
+
+import orjson
+import pytest
+from fastapi import WebSocketDisconnect
+
+from app.api import websocket as websocket_module
+from app.api.websocket import ChatConnection
+from app.core.config import settings
+
+
+class FakeWebSocket:
+    """receive_text 从队列读取（None 表示客户端断开），send_text 可模拟不消费的客户端"""
+    
+    def __init__(self, block_sends: bool = False):
+        self.incoming: asyncio.Queue = asyncio.Queue()
+        self.sent: list[dict] = []
+        self.closed_code: int | None = None
+        self.block_sends = block_sends
+    
+    async def receive_text(self) -> str:
+        item = await self.incoming.get()
+        if item is None:
+            raise WebSocketDisconnect()
+        return item
+    
+    async def send_text(self, text: str):
+        if self.block_sends:
+            await asyncio.Event().wait()
+        self.sent.append(orjson.loads(text))
+    
+    async def close(self, code: int = 1000):
+        self.closed_code = code
+    
+    def send(self, message: dict):
+        self.incoming.put_nowait(orjson.dumps(message).decode("utf-8"))
+
+
+class FakeRegistry:
+    def __init__(self):
+        self.analysis_calls: list[dict] = []
+    
+    async def get_analysis(self, session_id: str, **kwargs) -> str:
+        self.analysis_calls.append(kwargs)
+        return "分析"
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    fake = FakeRegistry()
+    monkeypatch.setattr(websocket_module, "session_registry", fake)
+    return fake
+
+
+async def _run_until_disconnect(websocket: FakeWebSocket):
+    connection = ChatConnection(websocket, "ws-test")
+    task = asyncio.create_task(connection.run())
+    # 等后台分析任务把结果放入队列并发出
+    for _ in range(10):
+        await asyncio.sleep(0)
+    websocket.incoming.put_nowait(None)
+    await asyncio.wait_for(task, timeout=1)
+
+
+@pytest.mark.parametrize("recent_turns", ["abc", None, 1.5, True])
+async def test_invalid_recent_turns_reports_error_and_keeps_socket(registry, recent_turns):
+    websocket = FakeWebSocket()
+    websocket.send({"type": "analysis", "recent_turns": recent_turns})
+    websocket.send({"type": "ping"})
+    await _run_until_disconnect(websocket)
+    
+    assert [message["type"] for message in websocket.sent] == ["error", "pong"]
+    assert registry.analysis_calls == []
+
+
+async def test_overlong_turn_reports_error(registry):
+    websocket = FakeWebSocket()
+    websocket.send({"type": "turn", "content": "嗯" * 2001})
+    websocket.send({"type": "ping"})
+    await _run_until_disconnect(websocket)
+    
+    assert [message["type"] for message in websocket.sent] == ["error", "pong"]
+    assert "2000" in websocket.sent[0]["detail"]
+
+
+async def test_sender_finished_when_run_returns(registry):
+    # 发送卡在 send_text 中时断开：run() 返回前发送任务已结束
+    websocket = FakeWebSocket(block_sends=True)
+    websocket.send({"type": "ping"})
+    connection = ChatConnection(websocket, "ws-test")
+    
+    async def run() -> bool:
+        await connection.run()
+        return connection._sender.done()
+    
+    task = asyncio.create_task(run())
+    for _ in range(10):
+        await asyncio.sleep(0)
+    websocket.incoming.put_nowait(None)
+    assert await asyncio.wait_for(task, timeout=1)
+    assert connection._sender.cancelled()
+
+
+async def test_recent_turns_is_clamped(registry):
+    websocket = FakeWebSocket()
+    websocket.send({"type": "analysis", "recent_turns": 10_000})
+    websocket.send({"type": "analysis", "recent_turns": -3})
+    await _run_until_disconnect(websocket)
+    
+    assert [call["recent_turns"] for call in registry.analysis_calls] == [50, 1]
+    assert [message["type"] for message in websocket.sent] == ["analysis", "analysis"]
+
+
+async def test_slow_client_closed_without_further_input(monkeypatch):
+    monkeypatch.setattr(settings, "WS_SEND_QUEUE_SIZE", 1)
+    monkeypatch.setattr(settings, "WS_SEND_TIMEOUT", 0.05)
+    websocket = FakeWebSocket(block_sends=True)
+    connection = ChatConnection(websocket, "ws-test")
+    task = asyncio.create_task(connection.run())
+    await asyncio.sleep(0)
+    
+    # 后台任务（如分析）持续推送，而客户端既不消费也不再发送消息
+    for _ in range(3):
+        await connection.push({"type": "token", "content": "嗯"})
+    
+    await asyncio.wait_for(task, timeout=1)
+    assert connection.slow_client
+    assert websocket.closed_code == 1013